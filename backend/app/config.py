@@ -15,6 +15,47 @@ class Settings(BaseSettings):
     llm_api_key: str = ""
     llm_api_base: str = ""
     llm_debug: bool = False
+    llm_routing: bool = True  # route operations to model tiers (only calls on the global config)
+    llm_model_small: str = ""  # fast/cheap tier for short structured tasks, empty = llm_model
+    llm_model_large: str = ""  # tier for long analyses, empty = llm_model
+    llm_daily_token_budget: int = 0  # max prompt+completion tokens per user per UTC day, 0 = unlimited
+    llm_standin: bool = False  # route all LLM calls to the local stand-in provider (load tests)
+    llm_standin_latency: str = "lognormal:800:0.5"  # fixed:<ms> | uniform:<min>:<max> | lognormal:<median>:<sigma>
+    llm_standin_tokens_per_sec: float = 60.0
+    llm_standin_error_rate: float = 0.0
+    llm_standin_errors: str = "rate_limit,timeout,unavailable,server"
+    llm_standin_replay_file: str = ""  # JSONL of recorded responses to replay
+    llm_record_file: str = ""  # record real LLM responses as JSONL for replay
+    llm_pool_max_connections: int = 100  # shared keep-alive HTTP pool for LLM providers
+    llm_pool_keepalive_seconds: float = 120.0  # idle time before a pooled provider connection is closed
+    llm_pool_warm_connections: int = 2  # connections opened to the configured provider at startup
+    llm_request_timeout: float = 60.0  # seconds per provider attempt
+    llm_retry_attempts: int = 2  # retries of timeouts/rate limits/5xx, with jittered exponential backoff
+    llm_breaker_failure_rate: float = 0.5  # failure share that opens a provider's circuit
+    llm_breaker_min_calls: int = 10  # calls in the window before the failure rate is trusted
+    llm_breaker_window_seconds: float = 60.0
+    llm_breaker_cooldown_seconds: float = 30.0  # open time before a half-open probe call
+    morning_plan_precompute: bool = True  # build morning plans in the background before users wake up
+    morning_plan_hour: int = 5  # user's local hour when the precompute window starts (lasts 2 hours)
+    morning_plan_concurrency: int = 4  # parallel LLM calls of the precompute job
+    morning_plan_rate_per_minute: int = 30  # LLM calls per minute the precompute job may start
+    task_queue_backend: str = "postgres"  # "postgres" (shared by all workers, survives restarts) or "memory"
+    task_queue_lease_seconds: float = 30.0  # a running job whose process stops heartbeating for this long is failed
+    task_queue_result_ttl_seconds: int = 600  # finished jobs nobody fetched are deleted after this
+    task_queue_result_store_bytes: int = 64 * 1024 * 1024  # cap on unfetched results kept in process memory
+    task_queue_drain_seconds: float = 20.0  # on shutdown, wait this long for running jobs to finish
+    task_queue_workers: int = 16  # AI jobs running at once per process; the rest wait by priority
+    task_queue_user_concurrency: int = 2  # AI jobs one user may have running at once per process
+    task_queue_deadline_seconds: float = 180.0  # run time limit of AI jobs without their own deadline
+    task_queue_abandon_seconds: float = 120.0  # cancel AI jobs nobody polled for this long (0 = never)
+    task_queue_execution: str = "inline"  # "inline" (in the API process) or "workers" (python -m app.worker; postgres only)
+    task_queue_claim_interval: float = 2.0  # how often workers look for queued AI jobs when no NOTIFY arrives
+    task_queue_max_attempts: int = 3  # a job cut off by restarts is started over at most this many times in all
+    auth_cache_ttl_seconds: float = 60.0  # users resolved from tokens are reused for this long (0 = off)
+    auth_cache_size: int = 10000  # tokens and users kept per process, least recently used dropped first
+    task_index_memory_bytes: int = 128 * 1024 * 1024  # cap on task search indexes kept per process, LRU users dropped first
+    chat_history_token_limit: int = 2000  # summarise older chat turns once history exceeds this many tokens
+    chat_recent_messages: int = 6  # messages kept verbatim after a chat history is summarised
     admin_email: str = ""  # email of admin user (gets is_admin=True on login)
     google_client_id: str = ""  # Google OAuth Client ID for sign-in
     upload_dir: str = "uploads"
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import os
 import time
@@ -16,7 +17,8 @@ from .config import settings
 from .database import engine
 from .logging_config import setup_logging
 from .models import Base
-from .routers import ai, ai_tasks, auth, feedback, goals, logs, projects, stats, survey, tasks
+from .routers import admin, ai, ai_tasks, auth, feedback, goals, logs, projects, stats, survey, tasks, usage, ws
+from .services import events, latency, llm_pool, llm_usage, morning_plans, task_queue
 
 DEV_MODE = os.getenv("FASTAPI_ENV", "development") != "production"
 
@@ -94,7 +96,54 @@ async def lifespan(app: FastAPI):
         await conn.execute(text(
             "CREATE INDEX IF NOT EXISTS ix_operation_timings_operation_type ON operation_timings (operation_type)"
         ))
+        # Auto-migrate: add prompt-cache token columns to llm_usage if missing
+        await conn.execute(text(
+            "ALTER TABLE llm_usage ADD COLUMN IF NOT EXISTS cached_tokens BIGINT DEFAULT 0"
+        ))
+        await conn.execute(text(
+            "ALTER TABLE llm_usage ADD COLUMN IF NOT EXISTS cache_write_tokens BIGINT DEFAULT 0"
+        ))
+        # Auto-migrate: add aliases column to chat_sessions if missing
+        await conn.execute(text(
+            "ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS aliases JSONB DEFAULT '{}'::jsonb"
+        ))
+        # Auto-migrate: add polled_at column to ai_jobs if missing
+        await conn.execute(text(
+            "ALTER TABLE ai_jobs ADD COLUMN IF NOT EXISTS polled_at TIMESTAMPTZ"
+        ))
+        # Auto-migrate: add worker-process job columns to ai_jobs if missing
+        await conn.execute(text(
+            "ALTER TABLE ai_jobs ADD COLUMN IF NOT EXISTS payload JSONB"
+        ))
+        await conn.execute(text(
+            "ALTER TABLE ai_jobs ADD COLUMN IF NOT EXISTS priority SMALLINT DEFAULT 1"
+        ))
+        await conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_ai_jobs_claim ON ai_jobs (priority, created_at) "
+            "WHERE status = 'queued' AND worker_id IS NULL"
+        ))
+        await conn.execute(text(
+            "ALTER TABLE ai_jobs ADD COLUMN IF NOT EXISTS attempts SMALLINT DEFAULT 0"
+        ))
+
+    llm_pool.start()
+    background: list[asyncio.Task] = [
+        asyncio.create_task(llm_usage.run_flusher()),
+        asyncio.create_task(latency.run_flusher()),
+        asyncio.create_task(llm_pool.warm()),
+        asyncio.create_task(task_queue.run_maintenance()),
+        asyncio.create_task(events.run_listener()),
+    ]
+    if task_queue.claims_in_api():
+        background.append(asyncio.create_task(task_queue.run_worker()))
+    if settings.morning_plan_precompute:
+        background.append(asyncio.create_task(morning_plans.run_scheduler()))
     yield
+    await task_queue.drain()
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    await llm_pool.close()
 
 
 app = FastAPI(title="TodoPilot API", version="1.0.0", lifespan=lifespan)
@@ -188,6 +237,9 @@ app.include_router(ai_tasks.router, prefix="/api")
 app.include_router(survey.router, prefix="/api")
 app.include_router(feedback.router, prefix="/api")
 app.include_router(logs.router, prefix="/api")
+app.include_router(usage.router, prefix="/api")
+app.include_router(admin.router, prefix="/api")
+app.include_router(ws.router, prefix="/api")
 
 
 @app.get("/api/health")
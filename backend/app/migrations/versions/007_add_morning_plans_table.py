@@ -0,0 +1,31 @@
+"""Add morning_plans table for precomputed AI morning plans
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = "007"
+down_revision = "006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "morning_plans",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True, server_default=sa.text("gen_random_uuid()")),
+        sa.Column("user_id", UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("plan_date", sa.Date(), nullable=False),
+        sa.Column("plan", sa.Text(), nullable=False),
+        sa.Column("tasks_fingerprint", sa.String(100), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.UniqueConstraint("user_id", "plan_date", name="uq_morning_plans_user_date"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("morning_plans")
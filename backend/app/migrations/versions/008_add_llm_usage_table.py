@@ -0,0 +1,43 @@
+"""Add llm_usage table for per-user LLM token and cost accounting
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = "008"
+down_revision = "007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "llm_usage",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True, server_default=sa.text("gen_random_uuid()")),
+        sa.Column("user_id", UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=True),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("operation", sa.String(100), nullable=False),
+        sa.Column("model", sa.String(200), nullable=False),
+        sa.Column("calls", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("errors", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("prompt_tokens", sa.BigInteger(), nullable=False, server_default=sa.text("0")),
+        sa.Column("completion_tokens", sa.BigInteger(), nullable=False, server_default=sa.text("0")),
+        sa.Column("cost_usd", sa.Float(), nullable=False, server_default=sa.text("0")),
+        sa.Column("latency_ms_total", sa.BigInteger(), nullable=False, server_default=sa.text("0")),
+        sa.UniqueConstraint(
+            "user_id", "day", "operation", "model",
+            name="uq_llm_usage_user_day_op_model", postgresql_nulls_not_distinct=True,
+        ),
+    )
+    op.create_index("ix_llm_usage_user_id", "llm_usage", ["user_id"])
+    op.create_index("ix_llm_usage_day", "llm_usage", ["day"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_llm_usage_day", table_name="llm_usage")
+    op.drop_index("ix_llm_usage_user_id", table_name="llm_usage")
+    op.drop_table("llm_usage")
@@ -0,0 +1,23 @@
+"""Add prompt-cache token columns to llm_usage
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "009"
+down_revision = "008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("llm_usage", sa.Column("cached_tokens", sa.BigInteger(), nullable=False, server_default=sa.text("0")))
+    op.add_column("llm_usage", sa.Column("cache_write_tokens", sa.BigInteger(), nullable=False, server_default=sa.text("0")))
+
+
+def downgrade() -> None:
+    op.drop_column("llm_usage", "cache_write_tokens")
+    op.drop_column("llm_usage", "cached_tokens")
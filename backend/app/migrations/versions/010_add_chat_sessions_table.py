@@ -0,0 +1,33 @@
+"""Add chat_sessions table for server-side AI chat history
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+
+revision = "010"
+down_revision = "009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "chat_sessions",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True, server_default=sa.text("gen_random_uuid()")),
+        sa.Column("user_id", UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("summary", sa.Text(), nullable=True),
+        sa.Column("messages", JSONB(), nullable=False, server_default=sa.text("'[]'::jsonb")),
+        sa.Column("summarized_count", sa.Integer(), nullable=False, server_default=sa.text("0")),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_chat_sessions_user_id", "chat_sessions", ["user_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_chat_sessions_user_id", table_name="chat_sessions")
+    op.drop_table("chat_sessions")
@@ -0,0 +1,25 @@
+"""Add aliases column to chat_sessions for compact IDs in LLM context
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+revision = "011"
+down_revision = "010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "chat_sessions",
+        sa.Column("aliases", JSONB(), nullable=False, server_default=sa.text("'{}'::jsonb")),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("chat_sessions", "aliases")
@@ -0,0 +1,39 @@
+"""Add ai_jobs table for the durable AI task queue
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+
+revision = "012"
+down_revision = "011"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "ai_jobs",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True, server_default=sa.text("gen_random_uuid()")),
+        sa.Column("user_id", UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=True),
+        sa.Column("operation_type", sa.String(100), nullable=True),
+        sa.Column("status", sa.String(20), nullable=False, server_default="running"),
+        sa.Column("result", JSONB(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("progress", JSONB(), nullable=True),
+        sa.Column("worker_id", sa.String(200), nullable=True),
+        sa.Column("lease_expires_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_ai_jobs_user_id", "ai_jobs", ["user_id"])
+    op.create_index("ix_ai_jobs_status", "ai_jobs", ["status"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_ai_jobs_status", table_name="ai_jobs")
+    op.drop_index("ix_ai_jobs_user_id", table_name="ai_jobs")
+    op.drop_table("ai_jobs")
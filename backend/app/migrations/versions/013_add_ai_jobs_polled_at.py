@@ -0,0 +1,21 @@
+"""Add polled_at to ai_jobs for cancelling abandoned AI jobs
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "013"
+down_revision = "012"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("ai_jobs", sa.Column("polled_at", sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("ai_jobs", "polled_at")
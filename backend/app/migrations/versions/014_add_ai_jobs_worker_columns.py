@@ -0,0 +1,31 @@
+"""Add payload and priority to ai_jobs for dedicated AI worker processes
+
+Revision ID: 014
+Revises: 013
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+revision = "014"
+down_revision = "013"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("ai_jobs", sa.Column("payload", JSONB(), nullable=True))
+    op.add_column("ai_jobs", sa.Column("priority", sa.SmallInteger(), nullable=False, server_default="1"))
+    op.create_index(
+        "ix_ai_jobs_claim",
+        "ai_jobs",
+        ["priority", "created_at"],
+        postgresql_where=sa.text("status = 'queued' AND worker_id IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_ai_jobs_claim", table_name="ai_jobs")
+    op.drop_column("ai_jobs", "priority")
+    op.drop_column("ai_jobs", "payload")
@@ -0,0 +1,21 @@
+"""Add attempts to ai_jobs so jobs cut off by restarts can be started over
+
+Revision ID: 015
+Revises: 014
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "015"
+down_revision = "014"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("ai_jobs", sa.Column("attempts", sa.SmallInteger(), nullable=False, server_default="0"))
+
+
+def downgrade() -> None:
+    op.drop_column("ai_jobs", "attempts")
@@ -0,0 +1,31 @@
+"""Add survey_prefetches table so every API process sees speculative survey steps
+
+Revision ID: 016
+Revises: 015
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = "016"
+down_revision = "015"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "survey_prefetches",
+        sa.Column("user_id", UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("week_start", sa.Date(), primary_key=True),
+        sa.Column("step", sa.SmallInteger(), primary_key=True),
+        sa.Column("fingerprint", sa.String(40), nullable=False),
+        sa.Column("task_id", UUID(as_uuid=True), nullable=True),
+        sa.Column("taken", sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("survey_prefetches")
@@ -1,7 +1,10 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import Boolean, Date, DateTime, ForeignKey, Integer, String, Text, func
+from sqlalchemy import (
+    BigInteger, Boolean, Date, DateTime, Float, ForeignKey, Index, Integer, SmallInteger, String, Text,
+    UniqueConstraint, func, text,
+)
 from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
@@ -129,6 +132,101 @@ class OperationTiming(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
 
+class MorningPlan(Base):
+    """AI morning plan built ahead of time, valid while the user's tasks stay unchanged."""
+    __tablename__ = "morning_plans"
+    __table_args__ = (UniqueConstraint("user_id", "plan_date", name="uq_morning_plans_user_date"),)
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    plan_date: Mapped[datetime] = mapped_column(Date, nullable=False)  # user's local date
+    plan: Mapped[str] = mapped_column(Text, nullable=False)
+    tasks_fingerprint: Mapped[str] = mapped_column(String(100), nullable=False)  # tasks state the plan was built from
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+
+class SurveyPrefetch(Base):
+    """Survey step generation started ahead of the wizard, shared by all API processes (services.survey_prefetch)."""
+    __tablename__ = "survey_prefetches"
+
+    user_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    week_start: Mapped[datetime] = mapped_column(Date, primary_key=True)
+    step: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    fingerprint: Mapped[str] = mapped_column(String(40), nullable=False)  # answers the generation was built from
+    task_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True))  # ai_jobs id, None while being submitted
+    taken: Mapped[bool] = mapped_column(Boolean, default=False)  # handed to /survey/generate already
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+
+class ChatSession(Base):
+    """Server-side AI chat history: rolling summary of older turns plus recent messages."""
+    __tablename__ = "chat_sessions"
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    summary: Mapped[str | None] = mapped_column(Text)  # summary of turns no longer kept verbatim
+    messages: Mapped[list] = mapped_column(JSONB, default=list)  # recent [{"role", "content"}]
+    summarized_count: Mapped[int] = mapped_column(Integer, default=0)  # messages folded into summary
+    aliases: Mapped[dict] = mapped_column(JSONB, default=dict)  # short id used in prompts ("t17", "p3") -> UUID
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+
+
+class LLMUsage(Base):
+    """Daily LLM token/cost totals per user, operation and model."""
+    __tablename__ = "llm_usage"
+    __table_args__ = (
+        UniqueConstraint(
+            "user_id", "day", "operation", "model",
+            name="uq_llm_usage_user_day_op_model", postgresql_nulls_not_distinct=True,
+        ),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id: Mapped[uuid.UUID | None] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), index=True)
+    day: Mapped[datetime] = mapped_column(Date, nullable=False, index=True)  # UTC date
+    operation: Mapped[str] = mapped_column(String(100), nullable=False)
+    model: Mapped[str] = mapped_column(String(200), nullable=False)
+    calls: Mapped[int] = mapped_column(Integer, default=0)
+    errors: Mapped[int] = mapped_column(Integer, default=0)
+    prompt_tokens: Mapped[int] = mapped_column(BigInteger, default=0)
+    completion_tokens: Mapped[int] = mapped_column(BigInteger, default=0)
+    cost_usd: Mapped[float] = mapped_column(Float, default=0)
+    latency_ms_total: Mapped[int] = mapped_column(BigInteger, default=0)
+    cached_tokens: Mapped[int] = mapped_column(BigInteger, default=0)  # prompt tokens read from provider cache
+    cache_write_tokens: Mapped[int] = mapped_column(BigInteger, default=0)  # prompt tokens written to provider cache
+
+
+class AIJob(Base):
+    """Background AI job state and result, shared by all API processes (task_queue postgres backend)."""
+    __tablename__ = "ai_jobs"
+    __table_args__ = (
+        # Worker processes claim unassigned queued jobs by priority, oldest first
+        Index(
+            "ix_ai_jobs_claim", "priority", "created_at",
+            postgresql_where=text("status = 'queued' AND worker_id IS NULL"),
+        ),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id: Mapped[uuid.UUID | None] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), index=True)
+    operation_type: Mapped[str | None] = mapped_column(String(100))
+    status: Mapped[str] = mapped_column(String(20), default="running", index=True)  # queued, running, done, error
+    result: Mapped[dict | list | None] = mapped_column(JSONB)
+    error: Mapped[str | None] = mapped_column(Text)
+    progress: Mapped[dict | None] = mapped_column(JSONB)  # partial results published while running
+    worker_id: Mapped[str | None] = mapped_column(String(200))  # process holding the lease
+    lease_expires_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))  # extended by heartbeats
+    polled_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))  # last sign a client still waits
+    payload: Mapped[dict | None] = mapped_column(JSONB)  # {"job", "args", "unattended"}: what any process needs to run it
+    priority: Mapped[int] = mapped_column(SmallInteger, default=1)  # job_scheduler class: 0 interactive .. 2 background
+    attempts: Mapped[int] = mapped_column(SmallInteger, default=0)  # times a process started the job
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+
+
 class Feedback(Base):
     __tablename__ = "feedback"
 
@@ -0,0 +1,62 @@
+"""Admin-only operational metrics."""
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from ..models import User
+from ..services import ai_service, llm_breaker, llm_pool, queue_metrics, task_queue, user_cache
+from .auth import require_admin
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.get("/llm-pool")
+async def llm_pool_stats(admin: User = Depends(require_admin)):
+    """Connection reuse and handshake times of the shared LLM provider pool."""
+    return llm_pool.stats()
+
+
+@router.get("/llm-routing")
+async def llm_routing_stats(admin: User = Depends(require_admin)):
+    """Model routing policy and observed latency per operation, tier and model."""
+    return ai_service.routing_stats()
+
+
+@router.get("/llm-breakers")
+async def llm_breakers(admin: User = Depends(require_admin)):
+    """Circuit breaker state per LLM provider."""
+    return llm_breaker.snapshot()
+
+
+@router.post("/llm-breakers/{key}/reset")
+async def reset_llm_breaker(key: str, admin: User = Depends(require_admin)):
+    """Close a provider's circuit by hand (e.g. after the provider confirmed recovery)."""
+    if not llm_breaker.reset(key):
+        raise HTTPException(404, "Breaker not found")
+    return {"ok": True}
+
+
+@router.get("/task-queue")
+async def task_queue_stats(admin: User = Depends(require_admin)):
+    """AI jobs of this process: scheduler queues and resident results (jobs, bytes, evictions)."""
+    return task_queue.stats()
+
+
+@router.get("/metrics")
+async def metrics(admin: User = Depends(require_admin)):
+    """AI job queue telemetry of this process: counters, wait/run histograms and backlog gauges.
+
+    "cluster" counts queued and running jobs of all processes (postgres backend);
+    "auth_cache" is the hit rate of get_current_user's user cache in this process.
+    """
+    return {
+        **queue_metrics.snapshot(),
+        "cluster": await task_queue.cluster_counts(),
+        "auth_cache": user_cache.stats(),
+    }
+
+
+@router.get("/metrics/prometheus", response_class=PlainTextResponse)
+async def metrics_prometheus(admin: User = Depends(require_admin)):
+    """The same telemetry in the Prometheus text format, for scraping with an admin token."""
+    return queue_metrics.prometheus()
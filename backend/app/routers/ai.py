@@ -1,11 +1,12 @@
 import json
+import uuid
 from datetime import date, datetime, timedelta, timezone
 
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy import select, func, cast, Date
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import get_db
+from ..database import async_session, get_db
 from ..models import Goal, Project, Task, User
 from ..schemas import (
     AIChatMessage,
@@ -17,7 +18,13 @@ from ..schemas import (
     TaskAction,
 )
 from ..services import ai_service
+from ..services import chat_sessions
+from ..services import duplicates
+from ..services import job_registry
 from ..services.ai_service import AI_PROVIDERS
+from ..services import llm_usage
+from ..services import morning_plans
+from ..services import task_index
 from ..services import task_queue
 from .auth import get_current_user
 
@@ -36,6 +43,7 @@ async def test_connection(
 ):
     """Test the user's AI provider connection with a simple prompt."""
     user_settings = user.settings or {}
+    llm_usage.bind(user_id=user.id, operation="test_connection")
 
     try:
         result = await ai_service.chat(
@@ -181,18 +189,18 @@ async def ai_chat(
     user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    # Gather context (fast DB queries)
-    result = await db.execute(
-        select(Task).where(Task.user_id == user.id, Task.completed == False).limit(50)  # noqa: E712
-    )
-    tasks = result.scalars().all()
+    # Gather context: tasks related to the message first, then by priority
+    tasks = await task_index.relevant_tasks(user.id, body.message, db)
     tasks_ctx = "\n".join(f"- {t.title} (приоритет: {t.priority}, дедлайн: {t.due_date})" for t in tasks)
 
     messages = [{"role": "user", "content": body.message}]
 
     # Submit LLM call to background queue
-    task_id = await task_queue.submit(
-        ai_service.chat(messages, user_profile=user.profile_text, tasks_context=tasks_ctx, user_settings=user.settings)
+    task_id = await task_queue.submit_job(
+        "chat",
+        {"messages": messages, "user_profile": user.profile_text, "tasks_context": tasks_ctx},
+        operation_type="chat",
+        user_id=user.id,
     )
     return {"task_id": task_id}
 
@@ -204,13 +212,19 @@ async def coaching_analysis(
 ):
     """Coaching analysis based on comprehensive user statistics."""
     stats = await _gather_stats(user, db)
+    task_id = await task_queue.submit_job(
+        "coaching_analysis",
+        {"stats": stats, "user_profile": user.profile_text},
+        operation_type="coaching_analysis",
+        user_id=user.id,
+    )
+    return {"task_id": task_id}
 
-    async def _run():
-        analysis = await ai_service.coaching_analysis(stats, user_profile=user.profile_text, user_settings=user.settings)
-        return {"analysis": analysis, "stats": stats}
 
-    task_id = await task_queue.submit(_run())
-    return {"task_id": task_id}
+@job_registry.register("coaching_analysis")
+async def _coaching_analysis_job(stats: dict, user_profile: str | None, user_settings: dict | None):
+    analysis = await ai_service.coaching_analysis(stats, user_profile=user_profile, user_settings=user_settings)
+    return {"analysis": analysis, "stats": stats}
 
 
 @router.post("/brain-dump")
@@ -219,35 +233,74 @@ async def brain_dump(
     user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """Extract tasks, projects, goals from brain dump text."""
-    async def _run():
-        raw = await ai_service.brain_dump_extract(body.text, user_profile=user.profile_text, user_settings=user.settings)
-        try:
-            parsed = json.loads(raw)
-            items = [BrainDumpItem(**item).model_dump() for item in parsed.get("items", [])]
-            reply = parsed.get("reply", "Готово!")
-        except (json.JSONDecodeError, Exception):
-            return {"reply": "Не удалось распознать структуру. Попробуйте переформулировать.", "items": []}
-        return {"reply": reply, "items": items}
-
-    task_id = await task_queue.submit(_run())
+    """Extract tasks, projects, goals from brain dump text.
+
+    Items are published as task progress while the reply streams in, so the
+    confirm list starts filling before extraction finishes.
+    """
+    task_id = await task_queue.submit_job(
+        "brain_dump",
+        {"user_id": user.id, "text": body.text, "user_profile": user.profile_text},
+        operation_type="brain_dump",
+        user_id=user.id,
+    )
     return {"task_id": task_id}
 
 
+@job_registry.register("brain_dump")
+async def _brain_dump_job(user_id: str, text: str, user_profile: str | None, user_settings: dict | None):
+    partial: list[dict] = []
+
+    def _on_item(item: dict):
+        try:
+            partial.append(BrainDumpItem(**item).model_dump(mode="json"))
+        except (TypeError, ValueError):
+            return
+        task_queue.report({"items": list(partial)})
+
+    try:
+        extracted = await ai_service.brain_dump_extract_items(
+            text, user_profile=user_profile, user_settings=user_settings, on_item=_on_item,
+        )
+        items = [BrainDumpItem(**item).model_dump() for item in extracted["items"]]
+    except (json.JSONDecodeError, ValueError):
+        return {"reply": "Не удалось распознать структуру. Попробуйте переформулировать.", "items": [], "duplicates": []}
+    # Propose merges with existing open tasks, projects and goals before anything is saved
+    async with async_session() as session:
+        dupes = await duplicates.find_duplicates(uuid.UUID(user_id), items, session)
+    return {
+        "reply": extracted["reply"],
+        "items": items,
+        "duplicates": dupes,
+        "failed_chunks": extracted["failed_chunks"],
+    }
+
+
 @router.post("/brain-dump/save")
 async def brain_dump_save(
     body: BrainDumpSaveRequest,
     user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """Save confirmed brain dump items as tasks/projects/goals."""
-    created = {"tasks": 0, "projects": 0, "goals": 0}
+    """Save confirmed brain dump items as tasks/projects/goals.
+
+    Items with merge_into are not created: projects/goals resolve to the existing
+    one for linking, tasks update the existing open task instead.
+    """
+    created = {"tasks": 0, "projects": 0, "goals": 0, "merged": 0}
 
     # First pass: create goals and projects so we can link tasks
     goal_map: dict[str, str] = {}  # name -> id
     project_map: dict[str, str] = {}  # name -> id
 
     for item in body.items:
+        if item.merge_into and item.type in ("goal", "project"):
+            model = Goal if item.type == "goal" else Project
+            existing = await db.get(model, item.merge_into)
+            if existing and existing.user_id == user.id:
+                (goal_map if item.type == "goal" else project_map)[item.title.lower()] = str(existing.id)
+                created["merged"] += 1
+                continue
         if item.type == "goal":
             goal = Goal(title=item.title, user_id=user.id)
             db.add(goal)
@@ -299,6 +352,17 @@ async def brain_dump_save(
             if item.goal and item.goal.lower() in goal_map:
                 task_data["goal_id"] = goal_map[item.goal.lower()]
 
+            if item.merge_into:
+                existing = await db.get(Task, item.merge_into)
+                if existing and existing.user_id == user.id and not existing.completed:
+                    # Keep the existing task, only filling in what the dump adds
+                    existing.priority = max(existing.priority or 0, item.priority)
+                    for field in ("due_date", "project_id", "goal_id"):
+                        if getattr(existing, field) is None and task_data.get(field):
+                            setattr(existing, field, task_data[field])
+                    created["merged"] += 1
+                    continue
+
             task = Task(**task_data)
             db.add(task)
             created["tasks"] += 1
@@ -312,83 +376,42 @@ async def morning_plan(
     user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """Generate morning plan: which task to start with and why."""
-    today = date.today()
-    now = datetime.now(timezone.utc)
-
-    # Today's tasks
-    today_result = await db.execute(
-        select(Task).where(
-            Task.user_id == user.id,
-            Task.completed == False,  # noqa: E712
-            cast(Task.due_date, Date) == today,
-        ).order_by(Task.priority.desc(), Task.position)
-    )
-    today_tasks_raw = today_result.scalars().all()
-
-    # Load projects/goals for context
-    projects_result = await db.execute(select(Project).where(Project.user_id == user.id))
-    projects = {str(p.id): p.title for p in projects_result.scalars().all()}
-
-    goals_result = await db.execute(select(Goal).where(Goal.user_id == user.id))
-    goals_all = goals_result.scalars().all()
-    goals_map = {str(g.id): g.title for g in goals_all}
-
-    today_tasks = [
-        {
-            "title": t.title,
-            "priority": t.priority,
-            "project": projects.get(str(t.project_id), "нет") if t.project_id else "нет",
-            "goal": goals_map.get(str(t.goal_id), "нет") if t.goal_id else "нет",
-        }
-        for t in today_tasks_raw
-    ]
+    """Generate morning plan: which task to start with and why.
+
+    Returns the plan precomputed by the background job when the user's tasks
+    haven't changed since it was built.
+    """
+    plan_date = morning_plans.user_now(user.settings).date()
+    fingerprint = await morning_plans.tasks_fingerprint(user.id, db)
+    stored = await morning_plans.get_stored(user.id, plan_date, fingerprint, db)
+
+    if stored is not None:
+        task_id = await task_queue.submit_job(
+            "morning_plan_cached", {"plan": stored}, operation_type="morning_plan_cached", user_id=user.id,
+        )
+        return {"task_id": task_id}
 
-    # All pending tasks
-    pending_result = await db.execute(
-        select(Task).where(
-            Task.user_id == user.id,
-            Task.completed == False,  # noqa: E712
-        ).order_by(Task.priority.desc(), Task.due_date.asc().nullslast()).limit(20)
+    task_id = await task_queue.submit_job(
+        "morning_plan",
+        {"user_id": user.id, "plan_date": plan_date, "fingerprint": fingerprint},
+        operation_type="morning_plan",
+        user_id=user.id,
     )
-    all_tasks = [
-        {
-            "title": t.title,
-            "priority": t.priority,
-            "due_date": t.due_date.strftime("%d.%m.%Y") if t.due_date else None,
-        }
-        for t in pending_result.scalars().all()
-    ]
-
-    goals_list = [{"title": g.title} for g in goals_all]
+    return {"task_id": task_id}
 
-    # Basic stats
-    week_ago = now - timedelta(days=7)
-    c7d_q = await db.execute(
-        select(func.count(Task.id)).where(
-            Task.user_id == user.id,
-            Task.completed == True,  # noqa: E712
-            Task.completed_at >= week_ago,
-        )
-    )
-    completed_7d = c7d_q.scalar() or 0
 
-    overdue_q = await db.execute(
-        select(func.count(Task.id)).where(
-            Task.user_id == user.id,
-            Task.completed == False,  # noqa: E712
-            Task.due_date < now,
-        )
-    )
-    overdue_tasks = overdue_q.scalar() or 0
+@job_registry.register("morning_plan_cached")
+async def _morning_plan_cached_job(plan: str):
+    return plan
 
-    stats = {"avg_daily_7d": completed_7d / 7, "overdue_tasks": overdue_tasks}
-    profile = user.profile_text
 
-    task_id = await task_queue.submit(
-        ai_service.morning_plan(today_tasks, all_tasks, goals_list, stats, user_profile=profile, user_settings=user.settings)
-    )
-    return {"task_id": task_id}
+@job_registry.register("morning_plan")
+async def _morning_plan_job(user_id: str, plan_date: str, fingerprint: str):
+    async with async_session() as session:
+        user = await session.get(User, uuid.UUID(user_id))
+        if user is None:
+            raise ValueError("Пользователь не найден")
+        return await morning_plans.generate(user, session, date.fromisoformat(plan_date), fingerprint)
 
 
 @router.post("/smart-chat")
@@ -397,45 +420,111 @@ async def smart_chat(
     user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """AI chat that can create/complete/move tasks via action buttons."""
-    # Gather tasks context with IDs
-    result = await db.execute(
-        select(Task).where(Task.user_id == user.id, Task.completed == False).limit(50)  # noqa: E712
-    )
-    tasks = result.scalars().all()
-    tasks_ctx = "\n".join(
-        f"- [id:{t.id}] {t.title} (приоритет: {t.priority}, дедлайн: {t.due_date}, проект: {t.project_id})"
-        for t in tasks
-    )
+    """AI chat that can create/complete/move tasks via action buttons.
+
+    History lives in a server-side chat session: the client sends session_id and
+    the new message, the prompt gets the session summary plus recent turns.
+    """
+    session = await chat_sessions.get_or_create(db, user.id, body.session_id)
+    if not session.messages and not session.summary and body.history:
+        session.messages = [{"role": m.get("role"), "content": m.get("content", "")} for m in body.history]
+        await db.commit()
+    history = chat_sessions.prompt_history(session)
+    session_id = session.id
+
+    # Gather tasks context with IDs: tasks related to the conversation first, then by priority
+    recent_user = [m["content"] for m in session.messages or [] if m.get("role") == "user"][-1:]
+    tasks = await task_index.relevant_tasks(user.id, " ".join(recent_user + [body.message]), db)
 
     # Gather projects context
     proj_result = await db.execute(select(Project).where(Project.user_id == user.id))
     projects = proj_result.scalars().all()
-    projects_ctx = "\n".join(f"- [id:{p.id}] {p.title}" for p in projects)
+
+    # Short per-session aliases (t17, p3) instead of UUIDs in the prompt
+    task_alias = chat_sessions.assign_aliases(session, "t", [t.id for t in tasks])
+    project_alias = chat_sessions.assign_aliases(session, "p", [p.id for p in projects])
+    await db.commit()
+    aliases = dict(session.aliases)
+    titles = {str(t.id): t.title for t in tasks}
+
+    tasks_ctx = "\n".join(
+        f"- [{task_alias[str(t.id)]}] {t.title} (приоритет: {t.priority}, "
+        f"дедлайн: {t.due_date.strftime('%Y-%m-%d') if t.due_date else 'нет'}, "
+        f"проект: {project_alias.get(str(t.project_id), 'нет') if t.project_id else 'нет'})"
+        for t in tasks
+    )
+    projects_ctx = "\n".join(f"- [{project_alias[str(p.id)]}] {p.title}" for p in projects)
 
     # Build message history
-    messages = body.history + [{"role": "user", "content": body.message}]
-    profile = user.profile_text
-    u_settings = user.settings
-
-    async def _run():
-        raw = await ai_service.chat_with_actions(
-            messages,
-            tasks_context=tasks_ctx,
-            projects_context=projects_ctx,
-            user_profile=profile,
-            user_settings=u_settings,
-        )
-        try:
-            parsed = json.loads(raw)
-            reply = parsed.get("reply", raw)
-            actions = [TaskAction(**a).model_dump() for a in parsed.get("actions", [])]
-            return {"reply": reply, "actions": actions}
-        except (json.JSONDecodeError, Exception):
-            return {"reply": raw, "actions": []}
-
-    task_id = await task_queue.submit(_run())
-    return {"task_id": task_id}
+    messages = history + [{"role": "user", "content": body.message}]
+
+    task_id = await task_queue.submit_job(
+        "smart_chat",
+        {
+            "session_id": session_id,
+            "message": body.message,
+            "messages": messages,
+            "tasks_context": tasks_ctx,
+            "projects_context": projects_ctx,
+            "user_profile": user.profile_text,
+            "aliases": aliases,
+            "titles": titles,
+        },
+        operation_type="smart_chat",
+        user_id=user.id,
+    )
+    return {"task_id": task_id, "session_id": str(session_id)}
+
+
+@job_registry.register("smart_chat")
+async def _smart_chat_job(
+    session_id: str,
+    message: str,
+    messages: list[dict],
+    tasks_context: str,
+    projects_context: str,
+    user_profile: str | None,
+    user_settings: dict | None,
+    aliases: dict[str, str],
+    titles: dict[str, str],
+):
+    raw = await ai_service.chat_with_actions(
+        messages,
+        tasks_context=tasks_context,
+        projects_context=projects_context,
+        user_profile=user_profile,
+        user_settings=user_settings,
+    )
+    try:
+        parsed = json.loads(raw)
+        reply = parsed.get("reply", raw)
+        actions = [TaskAction(**a).model_dump() for a in parsed.get("actions", [])]
+    except (json.JSONDecodeError, Exception):
+        reply, actions = raw, []
+    actions = _resolve_action_aliases(actions, aliases, titles)
+    await chat_sessions.append_turn(uuid.UUID(session_id), message, reply, user_settings)
+    return {"reply": reply, "actions": actions, "session_id": session_id}
+
+
+def _resolve_action_aliases(actions: list[dict], aliases: dict[str, str], titles: dict[str, str]) -> list[dict]:
+    """Translate t17/p3 aliases in model actions back to real ids; drop actions pointing nowhere."""
+    resolved = []
+    for action in actions:
+        if action.get("task_id"):
+            action["task_id"] = chat_sessions.resolve_alias(aliases, action["task_id"], "t")
+            if action["task_id"] is None:
+                continue
+            action["title"] = action.get("title") or titles.get(action["task_id"])
+        elif action.get("action") in ("complete", "move"):
+            continue
+        if action.get("project_id"):
+            action["project_id"] = chat_sessions.resolve_alias(aliases, action["project_id"], "p")
+            if action["project_id"] is None and action.get("action") == "move":
+                continue
+        if action.get("goal_id"):
+            action["goal_id"] = chat_sessions.resolve_alias(aliases, action["goal_id"], "g")
+        resolved.append(action)
+    return resolved
 
 
 @router.post("/smart-chat/execute-action")
@@ -445,6 +534,14 @@ async def execute_action(
     db: AsyncSession = Depends(get_db),
 ):
     """Execute a task action suggested by AI chat."""
+    for field in ("task_id", "project_id", "goal_id"):
+        value = getattr(body, field)
+        if value:
+            try:
+                uuid.UUID(value)
+            except ValueError:
+                raise HTTPException(404, f"Unknown {field}: {value}")
+
     if body.action == "create":
         if not body.title:
             raise HTTPException(400, "Title required for create action")
@@ -518,8 +615,11 @@ async def productivity_analysis(
     tasks = [{"title": t.title, "completed_at": str(t.completed_at)} for t in result.scalars().all()]
     profile = user.profile_text
 
-    task_id = await task_queue.submit(
-        ai_service.analyze_productivity(tasks, user_profile=profile, user_settings=user.settings)
+    task_id = await task_queue.submit_job(
+        "productivity_analysis",
+        {"completed_tasks": tasks, "user_profile": profile},
+        operation_type="productivity_analysis",
+        user_id=user.id,
     )
     return {"task_id": task_id}
 
@@ -533,14 +633,35 @@ async def weekly_retrospective(
     result = await db.execute(
         select(Task).where(Task.user_id == user.id, Task.created_at >= week_ago)
     )
-    tasks = [{"title": t.title, "completed": t.completed} for t in result.scalars().all()]
+    week_tasks = result.scalars().all()
 
     goals_result = await db.execute(select(Goal).where(Goal.user_id == user.id))
-    goals = [{"title": g.title} for g in goals_result.scalars().all()]
+    goal_rows = goals_result.scalars().all()
+    goals = [{"title": g.title} for g in goal_rows]
+    goals_map = {g.id: g.title for g in goal_rows}
+
+    project_ids = {t.project_id for t in week_tasks if t.project_id}
+    projects_map = {}
+    if project_ids:
+        proj_result = await db.execute(select(Project.id, Project.title).where(Project.id.in_(project_ids)))
+        projects_map = {row.id: row.title for row in proj_result.all()}
+    # Grouped by project and goal when the week is too long to list task by task
+    tasks = [
+        {
+            "title": t.title,
+            "completed": t.completed,
+            "project_title": projects_map.get(t.project_id, ""),
+            "goal_title": goals_map.get(t.goal_id, ""),
+        }
+        for t in week_tasks
+    ]
     profile = user.profile_text
 
-    task_id = await task_queue.submit(
-        ai_service.weekly_retrospective(tasks, goals, user_profile=profile, user_settings=user.settings)
+    task_id = await task_queue.submit_job(
+        "retrospective",
+        {"week_tasks": tasks, "goals": goals, "user_profile": profile},
+        operation_type="retrospective",
+        user_id=user.id,
     )
     return {"task_id": task_id}
 
@@ -548,7 +669,16 @@ async def weekly_retrospective(
 @router.post("/onboarding")
 async def onboarding(body: AIMessage, user: User = Depends(get_current_user)):
     history = []
-    task_id = await task_queue.submit(
-        ai_service.onboarding_chat(body.message, history, user_settings=user.settings)
+    task_id = await task_queue.submit_job(
+        "onboarding",
+        {"message": body.message, "history": history},
+        operation_type="onboarding",
+        user_id=user.id,
     )
     return {"task_id": task_id}
+
+
+job_registry.register("chat", ai_service.chat)
+job_registry.register("productivity_analysis", ai_service.analyze_productivity)
+job_registry.register("retrospective", ai_service.weekly_retrospective)
+job_registry.register("onboarding", ai_service.onboarding_chat)
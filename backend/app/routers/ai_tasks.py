@@ -2,53 +2,61 @@
 Generic polling endpoint for background AI tasks.
 
 All AI endpoints that take long return { task_id: "..." }.
-Frontend polls this endpoint until status is "done" or "error".
+Frontend polls this endpoint until status is "done" or "error" (long-polling
+with ?wait=); running tasks may include partial results in "progress" and
+an "eta" from the in-memory latency estimates. DELETE cancels a task the client no longer waits for.
 """
-from fastapi import APIRouter, HTTPException
-from sqlalchemy import func, select
-from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi import Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 
-from ..database import get_db
-from ..models import OperationTiming
-from ..services import task_queue
+from ..models import User
+from ..services import latency, task_queue
+from .auth import get_current_user
 
 router = APIRouter(prefix="/ai-tasks", tags=["ai-tasks"])
 
 
 @router.get("/avg-duration/{operation_type}")
-async def get_avg_duration(
-    operation_type: str,
-    db: AsyncSession = Depends(get_db),
-):
-    """Get average duration (ms) for an operation type, based on last 20 runs across all users."""
-    recent = (
-        select(OperationTiming.duration_ms)
-        .where(OperationTiming.operation_type == operation_type)
-        .order_by(OperationTiming.created_at.desc())
-        .limit(20)
-        .subquery()
-    )
-    result = await db.execute(select(func.avg(recent.c.duration_ms)))
-    avg_ms = result.scalar()
-    return {"avg_duration_ms": int(avg_ms) if avg_ms else None}
+async def get_avg_duration(operation_type: str):
+    """Typical duration (ms) of an operation type across all users, from memory."""
+    stats = latency.estimate(operation_type)
+    if stats is None:
+        return {"avg_duration_ms": None, "p50_ms": None, "p90_ms": None}
+    return {"avg_duration_ms": stats["ewma_ms"], "p50_ms": stats["p50_ms"], "p90_ms": stats["p90_ms"]}
 
 
 @router.get("/{task_id}")
-async def get_task_status(task_id: str):
-    task = task_queue.get(task_id)
+async def get_task_status(task_id: str, wait: float = Query(0, ge=0, le=30)):
+    """Task status. With ?wait=N, a running task is held open for up to N seconds
+    and answered as soon as it finishes or reports progress (long-poll)."""
+    task = await task_queue.wait(task_id, wait) if wait else await task_queue.get(task_id, touch=True)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
-    if task["status"] == "running":
-        return {"status": "running"}
+    if task["status"] in task_queue.ACTIVE:
+        # Jobs waiting for a worker look running to clients; "queued" tells them apart
+        return {
+            "status": "running",
+            "queued": task["status"] == "queued",
+            "progress": task.get("progress"),
+            "eta": task_queue.eta(task),
+        }
 
     if task["status"] == "error":
         error = task["error"]
-        task_queue.remove(task_id)
+        await task_queue.remove(task_id)
         return {"status": "error", "error": error}
 
     # done
     result = task["result"]
-    task_queue.remove(task_id)
+    await task_queue.remove(task_id)
     return {"status": "done", "result": result}
+
+
+@router.delete("/{task_id}")
+async def cancel_task(task_id: str, user: User = Depends(get_current_user)):
+    """Cancel a queued or running task together with its LLM request.
+
+    Idempotent: finished, already fetched or unknown tasks are left as they are.
+    """
+    await task_queue.cancel(task_id, user.id)
+    return {"ok": True}
@@ -7,13 +7,16 @@ import httpx
 from email.message import EmailMessage
 from fastapi import APIRouter, Depends, HTTPException
 from jose import jwt
-from sqlalchemy import select
+from sqlalchemy import Text, cast, func, literal, select, update
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 
 from ..config import settings
 from ..database import get_db
 from ..models import AuthCode, User
 from ..schemas import AuthRequest, AuthVerify, GoogleAuthRequest, TokenResponse, UserOut, UserUpdate
+from ..services import user_cache
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -23,18 +26,45 @@ def create_token(user_id: str) -> str:
     return jwt.encode({"sub": user_id, "exp": expire}, settings.jwt_secret, algorithm=settings.jwt_algorithm)
 
 
+def decode_token(token: str) -> str | None:
+    """User id from a valid JWT, None if the token is invalid or expired."""
+    user_id = user_cache.token_user_id(token)
+    if user_id is not None:
+        return user_id
+    try:
+        payload = jwt.decode(token, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
+    except Exception:
+        return None
+    user_id = payload.get("sub")
+    if user_id:
+        user_cache.put_token(token, user_id, payload.get("exp"))
+    return user_id
+
+
 async def get_current_user(
     db: AsyncSession = Depends(get_db),
     token: str = Depends(__import__("fastapi.security", fromlist=["HTTPBearer"]).HTTPBearer()),
 ) -> User:
-    try:
-        payload = jwt.decode(token.credentials, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
-        user_id = payload.get("sub")
-    except Exception:
+    user_id = decode_token(token.credentials)
+    if not user_id:
         raise HTTPException(status_code=401, detail="Invalid token")
+    snapshot = user_cache.get_user(user_id)
+    if snapshot is not None:
+        # Attached to the session as if loaded, without a query; changes still flush on commit
+        user = User(**snapshot)
+        make_transient_to_detached(user)
+        return await db.merge(user, load=False)
+    version = user_cache.version()
     user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
+    user_cache.put_user(user, version)
+    return user
+
+
+async def require_admin(user: User = Depends(get_current_user)) -> User:
+    if not user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin access required")
     return user
 
 
@@ -93,6 +123,7 @@ async def verify_code(body: AuthVerify, db: AsyncSession = Depends(get_db)):
 
     await db.commit()
     await db.refresh(user)
+    await user_cache.invalidate(user.id)
     return TokenResponse(access_token=create_token(str(user.id)))
 
 
@@ -128,6 +159,7 @@ async def google_auth(body: GoogleAuthRequest, db: AsyncSession = Depends(get_db
 
     await db.commit()
     await db.refresh(user)
+    await user_cache.invalidate(user.id)
     return TokenResponse(access_token=create_token(str(user.id)))
 
 
@@ -138,8 +170,23 @@ async def get_me(user: User = Depends(get_current_user)):
 
 @router.patch("/me", response_model=UserOut)
 async def update_me(body: UserUpdate, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
-    for field, value in body.model_dump(exclude_unset=True).items():
+    """Update profile fields. `settings` is a patch: given keys are set, keys set to null are removed."""
+    data = body.model_dump(exclude_unset=True)
+    patch = data.pop("settings", None)
+    for field, value in data.items():
         setattr(user, field, value)
+    if patch:
+        # Merged in SQL, so keys changed meanwhile by another tab or route aren't overwritten
+        kept = {k: v for k, v in patch.items() if v is not None}
+        removed = [k for k, v in patch.items() if v is None]
+        merged = func.coalesce(User.settings, cast({}, JSONB)).op("||")(literal(kept, JSONB))
+        await db.execute(
+            update(User)
+            .where(User.id == user.id)
+            .values(settings=merged.op("-")(literal(removed, ARRAY(Text))))
+            .execution_options(synchronize_session=False)
+        )
     await db.commit()
     await db.refresh(user)
+    await user_cache.invalidate(user.id)
     return user
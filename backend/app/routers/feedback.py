@@ -11,19 +11,13 @@ from ..config import settings
 from ..database import get_db
 from ..models import Feedback, User
 from ..schemas import FeedbackOut, FeedbackAdminOut, FeedbackAdminUpdate
-from .auth import get_current_user
+from .auth import get_current_user, require_admin
 
 router = APIRouter(prefix="/feedback", tags=["feedback"])
 
 UPLOAD_DIR = Path(settings.upload_dir) / "feedback"
 
 
-async def require_admin(user: User = Depends(get_current_user)) -> User:
-    if not user.is_admin:
-        raise HTTPException(status_code=403, detail="Admin access required")
-    return user
-
-
 @router.post("", response_model=FeedbackOut)
 async def create_feedback(
     category: str = Form(...),
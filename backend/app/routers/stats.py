@@ -8,6 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from ..database import get_db
 from ..models import Task, User, Project
 from ..schemas import DayStat
+from ..services import user_cache
 from .auth import get_current_user
 
 router = APIRouter(prefix="/stats", tags=["stats"])
@@ -76,6 +77,7 @@ async def get_dashboard_token(
         user.settings = settings
         db.add(user)
         await db.commit()
+        await user_cache.invalidate(user.id)
     return {"token": settings["dashboard_token"]}
 
 
@@ -1,10 +1,11 @@
+import uuid
 from datetime import date, datetime, timedelta, timezone
 
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..database import get_db
+from ..database import async_session, get_db
 from ..models import Goal, Project, Task, User, WeeklySurvey
 from ..schemas import (
     SurveyGenerateRequest,
@@ -16,7 +17,10 @@ from ..schemas import (
     SurveyUpdateRequest,
 )
 from ..services import ai_service
+from ..services import job_registry
+from ..services import survey_prefetch
 from ..services import task_queue
+from ..services import user_cache
 from .auth import get_current_user
 
 router = APIRouter(prefix="/survey", tags=["survey"])
@@ -71,6 +75,89 @@ async def _get_previous_retrospective(
     }
 
 
+async def _gather_step_inputs(user_id, monday, db: AsyncSession) -> dict:
+    """Collect the context generate_survey_step needs besides the user's answers."""
+    # Fetch last week's tasks
+    week_ago = datetime.now(timezone.utc) - timedelta(days=7)
+    tasks_result = await db.execute(
+        select(Task).where(
+            Task.user_id == user_id,
+            Task.created_at >= week_ago,
+        )
+    )
+    tasks = tasks_result.scalars().all()
+
+    # Fetch project titles for context
+    project_ids = {t.project_id for t in tasks if t.project_id}
+    projects_map = {}
+    if project_ids:
+        proj_result = await db.execute(
+            select(Project).where(Project.id.in_(project_ids))
+        )
+        projects_map = {p.id: p.title for p in proj_result.scalars().all()}
+
+    # Fetch goals
+    goals_result = await db.execute(select(Goal).where(Goal.user_id == user_id))
+    goal_rows = goals_result.scalars().all()
+    goals = [{"title": g.title} for g in goal_rows]
+    goals_map = {g.id: g.title for g in goal_rows}
+
+    week_tasks = [
+        {
+            "title": t.title,
+            "completed": t.completed,
+            "project_title": projects_map.get(t.project_id, ""),
+            "goal_title": goals_map.get(t.goal_id, ""),
+        }
+        for t in tasks
+    ]
+
+    # Fetch previous retrospective for context
+    previous_retrospective = await _get_previous_retrospective(user_id, monday, db)
+
+    return {
+        "week_tasks": week_tasks,
+        "goals": goals,
+        "previous_retrospective": previous_retrospective,
+    }
+
+
+def _draft_answers(survey: WeeklySurvey | None, prev_goals: list[str], step: int) -> dict:
+    """Build previous_answers for a step the same way the wizard sends them from a draft."""
+    outcomes = (survey.goal_outcomes if survey else None) or [
+        {"goal": g, "completed": None} for g in prev_goals
+    ]
+    answers: dict = {}
+    if outcomes:
+        answers["goal_outcomes"] = outcomes
+    if step >= 4:
+        answers["achievements"] = (survey.achievements if survey else None) or []
+        answers["difficulties"] = (survey.difficulties if survey else None) or []
+    if step >= 5:
+        answers["improvements"] = (survey.improvements if survey else None) or []
+    return answers
+
+
+async def _speculate(user: User, monday, step: int, previous_answers: dict, db: AsyncSession):
+    """Start generating suggestions for a step at background priority before the wizard asks."""
+    async def _submit() -> str:
+        inputs = await _gather_step_inputs(user.id, monday, db)
+        return await task_queue.submit_job(
+            "generate_survey_step",
+            {
+                "step": step,
+                "user_profile": user.profile_text,
+                "previous_answers": previous_answers or None,
+                **inputs,
+            },
+            operation_type=f"survey_generate_step_{step}_speculative",
+            user_id=user.id,
+            unattended=True,
+        )
+
+    await survey_prefetch.schedule(user.id, monday, step, previous_answers, _submit)
+
+
 @router.get("/status", response_model=SurveyStatusOut)
 async def survey_status(
     user: User = Depends(get_current_user),
@@ -105,6 +192,7 @@ async def survey_status(
     survey = result.scalar_one_or_none()
 
     if survey is None:
+        await _speculate(user, monday, 2, _draft_answers(None, prev_goals, 2), db)
         return SurveyStatusOut(
             should_show=True,
             previous_week_goals=prev_goals or None,
@@ -130,6 +218,7 @@ async def survey_status(
         )
 
     # Survey exists but not completed/dismissed - show it with draft data
+    await _speculate(user, monday, 2, _draft_answers(survey, prev_goals, 2), db)
     return SurveyStatusOut(
         should_show=True,
         survey_id=survey.id,
@@ -175,6 +264,22 @@ async def save_draft(
 
     await db.commit()
     await db.refresh(survey)
+
+    # Pre-generate the AI steps whose inputs may have just changed; unchanged answers are no-ops
+    steps = []
+    if body.goal_outcomes is not None:
+        steps.append(2)
+    if body.achievements is not None or body.difficulties is not None:
+        steps.append(4)
+    if body.improvements is not None:
+        steps.append(5)
+    if steps:
+        prev_goals = []
+        if not survey.goal_outcomes:
+            prev_retro = await _get_previous_retrospective(user.id, monday, db)
+            prev_goals = prev_retro.get("weekly_goals", []) if prev_retro else []
+        for step in steps:
+            await _speculate(user, monday, step, _draft_answers(survey, prev_goals, step), db)
     return survey
 
 
@@ -190,38 +295,6 @@ async def generate_suggestions(
 
     monday = _current_week_monday()
 
-    # Fetch last week's tasks (fast DB query)
-    week_ago = datetime.now(timezone.utc) - timedelta(days=7)
-    tasks_result = await db.execute(
-        select(Task).where(
-            Task.user_id == user.id,
-            Task.created_at >= week_ago,
-        )
-    )
-    tasks = tasks_result.scalars().all()
-
-    # Fetch project titles for context
-    project_ids = {t.project_id for t in tasks if t.project_id}
-    projects_map = {}
-    if project_ids:
-        proj_result = await db.execute(
-            select(Project).where(Project.id.in_(project_ids))
-        )
-        projects_map = {p.id: p.title for p in proj_result.scalars().all()}
-
-    week_tasks = [
-        {
-            "title": t.title,
-            "completed": t.completed,
-            "project_title": projects_map.get(t.project_id, ""),
-        }
-        for t in tasks
-    ]
-
-    # Fetch goals
-    goals_result = await db.execute(select(Goal).where(Goal.user_id == user.id))
-    goals = [{"title": g.title} for g in goals_result.scalars().all()]
-
     # Build previous answers context
     previous_answers = {}
     if body.goal_outcomes is not None:
@@ -233,22 +306,25 @@ async def generate_suggestions(
     if body.improvements is not None:
         previous_answers["improvements"] = body.improvements
 
-    # Fetch previous retrospective for context
-    previous_retrospective = await _get_previous_retrospective(user.id, monday, db)
+    # Reuse a speculative generation started for the same answers
+    prefetched = await survey_prefetch.take(user.id, monday, body.step, previous_answers)
+    if prefetched is not None:
+        return {"task_id": prefetched}
+
+    inputs = await _gather_step_inputs(user.id, monday, db)
 
     # Submit LLM call to background queue (returns immediately)
     op_type = f"survey_generate_step_{body.step}"
-    task_id = await task_queue.submit(
-        ai_service.generate_survey_step(
-            step=body.step,
-            week_tasks=week_tasks,
-            goals=goals,
-            user_profile=user.profile_text,
-            previous_answers=previous_answers if previous_answers else None,
-            previous_retrospective=previous_retrospective,
-            user_settings=user.settings,
-        ),
+    task_id = await task_queue.submit_job(
+        "generate_survey_step",
+        {
+            "step": body.step,
+            "user_profile": user.profile_text,
+            "previous_answers": previous_answers if previous_answers else None,
+            **inputs,
+        },
         operation_type=op_type,
+        user_id=user.id,
     )
     return {"task_id": task_id}
 
@@ -283,9 +359,6 @@ async def update_profile_from_survey(
     db: AsyncSession = Depends(get_db),
 ):
     """Update psychoportrait based on survey answers. Called in the background."""
-    user_id = user.id
-    current_profile = user.profile_text
-    u_settings = user.settings
     survey_data = {
         "goal_outcomes": [o.model_dump() for o in body.goal_outcomes],
         "achievements": body.achievements,
@@ -293,26 +366,40 @@ async def update_profile_from_survey(
         "improvements": body.improvements,
         "weekly_goals": body.weekly_goals,
     }
-
-    async def _run():
-        from ..database import async_session
-        new_profile = await ai_service.update_psychoportrait(
-            current_profile=current_profile,
-            survey_data=survey_data,
-            user_settings=u_settings,
-        )
-        if new_profile:
-            async with async_session() as session:
-                u = await session.get(User, user_id)
-                if u:
-                    u.profile_text = new_profile
-                    await session.commit()
-        return {"ok": True}
-
-    task_id = await task_queue.submit(_run())
+    task_id = await task_queue.submit_job(
+        "survey_update_profile",
+        {
+            "user_id": user.id,
+            "current_profile": user.profile_text,
+            "survey_data": survey_data,
+        },
+        operation_type="survey_update_profile",
+        user_id=user.id,
+        unattended=True,
+    )
     return {"task_id": task_id}
 
 
+job_registry.register("generate_survey_step", ai_service.generate_survey_step)
+
+
+@job_registry.register("survey_update_profile")
+async def _update_profile_job(user_id: str, current_profile: str | None, survey_data: dict, user_settings: dict | None):
+    new_profile = await ai_service.update_psychoportrait(
+        current_profile=current_profile,
+        survey_data=survey_data,
+        user_settings=user_settings,
+    )
+    if new_profile:
+        async with async_session() as session:
+            u = await session.get(User, uuid.UUID(user_id))
+            if u:
+                u.profile_text = new_profile
+                await session.commit()
+                await user_cache.invalidate(u.id)
+    return {"ok": True}
+
+
 @router.get("/results", response_model=list[SurveyOut])
 async def get_survey_results(
     user: User = Depends(get_current_user),
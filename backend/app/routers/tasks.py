@@ -9,6 +9,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from ..database import get_db
 from ..models import Task, User
 from ..schemas import TaskCreate, TaskOut, TaskUpdate
+from ..services import task_index
 from .auth import get_current_user
 
 
@@ -149,6 +150,7 @@ async def create_task(
     db.add(task)
     await db.commit()
     await db.refresh(task)
+    task_index.upsert(user.id, task)
     return task
 
 
@@ -214,6 +216,9 @@ async def update_task(
 
     await db.commit()
     await db.refresh(task)
+    task_index.upsert(user.id, task)
+    if should_recur:
+        task_index.upsert(user.id, new_task)
     return task
 
 
@@ -224,3 +229,4 @@ async def delete_task(task_id: UUID, user: User = Depends(get_current_user), db:
         raise HTTPException(status_code=404)
     await db.delete(task)
     await db.commit()
+    task_index.remove(user.id, task_id)
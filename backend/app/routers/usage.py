@@ -0,0 +1,99 @@
+"""LLM usage and daily budget reporting."""
+
+from datetime import datetime, timedelta, timezone
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..database import get_db
+from ..models import LLMUsage, User
+from ..services import llm_usage
+from .auth import get_current_user, require_admin
+
+router = APIRouter(prefix="/usage", tags=["usage"])
+
+
+def _totals(row) -> dict:
+    return {
+        "calls": int(row.calls or 0),
+        "errors": int(row.errors or 0),
+        "prompt_tokens": int(row.prompt_tokens or 0),
+        "completion_tokens": int(row.completion_tokens or 0),
+        "cached_tokens": int(row.cached_tokens or 0),
+        "cache_write_tokens": int(row.cache_write_tokens or 0),
+        "cost_usd": round(float(row.cost_usd or 0), 6),
+        "avg_latency_ms": int((row.latency_ms_total or 0) / row.calls) if row.calls else 0,
+    }
+
+
+_SUMS = (
+    func.sum(LLMUsage.calls).label("calls"),
+    func.sum(LLMUsage.errors).label("errors"),
+    func.sum(LLMUsage.prompt_tokens).label("prompt_tokens"),
+    func.sum(LLMUsage.completion_tokens).label("completion_tokens"),
+    func.sum(LLMUsage.cost_usd).label("cost_usd"),
+    func.sum(LLMUsage.cached_tokens).label("cached_tokens"),
+    func.sum(LLMUsage.cache_write_tokens).label("cache_write_tokens"),
+    func.sum(LLMUsage.latency_ms_total).label("latency_ms_total"),
+)
+
+
+@router.get("/me")
+async def my_usage(
+    days: int = Query(30, ge=1, le=365),
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Current user's LLM usage by operation and by day, plus today's budget."""
+    await llm_usage.flush()
+    since = datetime.now(timezone.utc).date() - timedelta(days=days - 1)
+
+    by_op = await db.execute(
+        select(LLMUsage.operation, *_SUMS)
+        .where(LLMUsage.user_id == user.id, LLMUsage.day >= since)
+        .group_by(LLMUsage.operation)
+        .order_by(func.sum(LLMUsage.prompt_tokens + LLMUsage.completion_tokens).desc())
+    )
+    by_day = await db.execute(
+        select(LLMUsage.day, *_SUMS)
+        .where(LLMUsage.user_id == user.id, LLMUsage.day >= since)
+        .group_by(LLMUsage.day)
+        .order_by(LLMUsage.day)
+    )
+
+    return {
+        "daily_token_budget": settings.llm_daily_token_budget or None,
+        "tokens_used_today": await llm_usage.tokens_used_today(user.id),
+        "by_operation": [{"operation": row.operation, **_totals(row)} for row in by_op.all()],
+        "by_day": [{"day": str(row.day), **_totals(row)} for row in by_day.all()],
+    }
+
+
+@router.get("/admin")
+async def usage_admin(
+    days: int = Query(7, ge=1, le=365),
+    admin: User = Depends(require_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """LLM usage per user and operation across all users (admin only)."""
+    await llm_usage.flush()
+    since = datetime.now(timezone.utc).date() - timedelta(days=days - 1)
+
+    result = await db.execute(
+        select(LLMUsage.user_id, User.email, LLMUsage.operation, *_SUMS)
+        .outerjoin(User, User.id == LLMUsage.user_id)
+        .where(LLMUsage.day >= since)
+        .group_by(LLMUsage.user_id, User.email, LLMUsage.operation)
+        .order_by(func.sum(LLMUsage.cost_usd).desc())
+    )
+    return [
+        {
+            "user_id": str(row.user_id) if row.user_id else None,
+            "email": row.email,
+            "operation": row.operation,
+            **_totals(row),
+        }
+        for row in result.all()
+    ]
@@ -0,0 +1,111 @@
+"""
+Per-user WebSocket channel: /api/ws?token=<jwt>.
+
+One socket per browser tab receives events for all of the user's AI jobs
+({"type": "task", "task_id", "status", "progress" | "result" | "error"}) and,
+later, other data-change events. The server sends {"type": "ping"} when idle.
+The token goes in the query string because browsers can't set headers on
+WebSocket requests.
+
+Once the client has taken a job's result or error from the socket, it sends
+{"type": "ack", "task_id"} and the job is deleted, as GET /api/ai-tasks/{id}
+does after answering with it.
+"""
+import asyncio
+import json
+import logging
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+
+from ..database import async_session
+from ..models import User
+from ..services import events, task_queue
+from .auth import decode_token
+
+router = APIRouter(tags=["ws"])
+logger = logging.getLogger("todopilot.ws")
+
+# Idle time after which a ping is sent (keeps proxies from closing the socket)
+PING_SECONDS = 25
+
+
+async def _expand(event: dict, user_id: str) -> dict:
+    """Attach the job's progress, result or error to a task event."""
+    if event.get("type") != "task":
+        return event
+    task = await task_queue.get(event["task_id"])
+    if task is None or task.get("user_id") != user_id:
+        return event
+    status = "running" if task["status"] in task_queue.ACTIVE else task["status"]
+    message = {**event, "status": status}
+    if task["status"] == "done":
+        message["result"] = task["result"]
+    elif task["status"] == "error":
+        message["error"] = task["error"]
+    else:
+        if task.get("progress") is not None:
+            message["progress"] = task["progress"]
+        message["eta"] = task_queue.eta(task)
+    return message
+
+
+async def _acknowledge(task_id: str, user_id: str):
+    """Delete the user's finished job whose outcome the client received over the socket."""
+    task = await task_queue.get(task_id)
+    if task is not None and task.get("user_id") == user_id and task["status"] not in task_queue.ACTIVE:
+        await task_queue.remove(task_id)
+
+
+async def _read_until_closed(websocket: WebSocket, user_id: str):
+    """Handle client messages (acks); returns when the client disconnects."""
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                continue
+            if not isinstance(message, dict) or message.get("type") != "ack" or not message.get("task_id"):
+                continue
+            try:
+                await _acknowledge(str(message["task_id"]), user_id)
+            except Exception as exc:
+                logger.warning("Could not delete acknowledged AI task %s: %s", message["task_id"], exc)
+    except WebSocketDisconnect:
+        pass
+
+
+@router.websocket("/ws")
+async def user_channel(websocket: WebSocket, token: str = ""):
+    user_id = decode_token(token)
+    user = None
+    if user_id:
+        async with async_session() as db:
+            user = await db.get(User, user_id)
+    if user is None:
+        await websocket.close(code=4401)
+        return
+
+    await websocket.accept()
+    uid = str(user.id)
+    queue = events.connect(uid)
+    reader = asyncio.create_task(_read_until_closed(websocket, uid))
+    try:
+        while True:
+            getter = asyncio.create_task(queue.get())
+            done, _ = await asyncio.wait({getter, reader}, timeout=PING_SECONDS, return_when=asyncio.FIRST_COMPLETED)
+            if getter not in done:
+                getter.cancel()
+                if reader in done:
+                    break
+                await websocket.send_json({"type": "ping"})
+                continue
+            event = getter.result()
+            if event is None:
+                await websocket.close(code=1013)  # fell too far behind; the client reconnects
+                break
+            await websocket.send_json(await _expand(event, uid))
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        events.disconnect(uid, queue)
+        reader.cancel()
@@ -182,7 +182,8 @@ class AIResponse(BaseModel):
 # AI Chat with actions
 class AIChatMessage(BaseModel):
     message: str
-    history: list[dict] = []
+    session_id: UUID | None = None  # server-side chat session; history is kept there
+    history: list[dict] = []  # only used to seed a new session (older clients)
 
 
 class TaskAction(BaseModel):
@@ -212,11 +213,13 @@ class BrainDumpItem(BaseModel):
     due_date: str | None = None
     project: str | None = None
     goal: str | None = None
+    merge_into: UUID | None = None  # existing task/project/goal to merge with instead of creating
 
 
 class BrainDumpResponse(BaseModel):
     reply: str
     items: list[BrainDumpItem] = []
+    duplicates: list[dict] = []
 
 
 class BrainDumpSaveRequest(BaseModel):
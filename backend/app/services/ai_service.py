@@ -8,16 +8,38 @@ or per-user via user.settings["ai_provider"] config:
   - Deepseek: deepseek/deepseek-chat
 """
 
+import asyncio
+import json
+import logging
+import re
+import time
+from collections import defaultdict, deque
+from typing import AsyncIterator, Callable
+
 import litellm
 
 from ..config import settings
+from . import json_stream, llm_breaker, llm_pool, llm_usage, task_digest
 
 litellm.drop_params = True
 
+# Usage accounting is always on; debug logging only with LLM_DEBUG
+litellm.callbacks = [llm_usage.UsageLogger()]
+
 if settings.llm_debug:
     from .llm_logger import LLMDebugLogger
 
-    litellm.callbacks = [LLMDebugLogger()]
+    litellm.callbacks = [*litellm.callbacks, LLMDebugLogger()]
+
+if settings.llm_standin:
+    from .llm_standin import StandInLLM
+
+    litellm.custom_provider_map = [{"provider": "standin", "custom_handler": StandInLLM()}]
+
+if settings.llm_record_file:
+    from .llm_standin import ResponseRecorder
+
+    litellm.callbacks = [*litellm.callbacks, ResponseRecorder()]
 
 
 # Preset provider configs for the UI dropdown
@@ -45,20 +67,214 @@ AI_PROVIDERS = {
 
 
 def get_llm_kwargs(user_settings: dict | None = None) -> dict:
-    """Build LiteLLM kwargs from user settings or fall back to global config."""
+    """Build LiteLLM kwargs from user settings or fall back to global config.
+
+    Calls on the global config may be routed to another model tier by _complete();
+    a user's own provider config is always used as is.
+    """
     ai = (user_settings or {}).get("ai_provider_config", {})
 
     model = ai.get("model") or settings.llm_model
     api_key = ai.get("api_key") or settings.llm_api_key
     api_base = ai.get("api_base") or settings.llm_api_base
+    # A user's own model/key/endpoint pins every call to it
+    metadata = {"routable": not (ai.get("model") or ai.get("api_key") or ai.get("api_base"))}
+
+    if settings.llm_standin:
+        # Load-test mode: never reach a real provider, even with a per-user key.
+        # The "sim-" prefix keeps LiteLLM from treating e.g. gpt-4o-mini as an OpenAI model.
+        return {"model": f"standin/sim-{model}", "metadata": metadata}
 
-    kwargs: dict = {"model": model}
+    kwargs: dict = {"model": model, "metadata": metadata}
     if api_key:
         kwargs["api_key"] = api_key
     if api_base:
         kwargs["api_base"] = api_base
     return kwargs
 
+
+# --- Model routing ------------------------------------------------------------
+# Each operation gets a model tier by the quality it needs; prompt size can move
+# it up a tier. Tiers map to LLM_MODEL_SMALL / LLM_MODEL / LLM_MODEL_LARGE (empty
+# small/large fall back to LLM_MODEL). Only calls on the global config are routed,
+# and they keep its LLM_API_KEY and LLM_API_BASE: tier models must be served by the
+# same provider as LLM_MODEL. One of another provider is ignored (see _tier_model).
+OPERATION_TIERS = {
+    "test_connection": "small",
+    "brain_dump": "small",
+    "chat_summary": "small",
+    "survey_generate_step_2": "small",
+    "survey_generate_step_3": "small",
+    "survey_generate_step_4": "small",
+    "survey_generate_step_5": "small",
+    "survey_generate_step_2_speculative": "small",
+    "survey_generate_step_4_speculative": "small",
+    "survey_generate_step_5_speculative": "small",
+    "chat": "standard",
+    "smart_chat": "standard",
+    "onboarding": "standard",
+    "morning_plan": "standard",
+    "morning_plan_precompute": "standard",
+    "coaching_analysis": "large",
+    "productivity_analysis": "large",
+    "retrospective": "large",
+    "survey_update_profile": "large",
+}
+# Prompts above these sizes (estimated tokens) move up a tier
+SMALL_TIER_MAX_PROMPT_TOKENS = 3000
+STANDARD_TIER_MAX_PROMPT_TOKENS = 12000
+
+_routing_logger = logging.getLogger("todopilot.llm.routing")
+# (operation, tier, model) -> recent latencies in ms, for GET /api/admin/llm-routing
+_route_latencies: dict[tuple[str, str, str], deque] = defaultdict(lambda: deque(maxlen=200))
+_route_errors: dict[tuple[str, str, str], int] = defaultdict(int)
+# Tier models already reported as served by another provider than LLM_MODEL
+_foreign_tier_models: set[str] = set()
+
+
+def _tier_model(tier: str) -> str:
+    if tier == "small":
+        model = settings.llm_model_small or settings.llm_model
+    elif tier == "large":
+        model = settings.llm_model_large or settings.llm_model
+    else:
+        return settings.llm_model
+    if llm_breaker.provider_key(model) != llm_breaker.provider_key(settings.llm_model):
+        # It would get LLM_API_KEY and LLM_API_BASE of another provider
+        if model not in _foreign_tier_models:
+            _foreign_tier_models.add(model)
+            _routing_logger.warning(
+                "[LLM] %s tier model %s is not served by the provider of LLM_MODEL %s; using LLM_MODEL",
+                tier, model, settings.llm_model,
+            )
+        return settings.llm_model
+    return model
+
+
+def estimate_prompt_tokens(messages: list[dict]) -> int:
+    chars = 0
+    for m in messages:
+        content = m.get("content", "")
+        if isinstance(content, list):
+            chars += sum(len(block.get("text", "")) for block in content if isinstance(block, dict))
+        else:
+            chars += len(str(content))
+    return chars // 4
+
+
+def choose_tier(operation: str, prompt_tokens: int) -> str:
+    """Routing policy: operation's base tier, bumped up for large prompts."""
+    tier = OPERATION_TIERS.get(operation, "standard")
+    if tier == "small" and prompt_tokens > SMALL_TIER_MAX_PROMPT_TOKENS:
+        tier = "standard"
+    if tier == "standard" and prompt_tokens > STANDARD_TIER_MAX_PROMPT_TOKENS:
+        tier = "large"
+    return tier
+
+
+def _route(kwargs: dict, operation: str) -> tuple[str, int]:
+    """Pick the model for this call in place; returns (tier, estimated prompt tokens)."""
+    prompt_tokens = estimate_prompt_tokens(kwargs.get("messages", []))
+    if not kwargs.get("metadata", {}).get("routable"):
+        return "user", prompt_tokens
+    if not settings.llm_routing:
+        return "default", prompt_tokens
+    tier = choose_tier(operation, prompt_tokens)
+    model = _tier_model(tier)
+    kwargs["model"] = f"standin/sim-{model}" if settings.llm_standin else model
+    return tier, prompt_tokens
+
+
+def routing_stats() -> dict:
+    """Routing policy and observed latency per operation/tier/model."""
+    routes = []
+    for (operation, tier, model), latencies in sorted(_route_latencies.items()):
+        ordered = sorted(latencies)
+        routes.append({
+            "operation": operation,
+            "tier": tier,
+            "model": model,
+            "calls": len(ordered),
+            "errors": _route_errors.get((operation, tier, model), 0),
+            "p50_ms": ordered[len(ordered) // 2] if ordered else None,
+            "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] if ordered else None,
+        })
+    return {
+        "enabled": settings.llm_routing,
+        "tiers": {tier: _tier_model(tier) for tier in ("small", "standard", "large")},
+        "operations": OPERATION_TIERS,
+        "routes": routes,
+    }
+
+
+async def _prepare(kwargs: dict) -> tuple[dict, str, int, str]:
+    """Budget check, routing, metadata and transport settings shared by all LLM calls."""
+    await llm_usage.check_budget()
+    meta = llm_usage.current()
+    tier = kwargs.get("metadata", {}).get("tier")
+    if tier is None:
+        tier, prompt_tokens = _route(kwargs, meta["operation"])
+    else:
+        # Routed already by set_messages(), before the prompt was laid out
+        prompt_tokens = estimate_prompt_tokens(kwargs["messages"])
+    kwargs["metadata"] = {**kwargs.get("metadata", {}), **meta, "tier": tier}
+    llm_pool.apply(kwargs)
+    # Retries are llm_breaker's job; the OpenAI SDK would otherwise retry on its own
+    kwargs.setdefault("timeout", settings.llm_request_timeout)
+    kwargs.setdefault("max_retries", 0)
+    provider = llm_breaker.provider_key(kwargs["model"], kwargs.get("api_base"), kwargs.get("api_key"))
+    return meta, tier, prompt_tokens, provider
+
+
+def _record_route(meta: dict, tier: str, model: str, prompt_tokens: int, started: float, ok: bool):
+    key = (meta["operation"], tier, model)
+    latency_ms = int((time.perf_counter() - started) * 1000)
+    _route_latencies[key].append(latency_ms)
+    if not ok:
+        _route_errors[key] += 1
+    _routing_logger.info(
+        "[LLM] route | op=%s | tier=%s | model=%s | prompt~%d | latency=%dms | ok=%s",
+        meta["operation"], tier, model, prompt_tokens, latency_ms, ok,
+    )
+
+
+async def _complete(kwargs: dict):
+    """Single entry point for LLM calls: enforces the user's token budget, routes
+    the call to a model tier, tags it with user/operation metadata for usage
+    accounting and sends it through the shared provider connection pool, under
+    the provider's circuit breaker and retry policy."""
+    meta, tier, prompt_tokens, provider = await _prepare(kwargs)
+    started = time.perf_counter()
+    ok = False
+    try:
+        response = await llm_breaker.call(provider, lambda: litellm.acompletion(**kwargs))
+        ok = True
+        return response
+    finally:
+        _record_route(meta, tier, kwargs["model"], prompt_tokens, started, ok)
+
+
+async def _complete_stream(kwargs: dict) -> AsyncIterator[str]:
+    """Streaming variant of _complete: yields content deltas as they arrive.
+
+    Only opening the stream is retried; an error mid-stream is raised to the
+    caller, which may already have used part of the reply.
+    """
+    meta, tier, prompt_tokens, provider = await _prepare(kwargs)
+    kwargs["stream"] = True
+    started = time.perf_counter()
+    ok = False
+    try:
+        stream = await llm_breaker.call(provider, lambda: litellm.acompletion(**kwargs))
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+        ok = True
+    finally:
+        _record_route(meta, tier, kwargs["model"], prompt_tokens, started, ok)
+
+
 SYSTEM_PROMPT = """Ты - AI-помощник в приложении TodoPilot для управления задачами.
 Твоя роль: помогать пользователю с продуктивностью, мотивацией и целеполаганием.
 
@@ -71,6 +287,99 @@ SYSTEM_PROMPT = """Ты - AI-помощник в приложении TodoPilot
 - Отвечай на том же языке, на котором пишет пользователь
 """
 
+ACTION_SYSTEM_PROMPT = SYSTEM_PROMPT + """
+
+Ты также можешь предлагать действия с задачами. Если пользователь просит создать, закрыть или переместить задачу,
+верни ответ в формате JSON (только JSON, без markdown):
+{
+  "reply": "текст ответа пользователю",
+  "actions": [
+    {"action": "create", "title": "Название задачи", "priority": 0, "due_date": "YYYY-MM-DD или null", "project_id": "p3 или null"},
+    {"action": "complete", "task_id": "t12"},
+    {"action": "move", "task_id": "t12", "project_id": "p3 или null"}
+  ]
+}
+Задачи и проекты в контексте помечены короткими id в квадратных скобках (t12, p3) - используй именно их.
+
+Если действий нет - просто отвечай обычным текстом БЕЗ JSON.
+Если пользователь просит создать задачу но не указал точное название - уточни.
+Если пользователь хочет закрыть задачу - найди подходящую по названию из контекста задач.
+"""
+
+ONBOARDING_SYSTEM_PROMPT = (
+    "Ты помогаешь новому пользователю настроить приложение TodoPilot. "
+    "Задавай вопросы о его сфере деятельности, текущих задачах и целях. "
+    "Когда соберёшь достаточно информации, предложи список задач и целей. "
+    "Будь дружелюбным и кратким. Отвечай на языке пользователя."
+)
+
+_CACHE_POINT = {"type": "ephemeral"}
+
+
+def supports_cache_control(model: str) -> bool:
+    """Claude models (Anthropic, Bedrock, Vertex) cache only up to explicit cache_control
+    breakpoints; OpenAI and DeepSeek cache identical prompt prefixes automatically."""
+    return "claude" in model.lower() and not model.startswith("standin/")
+
+
+def build_messages(
+    system_prompt: str,
+    messages: list[dict],
+    model: str,
+    user_profile: str | None = None,
+    context: list[tuple[str, str | None]] | None = None,
+) -> list[dict]:
+    """Lay out a prompt as a stable, cacheable prefix followed by the variable part.
+
+    Order: static system prompt -> user profile -> earlier turns -> per-request
+    context (tasks, projects) -> the new message. The prefix up to the last
+    earlier turn is byte-identical between calls, so providers can serve it from
+    their prompt cache; the per-request context used to sit in the system prompt
+    and invalidated everything after it. For Claude models cache_control
+    breakpoints mark the end of the system prompt, the profile and the history.
+    """
+    cache = supports_cache_control(model)
+    profile = f"Профиль пользователя:\n{user_profile}" if user_profile else None
+
+    if cache:
+        blocks = [{"type": "text", "text": system_prompt, "cache_control": _CACHE_POINT}]
+        if profile:
+            blocks.append({"type": "text", "text": profile, "cache_control": _CACHE_POINT})
+        system: dict = {"role": "system", "content": blocks}
+    else:
+        system = {"role": "system", "content": system_prompt + (f"\n\n{profile}" if profile else "")}
+
+    history = [dict(m) for m in messages[:-1]]
+    last = dict(messages[-1]) if messages else None
+    if cache and history and isinstance(history[-1].get("content"), str):
+        history[-1]["content"] = [
+            {"type": "text", "text": history[-1]["content"], "cache_control": _CACHE_POINT}
+        ]
+
+    context_text = "\n\n".join(f"{title}:\n{body}" for title, body in (context or []) if body)
+    if last is not None and context_text and isinstance(last.get("content"), str):
+        last["content"] = f"{context_text}\n\n---\n\n{last['content']}"
+
+    return [system, *history, *([last] if last is not None else [])]
+
+
+def set_messages(
+    kwargs: dict,
+    system_prompt: str,
+    messages: list[dict],
+    user_profile: str | None = None,
+    context: list[tuple[str, str | None]] | None = None,
+):
+    """Route the call to its model tier, then lay out the prompt (build_messages) for that model.
+
+    Routing can move a call to another model than get_llm_kwargs() chose, and
+    only Claude models take cache_control blocks, so the layout waits for it.
+    """
+    kwargs["messages"] = build_messages(system_prompt, messages, "", user_profile, context)
+    tier, _ = _route(kwargs, llm_usage.current()["operation"])
+    kwargs["metadata"] = {**kwargs.get("metadata", {}), "tier": tier}
+    kwargs["messages"] = build_messages(system_prompt, messages, kwargs["model"], user_profile, context)
+
 
 async def chat(
     messages: list[dict],
@@ -78,19 +387,14 @@ async def chat(
     tasks_context: str | None = None,
     user_settings: dict | None = None,
 ) -> str:
-    system = SYSTEM_PROMPT
-    if user_profile:
-        system += f"\n\nПрофиль пользователя:\n{user_profile}"
-    if tasks_context:
-        system += f"\n\nКонтекст задач:\n{tasks_context}"
-
-    full_messages = [{"role": "system", "content": system}] + messages
-
     kwargs = get_llm_kwargs(user_settings)
-    kwargs["messages"] = full_messages
+    set_messages(
+        kwargs, SYSTEM_PROMPT, messages,
+        user_profile=user_profile, context=[("Контекст задач", tasks_context)],
+    )
     kwargs["max_tokens"] = 1024
 
-    response = await litellm.acompletion(**kwargs)
+    response = await _complete(kwargs)
     content = response.choices[0].message.content or ""
 
     # Some Ollama models return empty content due to LiteLLM deserialization issues,
@@ -150,10 +454,8 @@ async def weekly_retrospective(
     user_profile: str | None = None,
     user_settings: dict | None = None,
 ) -> dict:
-    tasks_text = "\n".join(
-        f"- {'[x]' if t.get('completed') else '[ ]'} {t['title']}" for t in week_tasks
-    )
-    goals_text = "\n".join(f"- {g['title']}" for g in goals) if goals else "Цели не заданы"
+    tasks_text = task_digest.digest_tasks(week_tasks)
+    goals_text = task_digest.digest_goals(goals)
 
     messages = [
         {
@@ -190,12 +492,8 @@ async def generate_survey_step(
     """
     import json
 
-    tasks_text = "\n".join(
-        f"- {'[x]' if t.get('completed') else '[ ]'} {t['title']}"
-        + (f" (проект: {t.get('project_title', '')})" if t.get('project_title') else "")
-        for t in week_tasks
-    )
-    goals_text = "\n".join(f"- {g['title']}" for g in goals) if goals else "Цели не заданы"
+    tasks_text = task_digest.digest_tasks(week_tasks, with_project=True)
+    goals_text = task_digest.digest_goals(goals)
 
     context = f"Задачи за прошлую неделю:\n{tasks_text}\n\nЦели пользователя:\n{goals_text}"
 
@@ -419,8 +717,8 @@ async def coaching_analysis(stats: dict, user_profile: str | None = None, user_s
     )
     if stats.get('goals_progress'):
         stats_text += "\nПрогресс по целям:\n"
-        for g in stats['goals_progress']:
-            stats_text += f"  - {g['title']}: {g['completed']}/{g['total']} задач\n"
+        for line in task_digest.digest_goal_progress(stats['goals_progress']):
+            stats_text += f"  - {line}\n"
     if stats.get('overdue_list'):
         stats_text += "\nПросроченные задачи:\n"
         for t in stats['overdue_list'][:10]:
@@ -444,8 +742,17 @@ async def coaching_analysis(stats: dict, user_profile: str | None = None, user_s
     return await chat(messages, user_profile=user_profile, user_settings=user_settings)
 
 
-async def brain_dump_extract(text: str, user_profile: str | None = None, user_settings: dict | None = None) -> str:
-    """Extract tasks, projects, goals from brain dump text."""
+async def brain_dump_extract(
+    text: str,
+    user_profile: str | None = None,
+    user_settings: dict | None = None,
+    on_item: Callable[[dict], None] | None = None,
+) -> str:
+    """Extract tasks, projects, goals from brain dump text.
+
+    With on_item, the reply is streamed and each item is passed to on_item as
+    soon as its JSON object is complete; the full reply is still returned.
+    """
     messages = [
         {
             "role": "user",
@@ -465,7 +772,167 @@ async def brain_dump_extract(text: str, user_profile: str | None = None, user_se
             ),
         }
     ]
-    return await chat(messages, user_profile=user_profile, user_settings=user_settings)
+    if on_item is None:
+        return await chat(messages, user_profile=user_profile, user_settings=user_settings)
+
+    kwargs = get_llm_kwargs(user_settings)
+    set_messages(kwargs, SYSTEM_PROMPT, messages, user_profile=user_profile)
+    kwargs["max_tokens"] = 1024
+    parser = json_stream.ArrayItemParser("items")
+    parts: list[str] = []
+    async for delta in _complete_stream(kwargs):
+        parts.append(delta)
+        for item in parser.feed(delta):
+            on_item(item)
+    return "".join(parts)
+
+
+# Brain dumps longer than this are split and extracted chunk by chunk in parallel
+BRAIN_DUMP_CHUNK_CHARS = 1500
+BRAIN_DUMP_MAX_PARALLEL = 4
+
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+
+
+def split_brain_dump(text: str, max_chars: int = BRAIN_DUMP_CHUNK_CHARS) -> list[str]:
+    """Split text into chunks of at most max_chars at paragraph, then sentence boundaries."""
+    pieces: list[str] = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+            continue
+        for sentence in _SENTENCE_END.split(paragraph):
+            # A single huge "sentence" (e.g. a list without punctuation) is cut by words
+            while len(sentence) > max_chars:
+                cut = sentence.rfind(" ", 0, max_chars)
+                if cut <= 0:
+                    cut = max_chars
+                pieces.append(sentence[:cut].strip())
+                sentence = sentence[cut:].strip()
+            if sentence:
+                pieces.append(sentence)
+
+    # Pack neighbouring pieces back together so chunks stay close to max_chars
+    chunks: list[str] = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + len(piece) + 2 > max_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _parse_brain_dump(raw: str) -> dict:
+    """Parse a brain_dump_extract reply, tolerating markdown fences around the JSON."""
+    try:
+        parsed = json.loads(raw)
+    except json.JSONDecodeError:
+        match = re.search(r"\{.*\}", raw or "", re.DOTALL)
+        if not match:
+            raise
+        parsed = json.loads(match.group())
+    if not isinstance(parsed, dict):
+        raise ValueError("Brain dump reply is not a JSON object")
+    return parsed
+
+
+def _brain_dump_key(item: dict) -> tuple[str, str]:
+    title = re.sub(r"[^\w\s]", "", str(item.get("title", "")).lower())
+    return str(item.get("type", "")), " ".join(title.split())
+
+
+def merge_brain_dump_items(item_lists: list[list[dict]]) -> list[dict]:
+    """Merge per-chunk item lists, dropping duplicates by type and normalized title.
+
+    When the same item shows up in several chunks, missing fields are filled
+    from the later copies and the highest priority wins.
+    """
+    merged: dict[tuple[str, str], dict] = {}
+    for items in item_lists:
+        for item in items:
+            if not isinstance(item, dict) or not item.get("title"):
+                continue
+            key = _brain_dump_key(item)
+            existing = merged.get(key)
+            if existing is None:
+                merged[key] = dict(item)
+                continue
+            for field in ("due_date", "project", "goal"):
+                if not existing.get(field) and item.get(field):
+                    existing[field] = item[field]
+            existing["priority"] = max(existing.get("priority") or 0, item.get("priority") or 0)
+    return list(merged.values())
+
+
+async def brain_dump_extract_items(
+    text: str,
+    user_profile: str | None = None,
+    user_settings: dict | None = None,
+    on_item: Callable[[dict], None] | None = None,
+) -> dict:
+    """Extract brain dump items, splitting long text into chunks processed concurrently.
+
+    Returns {"reply": str, "items": list[dict], "failed_chunks": int}. A chunk
+    whose call or reply failed is retried once; chunks that still fail are
+    counted in failed_chunks and mentioned in the reply, so the user knows part
+    of the text wasn't processed. Raises ValueError if no chunk could be parsed,
+    and re-raises the LLM error if every chunk failed with one.
+    With on_item, items are streamed to it as the chunks' replies arrive (each
+    type + title once); the returned list stays the authoritative merged result.
+    """
+    chunks = split_brain_dump(text) or [text]
+    semaphore = asyncio.Semaphore(BRAIN_DUMP_MAX_PARALLEL)
+    streamed: set[tuple[str, str]] = set()
+
+    def _on_item(item: dict):
+        if not item.get("title"):
+            return
+        key = _brain_dump_key(item)
+        if key not in streamed:
+            streamed.add(key)
+            on_item(item)
+
+    async def _extract(chunk: str) -> dict:
+        async with semaphore:
+            raw = await brain_dump_extract(
+                chunk, user_profile=user_profile, user_settings=user_settings,
+                on_item=_on_item if on_item else None,
+            )
+        return _parse_brain_dump(raw)
+
+    results = await asyncio.gather(*(_extract(c) for c in chunks), return_exceptions=True)
+    failed = [i for i, r in enumerate(results) if not isinstance(r, dict)]
+    if failed and len(failed) < len(chunks):
+        retried = await asyncio.gather(*(_extract(chunks[i]) for i in failed), return_exceptions=True)
+        for i, r in zip(failed, retried):
+            results[i] = r
+    parsed = [r for r in results if isinstance(r, dict)]
+    if not parsed:
+        llm_errors = [r for r in results if not isinstance(r, ValueError)]
+        raise llm_errors[0] if llm_errors else ValueError("Brain dump reply could not be parsed")
+
+    items = merge_brain_dump_items([p.get("items") or [] for p in parsed])
+    failed_chunks = len(chunks) - len(parsed)
+    if len(chunks) == 1:
+        reply = parsed[0].get("reply") or "Готово!"
+    else:
+        counts = {t: sum(1 for i in items if i.get("type") == t) for t in ("task", "project", "goal")}
+        reply = (
+            f"Нашёл задач: {counts['task']}, проектов: {counts['project']}, целей: {counts['goal']}"
+        )
+    if failed_chunks:
+        reply += (
+            f"\n\nНе удалось разобрать часть текста ({failed_chunks} из {len(chunks)} фрагментов). "
+            "Проверьте, всё ли найдено, и при необходимости отправьте пропущенное ещё раз."
+        )
+    return {"reply": reply, "items": items, "failed_chunks": failed_chunks}
 
 
 async def morning_plan(
@@ -518,54 +985,48 @@ async def chat_with_actions(
     user_settings: dict | None = None,
 ) -> str:
     """Chat that can suggest task actions (create/complete/move)."""
-    action_system = SYSTEM_PROMPT + """
-
-Ты также можешь предлагать действия с задачами. Если пользователь просит создать, закрыть или переместить задачу,
-верни ответ в формате JSON (только JSON, без markdown):
-{
-  "reply": "текст ответа пользователю",
-  "actions": [
-    {"action": "create", "title": "Название задачи", "priority": 0, "due_date": "YYYY-MM-DD или null", "project_id": "id или null"},
-    {"action": "complete", "task_id": "id задачи"},
-    {"action": "move", "task_id": "id задачи", "project_id": "новый id проекта или null"}
-  ]
-}
-
-Если действий нет - просто отвечай обычным текстом БЕЗ JSON.
-Если пользователь просит создать задачу но не указал точное название - уточни.
-Если пользователь хочет закрыть задачу - найди подходящую по названию из контекста задач.
-"""
-    system = action_system
-    if user_profile:
-        system += f"\n\nПрофиль пользователя:\n{user_profile}"
-    if tasks_context:
-        system += f"\n\nТекущие задачи пользователя:\n{tasks_context}"
-    if projects_context:
-        system += f"\n\nПроекты пользователя:\n{projects_context}"
-
-    full_messages = [{"role": "system", "content": system}] + messages
-
     kwargs = get_llm_kwargs(user_settings)
-    kwargs["messages"] = full_messages
+    set_messages(
+        kwargs, ACTION_SYSTEM_PROMPT, messages,
+        user_profile=user_profile,
+        context=[("Текущие задачи пользователя", tasks_context), ("Проекты пользователя", projects_context)],
+    )
     kwargs["max_tokens"] = 1500
 
-    response = await litellm.acompletion(**kwargs)
+    response = await _complete(kwargs)
     return response.choices[0].message.content
 
 
 async def onboarding_chat(message: str, history: list[dict], user_settings: dict | None = None) -> str:
     messages = history + [{"role": "user", "content": message}]
-    system_override = (
-        "Ты помогаешь новому пользователю настроить приложение TodoPilot. "
-        "Задавай вопросы о его сфере деятельности, текущих задачах и целях. "
-        "Когда соберёшь достаточно информации, предложи список задач и целей. "
-        "Будь дружелюбным и кратким. Отвечай на языке пользователя."
-    )
-    full_messages = [{"role": "system", "content": system_override}] + messages
 
     kwargs = get_llm_kwargs(user_settings)
-    kwargs["messages"] = full_messages
+    set_messages(kwargs, ONBOARDING_SYSTEM_PROMPT, messages)
     kwargs["max_tokens"] = 1024
 
-    response = await litellm.acompletion(**kwargs)
+    response = await _complete(kwargs)
     return response.choices[0].message.content
+
+
+async def summarize_conversation(
+    previous_summary: str | None, messages: list[dict], user_settings: dict | None = None,
+) -> str:
+    """Fold older chat turns into a short running summary."""
+    dialog = "\n".join(
+        f"{'Пользователь' if m.get('role') == 'user' else 'Ассистент'}: {m.get('content', '')}" for m in messages
+    )
+    prompt = (
+        "Составь краткое содержание разговора пользователя с AI-помощником по задачам, "
+        "чтобы продолжить его без полной истории. Сохрани факты о пользователе, упомянутые задачи "
+        "и проекты, принятые решения и незакрытые вопросы. Не более 10 пунктов, без вступления.\n\n"
+    )
+    if previous_summary:
+        prompt += f"Краткое содержание более ранней части разговора:\n{previous_summary}\n\n"
+    prompt += f"Продолжение разговора:\n{dialog}"
+
+    kwargs = get_llm_kwargs(user_settings)
+    kwargs["messages"] = [{"role": "user", "content": prompt}]
+    kwargs["max_tokens"] = 500
+
+    response = await _complete(kwargs)
+    return (response.choices[0].message.content or "").strip()
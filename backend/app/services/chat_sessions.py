@@ -0,0 +1,176 @@
+"""
+Server-side AI chat sessions with automatic history compaction.
+
+The client sends only a session id and the new message. The session keeps
+recent messages verbatim; once they exceed CHAT_HISTORY_TOKEN_LIMIT (estimated
+tokens), everything but the last CHAT_RECENT_MESSAGES is folded into a rolling
+summary by the LLM in the background. Prompts are built from summary + recent
+turns, so prompt size stays bounded however long the conversation gets. The
+summary only changes on compaction, which keeps the prompt prefix cacheable
+between compactions. Compaction also drops the short task/project aliases that
+neither the summary nor the kept turns mention anymore.
+"""
+import asyncio
+import logging
+import re
+import uuid
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..database import async_session
+from ..models import ChatSession
+from . import ai_service, llm_usage
+
+logger = logging.getLogger("todopilot.chat_sessions")
+
+# Session ids with a compaction in flight (one at a time per session)
+_compacting: set[uuid.UUID] = set()
+# Strong references so running compactions aren't garbage-collected
+_background: set[asyncio.Task] = set()
+
+# Aliases kept per session at most; the oldest ones not in the current prompt go first
+MAX_ALIASES = 500
+_ALIAS_RE = re.compile(r"\b[a-z]\d+\b")
+
+
+def estimate_tokens(messages: list[dict]) -> int:
+    return sum(len(str(m.get("content", ""))) for m in messages) // 4
+
+
+async def get_or_create(db: AsyncSession, user_id, session_id: uuid.UUID | None) -> ChatSession:
+    """The user's session by id, or a new one when the id is missing or unknown."""
+    if session_id is not None:
+        session = await db.get(ChatSession, session_id)
+        if session is not None and session.user_id == user_id:
+            return session
+    session = ChatSession(user_id=user_id, messages=[])
+    db.add(session)
+    await db.commit()
+    return session
+
+
+def prompt_history(session: ChatSession) -> list[dict]:
+    """Messages to send before the new one: summary (as a turn pair) plus recent turns."""
+    history: list[dict] = []
+    if session.summary:
+        history.append({"role": "user", "content": f"Краткое содержание нашего разговора до этого:\n{session.summary}"})
+        history.append({"role": "assistant", "content": "Понял, продолжаем с учётом этого."})
+    history.extend({"role": m["role"], "content": m["content"]} for m in session.messages or [])
+    return history
+
+
+def assign_aliases(session: ChatSession, prefix: str, ids: list) -> dict[str, str]:
+    """Short aliases ("t17", "p3") for real ids, stable for the whole session.
+
+    Returns {real id: alias}; new aliases are added to session.aliases (caller commits).
+    Beyond MAX_ALIASES, the oldest aliases of ids not passed now are dropped.
+    """
+    aliases = dict(session.aliases or {})
+    wanted = set(map(str, ids))
+    excess = len(aliases) + len(wanted - set(aliases.values())) - MAX_ALIASES
+    if excess > 0:
+        # Dict order is insertion order, so the first entries are the oldest
+        stale = [a for a, real in aliases.items() if real not in wanted][:excess]
+        for alias in stale:
+            del aliases[alias]
+    by_id = {real: alias for alias, real in aliases.items()}
+    numbers = [int(a[len(prefix):]) for a in aliases if a.startswith(prefix) and a[len(prefix):].isdigit()]
+    next_number = max(numbers, default=0) + 1
+
+    result = {}
+    for real in map(str, ids):
+        alias = by_id.get(real)
+        if alias is None:
+            alias = f"{prefix}{next_number}"
+            next_number += 1
+            aliases[alias] = real
+            by_id[real] = alias
+        result[real] = alias
+    session.aliases = aliases
+    return result
+
+
+def resolve_alias(aliases: dict[str, str], value: str | None, prefix: str) -> str | None:
+    """Real id for an alias the model echoed back; full UUIDs pass through, anything else is None."""
+    if not value:
+        return None
+    value = value.strip().strip("[]")
+    if value.startswith("id:"):
+        value = value[3:]
+    real = aliases.get(value.lower())
+    if real is not None and value.lower().startswith(prefix):
+        return real
+    try:
+        return str(uuid.UUID(value))
+    except ValueError:
+        return None
+
+
+def _referenced_aliases(aliases: dict[str, str] | None, texts: list) -> dict[str, str]:
+    """Aliases still mentioned in the given texts (summary, messages)."""
+    mentioned: set[str] = set()
+    for text in texts:
+        content = text.get("content", "") if isinstance(text, dict) else text
+        mentioned.update(_ALIAS_RE.findall(str(content).lower()))
+    return {alias: real for alias, real in (aliases or {}).items() if alias in mentioned}
+
+
+async def append_turn(session_id: uuid.UUID, user_message: str, reply: str, user_settings: dict | None = None):
+    """Store a finished turn and start compaction if the history got too long."""
+    async with async_session() as db:
+        result = await db.execute(select(ChatSession).where(ChatSession.id == session_id).with_for_update())
+        session = result.scalar_one_or_none()
+        if session is None:
+            return
+        session.messages = [
+            *(session.messages or []),
+            {"role": "user", "content": user_message},
+            {"role": "assistant", "content": reply},
+        ]
+        await db.commit()
+        over_limit = estimate_tokens(session.messages) > settings.chat_history_token_limit
+
+    if over_limit and session_id not in _compacting:
+        _compacting.add(session_id)
+        task = asyncio.create_task(_compact(session_id, user_settings))
+        _background.add(task)
+        task.add_done_callback(_background.discard)
+
+
+async def _compact(session_id: uuid.UUID, user_settings: dict | None):
+    try:
+        async with async_session() as db:
+            session = await db.get(ChatSession, session_id)
+            if session is None:
+                return
+            # Keep whole user/assistant pairs so roles still alternate after the summary
+            keep = max(settings.chat_recent_messages, 0)
+            keep += keep % 2
+            older = (session.messages or [])[:-keep] if keep else list(session.messages or [])
+            if not older:
+                return
+            previous_summary = session.summary
+            summarized_count = session.summarized_count or 0
+            llm_usage.bind(user_id=session.user_id, operation="chat_summary")
+
+        summary = await ai_service.summarize_conversation(previous_summary, older, user_settings)
+        if not summary:
+            return
+
+        async with async_session() as db:
+            result = await db.execute(select(ChatSession).where(ChatSession.id == session_id).with_for_update())
+            session = result.scalar_one_or_none()
+            if session is None or (session.summarized_count or 0) != summarized_count:
+                return  # deleted, or compacted by another worker meanwhile
+            # Turns appended meanwhile stay; only the summarised prefix is dropped
+            session.messages = (session.messages or [])[len(older):]
+            session.summary = summary
+            session.aliases = _referenced_aliases(session.aliases, [summary, *session.messages])
+            session.summarized_count = summarized_count + len(older)
+            await db.commit()
+    except Exception as exc:
+        logger.warning("Chat history compaction failed for session %s: %s", session_id, exc)
+    finally:
+        _compacting.discard(session_id)
@@ -0,0 +1,72 @@
+"""
+Near-duplicate detection for brain-dump items.
+
+New items are compared with the user's open tasks, projects and goals of the
+same type using the hashed n-gram vectors from task_index, always title
+against title: tasks via the title-only matrix of the user's in-memory task
+index, projects and goals embedded on the fly. Each type
+is scored with one matrix product (new items x existing items), so thousands of
+existing items are checked in a single pass.
+"""
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import Goal, Project, Task
+from . import task_index
+
+# Cosine similarity above which an item is proposed as a merge
+DUPLICATE_SCORE = 0.7
+
+
+def _best(queries: np.ndarray, candidates: list[tuple]) -> list[tuple]:
+    """(id, title, score) of the most similar candidate for each query row."""
+    if not candidates:
+        return [(None, None, 0.0)] * len(queries)
+    matrix = np.stack([task_index.embed(title) for _, title in candidates])
+    scores = queries @ matrix.T
+    best = scores.argmax(axis=1)
+    return [(candidates[j][0], candidates[j][1], float(scores[i, j])) for i, j in enumerate(best)]
+
+
+async def find_duplicates(user_id, items: list[dict], db: AsyncSession) -> list[dict]:
+    """Proposed merges: new items that look like an existing open task, project or goal."""
+    by_type: dict[str, list[int]] = {}
+    for i, item in enumerate(items):
+        by_type.setdefault(item.get("type"), []).append(i)
+
+    duplicates = []
+    for item_type, indices in by_type.items():
+        if item_type not in ("task", "project", "goal"):
+            continue
+        queries = np.stack([task_index.embed(items[i].get("title", "")) for i in indices])
+
+        if item_type == "task":
+            hits = await task_index.best_matches(user_id, queries, db)
+            ids = [tid for tid, score in hits if tid and score >= DUPLICATE_SCORE]
+            titles = {}
+            if ids:
+                result = await db.execute(select(Task.id, Task.title).where(Task.id.in_(ids)))
+                titles = {row.id: row.title for row in result.all()}
+            matches = [(tid, titles.get(tid), score) for tid, score in hits]
+        elif item_type == "project":
+            result = await db.execute(
+                select(Project.id, Project.title).where(
+                    Project.user_id == user_id, Project.deleted_at == None  # noqa: E711
+                )
+            )
+            matches = _best(queries, [tuple(row) for row in result.all()])
+        else:
+            result = await db.execute(select(Goal.id, Goal.title).where(Goal.user_id == user_id))
+            matches = _best(queries, [tuple(row) for row in result.all()])
+
+        for i, (existing_id, title, score) in zip(indices, matches):
+            if existing_id and title and score >= DUPLICATE_SCORE:
+                duplicates.append({
+                    "index": i,
+                    "type": item_type,
+                    "existing_id": str(existing_id),
+                    "existing_title": title,
+                    "score": round(score, 3),
+                })
+    return duplicates
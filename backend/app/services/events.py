@@ -0,0 +1,149 @@
+"""
+Per-user event hub behind the /api/ws WebSocket channel.
+
+Each open socket gets a queue registered under its user. publish() delivers a
+small JSON event to the user's sockets in this process. With the postgres
+task queue backend (several API processes), it also sends a NOTIFY on the
+user_events channel. run_listener() holds one LISTEN connection per process
+and hands other processes' events to local sockets and handlers, so an event
+reaches the user whichever worker their socket is connected to.
+
+Events stay small (NOTIFY payloads are limited to 8 KB): AI jobs publish
+{"type": "task", "task_id", "status"} and the socket handler loads the job's
+progress or result itself. Handlers registered with add_handler() see every
+event (task_queue uses this to wake its long-poll waiters and to cancel jobs
+on request of another process); events published with to_sockets=False reach
+only them.
+"""
+import asyncio
+import json
+import logging
+import uuid
+from typing import Any, Callable
+
+import asyncpg
+from sqlalchemy import func, select
+
+from ..config import settings
+from ..database import async_session
+
+logger = logging.getLogger("todopilot.events")
+
+CHANNEL = "user_events"
+# Events a slow socket may fall behind by before it is dropped
+_QUEUE_SIZE = 256
+
+_sockets: dict[str, set[asyncio.Queue]] = {}
+_handlers: list[Callable[[str, dict], None]] = []
+_listening = False
+# Marks this process's own NOTIFYs so they aren't delivered twice
+_ORIGIN = uuid.uuid4().hex
+
+
+def _multi_process() -> bool:
+    return settings.task_queue_backend == "postgres"
+
+
+def connect(user_id) -> asyncio.Queue:
+    queue: asyncio.Queue = asyncio.Queue(maxsize=_QUEUE_SIZE)
+    _sockets.setdefault(str(user_id), set()).add(queue)
+    return queue
+
+
+def disconnect(user_id, queue: asyncio.Queue):
+    queues = _sockets.get(str(user_id))
+    if queues is not None:
+        queues.discard(queue)
+        if not queues:
+            _sockets.pop(str(user_id), None)
+
+
+def add_handler(handler: Callable[[str, dict], None]):
+    _handlers.append(handler)
+
+
+def listening() -> bool:
+    """Whether events of other processes currently reach this one."""
+    return _listening or not _multi_process()
+
+
+def connection_count() -> int:
+    return sum(len(q) for q in _sockets.values())
+
+
+def connected_users() -> list[str]:
+    """Users with an open socket in this process."""
+    return list(_sockets)
+
+
+def _deliver(user_id: str, event: dict, to_sockets: bool = True):
+    for handler in _handlers:
+        try:
+            handler(user_id, event)
+        except Exception as exc:
+            logger.warning("Event handler failed: %s", exc)
+    if not to_sockets:
+        return
+    for queue in list(_sockets.get(user_id, ())):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # The socket stopped reading; its handler closes it on the sentinel
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(None)
+
+
+async def publish(user_id, event: dict[str, Any], to_sockets: bool = True):
+    """Send an event to all of the user's open sockets, in every process."""
+    user_id = str(user_id) if user_id else ""
+    _deliver(user_id, event, to_sockets)
+    if not _multi_process():
+        return
+    message = {"origin": _ORIGIN, "user_id": user_id, "event": event, "to_sockets": to_sockets}
+    payload = json.dumps(message, default=str)
+    try:
+        async with async_session() as session:
+            await session.execute(select(func.pg_notify(CHANNEL, payload)))
+            await session.commit()
+    except Exception as exc:
+        logger.warning("Could not publish event to other workers: %s", exc)
+
+
+def _on_notify(_conn, _pid, _channel, payload: str):
+    try:
+        message = json.loads(payload)
+    except ValueError:
+        return
+    if message.get("origin") == _ORIGIN:
+        return  # already delivered locally by publish()
+    _deliver(message.get("user_id") or "", message.get("event") or {}, message.get("to_sockets", True))
+
+
+async def run_listener():
+    """Background loop: LISTEN for events published by other processes."""
+    global _listening
+    if not _multi_process():
+        return
+    dsn = settings.database_url.replace("postgresql+asyncpg://", "postgresql://", 1)
+    while True:
+        conn = None
+        try:
+            conn = await asyncpg.connect(dsn)
+            await conn.add_listener(CHANNEL, _on_notify)
+            _listening = True
+            # Events may have been missed while disconnected: handlers and clients re-check
+            _deliver("", {"type": "resync"})
+            for user_id in list(_sockets):
+                _deliver(user_id, {"type": "resync"})
+            while not conn.is_closed():
+                await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("Event LISTEN connection failed: %s", exc)
+        finally:
+            _listening = False
+            if conn is not None and not conn.is_closed():
+                await conn.close()
+        await asyncio.sleep(5)
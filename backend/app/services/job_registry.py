@@ -0,0 +1,71 @@
+"""
+Named AI jobs, so that a job can be described as data and run in another process.
+
+A coroutine exists only in the process that created it. task_queue.submit_job()
+instead takes the name of a function registered here, plus JSON arguments, and
+stores them in ai_jobs. So a worker process (app.worker) can run the function
+with TASK_QUEUE_EXECUTION=workers, and any live process can start the job over
+when the one running it was restarted. Modules that register jobs are listed in
+JOB_MODULES, so workers import them at startup.
+
+User settings hold the user's own provider API keys, so they never go into
+job arguments (and so into ai_jobs.payload): a job function that takes a
+`user_settings` parameter gets the submitting user's settings loaded when it
+runs, from user_cache or the users table.
+"""
+import importlib
+import inspect
+import uuid
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy import select
+
+from ..database import async_session
+from ..models import User
+from . import user_cache
+
+# Imported by workers so their jobs get registered (relative to this package)
+JOB_MODULES = ("..routers.ai", "..routers.survey")
+
+_jobs: dict[str, Callable[..., Awaitable[Any]]] = {}
+# Jobs whose function takes user_settings
+_with_settings: set[str] = set()
+
+
+def register(name: str, fn: Callable[..., Awaitable[Any]] | None = None):
+    """Register an async function as job `name`; usable as a decorator."""
+    def _register(f):
+        _jobs[name] = f
+        if "user_settings" in inspect.signature(f).parameters:
+            _with_settings.add(name)
+        return f
+    return _register(fn) if fn is not None else _register
+
+
+def names() -> list[str]:
+    return sorted(_jobs)
+
+
+async def _user_settings(user_id) -> dict | None:
+    if not user_id:
+        return None
+    snapshot = user_cache.get_user(str(user_id))
+    if snapshot is not None:
+        return snapshot["settings"]
+    async with async_session() as session:
+        return await session.scalar(select(User.settings).where(User.id == uuid.UUID(str(user_id))))
+
+
+async def run(name: str, args: dict[str, Any], user_id=None) -> Any:
+    """Run job `name` for the user who submitted it."""
+    fn = _jobs.get(name)
+    if fn is None:
+        raise LookupError(f"Неизвестная AI-задача: {name}")
+    if name in _with_settings:
+        args = {**args, "user_settings": await _user_settings(user_id)}
+    return await fn(**args)
+
+
+def load_all():
+    for module in JOB_MODULES:
+        importlib.import_module(module, __package__)
@@ -0,0 +1,146 @@
+"""
+Priority and per-user fair scheduling of AI jobs.
+
+task_queue used to start every job at once, so one user firing ten analyses
+competed equally with everyone's interactive chats. Now at most
+TASK_QUEUE_WORKERS jobs run per process and the rest wait here:
+  - operations fall into priority classes: interactive (chat, brain dump...),
+    standard (survey steps, analyses) and background (profile updates);
+  - classes share the workers by deficit round-robin. On its turn a class earns
+    its quantum (8/4/2) and spends it on jobs, which cost 1/2/4 by the model
+    tier of their operation. Interactive work gets most of the capacity, and
+    background work still makes progress under load;
+  - within a class, users take turns (one job each per turn), and a user never
+    has more than TASK_QUEUE_USER_CONCURRENCY jobs running.
+Jobs are plain dicts: {"task_id", "user", "class", "cost", ...}; the caller
+attaches whatever it needs to start them.
+"""
+from collections import OrderedDict, deque
+
+from ..config import settings
+from .ai_service import OPERATION_TIERS
+
+CLASSES = ("interactive", "standard", "background")
+QUANTUM = {"interactive": 8, "standard": 4, "background": 2}
+_TIER_COST = {"small": 1, "standard": 2, "large": 4}
+
+OPERATION_CLASSES = {
+    "chat": "interactive",
+    "smart_chat": "interactive",
+    "brain_dump": "interactive",
+    "onboarding": "interactive",
+    "morning_plan": "interactive",
+    "morning_plan_cached": "interactive",
+    "survey_update_profile": "background",
+    "survey_generate_step_2_speculative": "background",
+    "survey_generate_step_4_speculative": "background",
+    "survey_generate_step_5_speculative": "background",
+    "morning_plan_precompute": "background",
+}
+# Anything else (survey steps, retrospective, analyses) is "standard"
+
+# class -> user -> jobs waiting, users in turn order
+_queues: dict[str, OrderedDict[str, deque]] = {cls: OrderedDict() for cls in CLASSES}
+_deficit: dict[str, int] = {cls: 0 for cls in CLASSES}
+_turn = 0
+_running_total = 0
+_running_by_user: dict[str, int] = {}
+
+
+def classify(operation_type: str | None) -> tuple[str, int]:
+    """(priority class, DRR cost) of an operation."""
+    cls = OPERATION_CLASSES.get(operation_type or "", "standard")
+    cost = _TIER_COST[OPERATION_TIERS.get(operation_type or "", "standard")]
+    return cls, cost
+
+
+def enqueue(job: dict):
+    _queues[job["class"]].setdefault(job["user"], deque()).append(job)
+
+
+def remove(task_id: str) -> dict | None:
+    """Take a job out of the queue before it started; None if it isn't waiting."""
+    for users in _queues.values():
+        for user, jobs in users.items():
+            for job in jobs:
+                if job["task_id"] == task_id:
+                    jobs.remove(job)
+                    if not jobs:
+                        del users[user]
+                    return job
+    return None
+
+
+def _peek(cls: str) -> tuple[str, dict] | None:
+    """First user in turn order with a waiting job and a free concurrency slot."""
+    cap = settings.task_queue_user_concurrency
+    for user, jobs in _queues[cls].items():
+        if user and _running_by_user.get(user, 0) >= cap:
+            continue
+        return user, jobs[0]
+    return None
+
+
+def _take(cls: str, user: str) -> dict:
+    users = _queues[cls]
+    jobs = users.pop(user)
+    job = jobs.popleft()
+    if jobs:
+        users[user] = jobs  # back of the line: the next user goes first
+    return job
+
+
+def _advance():
+    global _turn
+    _turn = (_turn + 1) % len(CLASSES)
+    cls = CLASSES[_turn]
+    _deficit[cls] += QUANTUM[cls]
+
+
+def next_job() -> dict | None:
+    """The next job to start if a worker is free, by DRR over classes; marks it running."""
+    global _running_total
+    if _running_total >= settings.task_queue_workers:
+        return None
+    idle = 0
+    while idle < len(CLASSES):
+        cls = CLASSES[_turn]
+        head = _peek(cls)
+        if head is None:
+            _deficit[cls] = 0
+            idle += 1
+            _advance()
+            continue
+        idle = 0
+        user, job = head
+        if job["cost"] <= _deficit[cls]:
+            _deficit[cls] -= job["cost"]
+            _take(cls, user)
+            _running_total += 1
+            _running_by_user[user] = _running_by_user.get(user, 0) + 1
+            return job
+        _advance()
+    return None
+
+
+def finished(job: dict):
+    """A job started by next_job() is over; frees its worker and user slot."""
+    global _running_total
+    _running_total -= 1
+    user = job["user"]
+    _running_by_user[user] -= 1
+    if not _running_by_user[user]:
+        del _running_by_user[user]
+
+
+def waiting() -> list[dict]:
+    return [job for users in _queues.values() for jobs in users.values() for job in jobs]
+
+
+def stats() -> dict:
+    return {
+        "workers": settings.task_queue_workers,
+        "running": _running_total,
+        "queued": {cls: sum(len(jobs) for jobs in _queues[cls].values()) for cls in CLASSES},
+        "users_running": len(_running_by_user),
+    }
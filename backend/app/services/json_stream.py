@@ -0,0 +1,78 @@
+"""
+Incremental parser for JSON objects streamed token by token.
+
+LLM replies like {"reply": "...", "items": [{...}, {...}]} arrive in small
+text deltas. ArrayItemParser tracks string/escape state and nesting depth over
+the deltas and returns each element of one top-level array field as soon as
+its closing brace arrives, long before the whole reply is valid JSON. Text
+around the object (markdown fences, a stray preamble) is ignored.
+"""
+import json
+
+
+class ArrayItemParser:
+    """Emits the objects of `field` (an array in the top-level object) as they close."""
+
+    def __init__(self, field: str = "items"):
+        self.field = field
+        self._buf = ""
+        self._pos = 0
+        self._stack: list[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: str | None = None
+        self._key: str | None = None
+        self._in_field = False
+        self._item_start: int | None = None
+
+    def feed(self, delta: str) -> list[dict]:
+        """Consume the next chunk of text; returns objects completed by it."""
+        self._buf += delta
+        done: list[dict] = []
+        buf = self._buf
+        for i in range(self._pos, len(buf)):
+            c = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1:
+                        self._last_string = buf[self._string_start:i + 1]
+                continue
+            if not self._stack:
+                # Outside the top-level object only its opening brace matters
+                if c == "{":
+                    self._stack.append(c)
+                continue
+            if c == '"':
+                self._in_string = True
+                self._string_start = i
+            elif c == ":" and len(self._stack) == 1 and self._last_string is not None:
+                try:
+                    self._key = json.loads(self._last_string)
+                except ValueError:
+                    self._key = None
+            elif c in "{[":
+                if c == "[" and len(self._stack) == 1 and self._key == self.field:
+                    self._in_field = True
+                elif c == "{" and self._in_field and len(self._stack) == 2:
+                    self._item_start = i
+                self._stack.append(c)
+            elif c in "}]":
+                self._stack.pop()
+                if self._in_field and len(self._stack) == 2 and c == "}" and self._item_start is not None:
+                    try:
+                        item = json.loads(buf[self._item_start:i + 1])
+                    except ValueError:
+                        item = None
+                    if isinstance(item, dict):
+                        done.append(item)
+                    self._item_start = None
+                elif self._in_field and len(self._stack) == 1:
+                    self._in_field = False
+        self._pos = len(buf)
+        return done
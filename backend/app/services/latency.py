@@ -0,0 +1,224 @@
+"""
+Streaming duration estimates of AI operations for progress bars and ETAs.
+
+Every finished AI job adds its duration here. Each operation keeps an EWMA
+and a small log-bucketed histogram (DDSketch-style: bucket bounds grow by a
+constant factor, so any quantile is within RELATIVE_ACCURACY of the true
+value). The histogram has about 150 buckets whatever the number of runs. Old
+runs fade out: the weights are halved whenever they exceed MAX_WEIGHT, so
+estimates follow model or provider changes.
+
+Estimates are answered from memory: p50/p90 per operation, and the remaining
+time of a running job, computed as the median of past runs that lasted at
+least as long as this one has so far. Durations are written to operation_timings
+in batches by a background loop, and the sketches are seeded from the latest
+rows at startup. Each written batch is also published as a "timings" event
+through the events hub, so every process adds the runs of the others: with
+TASK_QUEUE_EXECUTION=workers the API processes, which answer avg-duration and
+ETAs, run no jobs themselves.
+"""
+import asyncio
+import logging
+import math
+import uuid
+
+from sqlalchemy import func, insert, select
+
+from ..database import async_session
+from ..models import OperationTiming
+from . import events
+
+logger = logging.getLogger("todopilot.latency")
+
+RELATIVE_ACCURACY = 0.05
+EWMA_ALPHA = 0.2
+MAX_WEIGHT = 1000
+# Fewer runs than this give no estimate
+MIN_SAMPLES = 3
+# Runs per operation read from operation_timings at startup
+WARM_SAMPLES = 200
+
+# How often pending durations are written to operation_timings
+_FLUSH_INTERVAL = 10.0
+# Durations kept for the next flush while the DB is unreachable
+_MAX_PENDING = 10_000
+# Runs per "timings" event, to stay well under the 8 KB NOTIFY payload limit
+_EVENT_RUNS = 50
+# Marks this process's own "timings" events, whose runs are already in its sketches
+_ORIGIN = uuid.uuid4().hex
+
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+
+
+class LatencySketch:
+    """EWMA and decaying log-bucket histogram of one operation's durations (ms)."""
+
+    def __init__(self):
+        self.buckets: dict[int, float] = {}
+        self.weight = 0.0
+        self.samples = 0
+        self.ewma: float | None = None
+
+    def add(self, ms: float):
+        ms = max(float(ms), 1.0)
+        index = math.ceil(math.log(ms) / _LOG_GAMMA)
+        self.buckets[index] = self.buckets.get(index, 0.0) + 1
+        self.weight += 1
+        self.samples += 1
+        self.ewma = ms if self.ewma is None else self.ewma + EWMA_ALPHA * (ms - self.ewma)
+        if self.weight > MAX_WEIGHT:
+            self.buckets = {i: w / 2 for i, w in self.buckets.items() if w >= 0.02}
+            self.weight = sum(self.buckets.values())
+
+    @staticmethod
+    def _value(index: int) -> float:
+        """Representative value of a bucket: within RELATIVE_ACCURACY of everything in it."""
+        return 2 * _GAMMA ** index / (_GAMMA + 1)
+
+    def quantile(self, q: float) -> float | None:
+        if not self.weight:
+            return None
+        rank = min(max(q, 0.0), 1.0) * self.weight
+        seen = 0.0
+        ordered = sorted(self.buckets)
+        for index in ordered:
+            seen += self.buckets[index]
+            if seen >= rank:
+                return self._value(index)
+        return self._value(ordered[-1])
+
+    def cdf(self, ms: float) -> float:
+        """Share of runs that finished within `ms`."""
+        if not self.weight:
+            return 0.0
+        limit = math.ceil(math.log(max(ms, 1.0)) / _LOG_GAMMA)
+        return sum(w for i, w in self.buckets.items() if i < limit) / self.weight
+
+
+_sketches: dict[str, LatencySketch] = {}
+_pending: list[tuple[str, int]] = []
+
+
+def _add(operation: str, duration_ms: int):
+    sketch = _sketches.get(operation)
+    if sketch is None:
+        sketch = _sketches[operation] = LatencySketch()
+    sketch.add(duration_ms)
+
+
+def record(operation: str, duration_ms: int):
+    """Add a finished run; it reaches operation_timings with the next flush."""
+    _add(operation, duration_ms)
+    _pending.append((operation, duration_ms))
+    if len(_pending) > _MAX_PENDING:
+        del _pending[:len(_pending) - _MAX_PENDING]
+
+
+def estimate(operation: str) -> dict | None:
+    """{"p50_ms", "p90_ms", "ewma_ms", "samples"} of an operation, or None without enough runs."""
+    sketch = _sketches.get(operation)
+    if sketch is None or sketch.samples < MIN_SAMPLES:
+        return None
+    return {
+        "p50_ms": int(sketch.quantile(0.5)),
+        "p90_ms": int(sketch.quantile(0.9)),
+        "ewma_ms": int(sketch.ewma),
+        "samples": sketch.samples,
+    }
+
+
+def eta(operation: str | None, elapsed_ms: int) -> dict | None:
+    """Estimate for a job that has been running for `elapsed_ms`.
+
+    remaining_ms is None once the job has outlasted nearly all past runs.
+    """
+    stats = estimate(operation or "")
+    if stats is None:
+        return None
+    sketch = _sketches[operation]
+    done = sketch.cdf(elapsed_ms)
+    remaining = None
+    if done < 0.99:
+        remaining = max(int(sketch.quantile(done + (1 - done) / 2)) - elapsed_ms, 0)
+    return {
+        "p50_ms": stats["p50_ms"],
+        "p90_ms": stats["p90_ms"],
+        "elapsed_ms": elapsed_ms,
+        "remaining_ms": remaining,
+    }
+
+
+async def _load():
+    """Seed the sketches with the latest runs of each operation."""
+    ranked = select(
+        OperationTiming.operation_type,
+        OperationTiming.duration_ms,
+        func.row_number().over(
+            partition_by=OperationTiming.operation_type,
+            order_by=OperationTiming.created_at.desc(),
+        ).label("rn"),
+    ).subquery()
+    async with async_session() as session:
+        rows = await session.execute(
+            select(ranked.c.operation_type, ranked.c.duration_ms)
+            .where(ranked.c.rn <= WARM_SAMPLES)
+            .order_by(ranked.c.rn.desc())  # oldest first, so the EWMA ends on recent runs
+        )
+    for operation, duration_ms in rows.all():
+        _add(operation, duration_ms)
+
+
+async def flush():
+    """Write pending durations to operation_timings in one INSERT."""
+    if not _pending:
+        return
+    batch = list(_pending)
+    _pending.clear()
+    try:
+        async with async_session() as session:
+            await session.execute(
+                insert(OperationTiming),
+                [{"operation_type": op, "duration_ms": ms} for op, ms in batch],
+            )
+            await session.commit()
+    except Exception:
+        # Keep them for the next flush
+        _pending[:0] = batch[-_MAX_PENDING:]
+        del _pending[:max(len(_pending) - _MAX_PENDING, 0)]
+        raise
+    for i in range(0, len(batch), _EVENT_RUNS):
+        runs = [[op, ms] for op, ms in batch[i:i + _EVENT_RUNS]]
+        await events.publish("", {"type": "timings", "origin": _ORIGIN, "runs": runs}, to_sockets=False)
+
+
+def _on_event(user_id: str, event: dict):
+    """Add runs finished in other processes."""
+    if event.get("type") != "timings" or event.get("origin") == _ORIGIN:
+        return
+    for operation, duration_ms in event.get("runs") or ():
+        _add(operation, duration_ms)
+
+
+events.add_handler(_on_event)
+
+
+async def run_flusher():
+    """Background loop started from the app lifespan."""
+    try:
+        await _load()
+    except Exception as exc:
+        logger.warning("Could not load operation timings: %s", exc)
+    try:
+        while True:
+            await asyncio.sleep(_FLUSH_INTERVAL)
+            try:
+                await flush()
+            except Exception as exc:
+                logger.warning("Operation timings flush failed: %s", exc)
+    finally:
+        # Don't lose the last runs on shutdown
+        try:
+            await flush()
+        except Exception:
+            pass
@@ -0,0 +1,202 @@
+"""
+Per-provider circuit breaker and retry policy for LLM calls.
+
+When a provider is down, calls used to wait for the full LiteLLM timeout one
+after another inside task_queue. Now every call in ai_service._complete goes
+through call():
+  - retryable errors (timeouts, rate limits, connection errors, 5xx) are retried
+    with full-jitter exponential backoff, LLM_RETRY_ATTEMPTS times;
+  - outcomes feed a breaker per provider (and api_base host). Calls made with
+    a user's own API key get a breaker of their own, so one user's exhausted or
+    revoked key can't open the circuit for everybody else. Once at least
+    LLM_BREAKER_MIN_CALLS calls in the last LLM_BREAKER_WINDOW_SECONDS have
+    failed at LLM_BREAKER_FAILURE_RATE or more, the circuit opens and calls fail
+    immediately with ProviderUnavailableError;
+  - after LLM_BREAKER_COOLDOWN_SECONDS one probe call is let through
+    (half-open): success closes the circuit, failure opens it again.
+Errors caused by the request itself (bad key, invalid params) are not retried
+and do not count against the provider. Breakers are per process.
+"""
+import asyncio
+import hashlib
+import logging
+import random
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import litellm
+
+from ..config import settings
+
+logger = logging.getLogger("todopilot.llm")
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+_RETRYABLE = (
+    litellm.Timeout,
+    litellm.RateLimitError,
+    litellm.APIConnectionError,
+    litellm.ServiceUnavailableError,
+    litellm.InternalServerError,
+)
+_BACKOFF_BASE = 0.5
+_BACKOFF_CAP = 8.0
+# Breakers kept per process; idle ones of user keys are dropped beyond this
+_MAX_BREAKERS = 1000
+
+
+class ProviderUnavailableError(Exception):
+    """Raised without calling the provider while its circuit is open."""
+
+
+def is_retryable(exc: BaseException) -> bool:
+    return isinstance(exc, _RETRYABLE)
+
+
+class CircuitBreaker:
+    def __init__(self, key: str):
+        self.key = key
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.outcomes: deque[tuple[float, bool]] = deque()
+        self.last_error: str | None = None
+        self.times_opened = 0
+
+    def _trim(self, now: float):
+        horizon = now - settings.llm_breaker_window_seconds
+        while self.outcomes and self.outcomes[0][0] < horizon:
+            self.outcomes.popleft()
+
+    def failure_rate(self) -> float:
+        self._trim(time.monotonic())
+        if not self.outcomes:
+            return 0.0
+        return sum(1 for _, ok in self.outcomes if not ok) / len(self.outcomes)
+
+    def before_call(self) -> bool:
+        """Raise if the circuit is open; returns True when this call is the half-open probe."""
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < settings.llm_breaker_cooldown_seconds:
+                raise ProviderUnavailableError("AI-провайдер временно недоступен. Попробуйте через минуту.")
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            if self.probe_in_flight:
+                raise ProviderUnavailableError("AI-провайдер временно недоступен. Попробуйте через минуту.")
+            self.probe_in_flight = True
+            return True
+        return False
+
+    def record(self, ok: bool, probe: bool, error: BaseException | None = None):
+        now = time.monotonic()
+        if error is not None:
+            self.last_error = f"{type(error).__name__}: {str(error)[:200]}"
+        if probe:
+            self.probe_in_flight = False
+            if ok:
+                self.state = CLOSED
+                self.outcomes.clear()
+            else:
+                self._open(now)
+            return
+        self.outcomes.append((now, ok))
+        self._trim(now)
+        if (
+            self.state == CLOSED
+            and len(self.outcomes) >= settings.llm_breaker_min_calls
+            and self.failure_rate() >= settings.llm_breaker_failure_rate
+        ):
+            self._open(now)
+
+    def _open(self, now: float):
+        self.state = OPEN
+        self.opened_at = now
+        self.times_opened += 1
+        logger.warning("[LLM] Circuit for %s opened (last error: %s)", self.key, self.last_error)
+
+    def snapshot(self) -> dict:
+        retry_in = None
+        if self.state == OPEN:
+            retry_in = max(0.0, settings.llm_breaker_cooldown_seconds - (time.monotonic() - self.opened_at))
+        return {
+            "key": self.key,
+            "state": self.state,
+            "recent_calls": len(self.outcomes),
+            "failure_rate": round(self.failure_rate(), 3),
+            "times_opened": self.times_opened,
+            "retry_in_seconds": round(retry_in, 1) if retry_in is not None else None,
+            "last_error": self.last_error,
+        }
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def provider_key(model: str, api_base: str | None = None, api_key: str | None = None) -> str:
+    """Breaker key: LiteLLM provider prefix (openai when absent) plus api_base host,
+    plus a short hash of the API key unless it is the global LLM_API_KEY."""
+    provider = model.split("/", 1)[0] if "/" in model else ("anthropic" if model.startswith("claude") else "openai")
+    key = provider
+    if api_base:
+        key = f"{provider}@{urlsplit(api_base).netloc or api_base}"
+    if api_key and api_key != settings.llm_api_key:
+        key = f"{key}:user-key:{hashlib.sha256(api_key.encode()).hexdigest()[:12]}"
+    return key
+
+
+def get(key: str) -> CircuitBreaker:
+    breaker = _breakers.get(key)
+    if breaker is None:
+        if len(_breakers) >= _MAX_BREAKERS:
+            _drop_idle()
+        breaker = _breakers[key] = CircuitBreaker(key)
+    return breaker
+
+
+def _drop_idle():
+    """Forget closed user-key breakers without calls in the window; they hold nothing worth keeping."""
+    for key, breaker in list(_breakers.items()):
+        if ":user-key:" in key and breaker.state == CLOSED and breaker.failure_rate() == 0.0:
+            del _breakers[key]
+
+
+async def call(key: str, fn):
+    """Run `await fn()` under the provider's breaker with jittered exponential retries."""
+    breaker = get(key)
+    attempt = 0
+    while True:
+        probe = breaker.before_call()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            if probe:
+                breaker.probe_in_flight = False
+            raise
+        except Exception as exc:
+            if not is_retryable(exc):
+                # The request itself was wrong; says nothing about provider health
+                if probe:
+                    breaker.probe_in_flight = False
+                raise
+            breaker.record(False, probe, exc)
+            if attempt >= settings.llm_retry_attempts or breaker.state != CLOSED:
+                raise
+            attempt += 1
+            delay = random.uniform(0, min(_BACKOFF_CAP, _BACKOFF_BASE * 2 ** attempt))
+            logger.info("[LLM] %s failed (%s), retry %d in %.2fs", key, type(exc).__name__, attempt, delay)
+            await asyncio.sleep(delay)
+            continue
+        breaker.record(True, probe)
+        return result
+
+
+def snapshot() -> list[dict]:
+    return [b.snapshot() for b in _breakers.values()]
+
+
+def reset(key: str) -> bool:
+    if key not in _breakers:
+        return False
+    _breakers[key] = CircuitBreaker(key)
+    return True
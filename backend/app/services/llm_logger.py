@@ -4,7 +4,7 @@ Activated by setting LLM_DEBUG=true in .env. Logs every LLM call with:
 model, tokens (prompt+completion=total), cost, latency, truncated prompt/reply.
 
 Log format:
-  [LLM] OK   | model=gpt-4o-mini | tokens=320+180=500 | cost=$0.0003 | latency=1243ms | prompt="..." | reply="..."
+  [LLM] OK   | model=gpt-4o-mini | tokens=320+180=500 | cached=256 | cost=$0.0003 | latency=1243ms | prompt="..." | reply="..."
   [LLM] FAIL | model=gpt-4o-mini | error=AuthenticationError | latency=89ms
 """
 
@@ -21,22 +21,37 @@ def _truncate(text: str, limit: int = 200) -> str:
     return flat[:limit] + "…" if len(flat) > limit else flat
 
 
+def extract_usage(kwargs, response_obj, start_time, end_time) -> dict:
+    """Pull model, token counts, cost and latency out of a LiteLLM callback payload."""
+    usage = getattr(response_obj, "usage", None)
+    # Prompt-cache hits: OpenAI/DeepSeek report prompt_tokens_details.cached_tokens,
+    # Anthropic reports cache_read_input_tokens / cache_creation_input_tokens
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", 0) or getattr(usage, "cache_read_input_tokens", 0) or 0
+    return {
+        "model": kwargs.get("model", "?"),
+        "prompt_tokens": (getattr(usage, "prompt_tokens", 0) or 0) if usage else 0,
+        "completion_tokens": (getattr(usage, "completion_tokens", 0) or 0) if usage else 0,
+        "cached_tokens": cached,
+        "cache_write_tokens": getattr(usage, "cache_creation_input_tokens", 0) or 0,
+        # Cost (LiteLLM attaches this in post-processing)
+        "cost": kwargs.get("response_cost") or 0,
+        "latency_ms": int((end_time - start_time).total_seconds() * 1000),
+    }
+
+
 class LLMDebugLogger(CustomLogger):
     """Structured logger for all LiteLLM completion calls."""
 
     def _log_success(self, kwargs, response_obj, start_time, end_time):
         try:
-            latency_ms = int((end_time - start_time).total_seconds() * 1000)
-            model = kwargs.get("model", "?")
-
-            # Token usage
-            usage = getattr(response_obj, "usage", None)
-            prompt_tokens = getattr(usage, "prompt_tokens", 0) if usage else 0
-            completion_tokens = getattr(usage, "completion_tokens", 0) if usage else 0
+            usage = extract_usage(kwargs, response_obj, start_time, end_time)
+            latency_ms = usage["latency_ms"]
+            model = usage["model"]
+            prompt_tokens = usage["prompt_tokens"]
+            completion_tokens = usage["completion_tokens"]
             total_tokens = prompt_tokens + completion_tokens
-
-            # Cost (LiteLLM attaches this in post-processing)
-            cost = kwargs.get("response_cost") or 0
+            cost = usage["cost"]
 
             # Last user message as prompt preview
             messages = kwargs.get("messages") or kwargs.get("input", [])
@@ -54,11 +69,12 @@ class LLMDebugLogger(CustomLogger):
                 reply = content or ""
 
             logger.info(
-                '[LLM] OK | model=%s | tokens=%d+%d=%d | cost=$%.4f | latency=%dms | prompt="%s" | reply="%s"',
+                '[LLM] OK | model=%s | tokens=%d+%d=%d | cached=%d | cost=$%.4f | latency=%dms | prompt="%s" | reply="%s"',
                 model,
                 prompt_tokens,
                 completion_tokens,
                 total_tokens,
+                usage["cached_tokens"],
                 cost,
                 latency_ms,
                 _truncate(last_user),
@@ -0,0 +1,180 @@
+"""
+Shared keep-alive HTTP connection pool for LLM providers.
+
+Without it, LiteLLM's httpx clients drop idle connections after 5 seconds, so
+sparse calls (test_connection, a lone chat message) pay a new TCP + TLS
+handshake every time. One long-lived httpx.AsyncClient with a long keep-alive
+expiry is created in the app lifespan and handed to LiteLLM:
+  - litellm.aclient_session, used by every OpenAI-compatible client LiteLLM
+    builds (OpenAI, Azure, DeepSeek, other api_base endpoints);
+  - an AsyncHTTPHandler over the same client, passed as `client=` to Anthropic
+    calls by apply().
+httpx keeps a separate connection pool per origin, so each provider and
+api_base gets its own keep-alive connections. At startup the configured
+provider is pre-connected with a few cheap requests so the first real calls
+skip the handshake.
+
+Per-host metrics come from httpcore trace events: requests, new connections
+(the rest reused a pooled connection) and TCP/TLS handshake times.
+"""
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+import httpx
+import litellm
+from litellm.llms.custom_httpx.http_handler import AsyncHTTPHandler
+
+from ..config import settings
+
+logger = logging.getLogger("todopilot.llm")
+
+# Default endpoints for providers selected by model name alone
+_PROVIDER_BASES = {
+    "openai": "https://api.openai.com/v1",
+    "anthropic": "https://api.anthropic.com",
+    "deepseek": "https://api.deepseek.com",
+}
+
+_client: httpx.AsyncClient | None = None
+_anthropic_handler: AsyncHTTPHandler | None = None
+_stats: dict[str, dict[str, float]] = defaultdict(lambda: {
+    "requests": 0, "new_connections": 0, "tcp_connect_ms_total": 0.0, "tls_handshake_ms_total": 0.0,
+})
+
+
+class _SharedHandler(AsyncHTTPHandler):
+    """LiteLLM handler that sends through the shared client instead of creating its own."""
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self.timeout = client.timeout
+        self.event_hooks = None
+        self.client_alias = "todopilot-pool"
+
+
+def _tracer(host: str):
+    started: dict[str, float] = {}
+    stats = _stats[host]
+
+    async def trace(event: str, info: dict):
+        if event.endswith(".started"):
+            started[event[:-len(".started")]] = time.perf_counter()
+            return
+        if not event.endswith(".complete"):
+            return
+        name = event[:-len(".complete")]
+        begin = started.pop(name, None)
+        if name == "connection.connect_tcp":
+            stats["new_connections"] += 1
+            if begin is not None:
+                stats["tcp_connect_ms_total"] += (time.perf_counter() - begin) * 1000
+        elif name == "connection.start_tls" and begin is not None:
+            stats["tls_handshake_ms_total"] += (time.perf_counter() - begin) * 1000
+
+    return trace
+
+
+async def _on_request(request: httpx.Request):
+    host = request.url.host
+    _stats[host]["requests"] += 1
+    request.extensions["trace"] = _tracer(host)
+
+
+def provider_base(model: str, api_base: str | None = None) -> str | None:
+    """Endpoint a model's calls go to, for pre-connecting."""
+    if api_base:
+        return api_base
+    if model.startswith("ollama/"):
+        return None  # local, handshakes are cheap
+    if model.startswith("anthropic/") or model.startswith("claude"):
+        return _PROVIDER_BASES["anthropic"]
+    if model.startswith("deepseek/"):
+        return _PROVIDER_BASES["deepseek"]
+    if "/" not in model:
+        return _PROVIDER_BASES["openai"]
+    return None
+
+
+async def _warm(base: str, connections: int):
+    """Open `connections` keep-alive connections to the provider's origin."""
+    parts = urlsplit(base)
+    origin = f"{parts.scheme}://{parts.netloc}/"
+
+    async def _touch():
+        try:
+            # Any response (even 401/404) leaves a handshaken connection in the pool
+            await _client.head(origin, timeout=10)
+        except Exception as exc:
+            logger.debug("[LLM] Pool warm-up of %s failed: %s", origin, exc)
+
+    await asyncio.gather(*(_touch() for _ in range(connections)))
+
+
+def start():
+    """Create the shared pool and hand it to LiteLLM."""
+    global _client, _anthropic_handler
+    _client = httpx.AsyncClient(
+        timeout=httpx.Timeout(600.0, connect=5.0),
+        limits=httpx.Limits(
+            max_connections=settings.llm_pool_max_connections,
+            max_keepalive_connections=settings.llm_pool_max_connections,
+            keepalive_expiry=settings.llm_pool_keepalive_seconds,
+        ),
+        event_hooks={"request": [_on_request]},
+    )
+    _anthropic_handler = _SharedHandler(_client)
+    litellm.aclient_session = _client
+
+
+async def warm():
+    """Pre-connect the globally configured provider (run in the background at startup)."""
+    if _client is None or settings.llm_standin or settings.llm_pool_warm_connections <= 0:
+        return
+    base = provider_base(settings.llm_model, settings.llm_api_base)
+    if base:
+        started = time.perf_counter()
+        await _warm(base, settings.llm_pool_warm_connections)
+        logger.info("[LLM] Pre-connected %s in %dms", base, (time.perf_counter() - started) * 1000)
+
+
+async def close():
+    global _client, _anthropic_handler
+    if _client is not None:
+        litellm.aclient_session = None
+        await _client.aclose()
+    _client = None
+    _anthropic_handler = None
+
+
+def apply(kwargs: dict):
+    """Route a call through the shared pool where LiteLLM takes an explicit client."""
+    model = kwargs.get("model", "")
+    if _anthropic_handler is not None and "client" not in kwargs and (
+        model.startswith("anthropic/") or model.startswith("claude")
+    ):
+        kwargs["client"] = _anthropic_handler
+
+
+def stats() -> dict:
+    """Per-host connection reuse and handshake metrics."""
+    result = {}
+    for host, s in _stats.items():
+        new = int(s["new_connections"])
+        requests = int(s["requests"])
+        result[host] = {
+            "requests": requests,
+            "new_connections": new,
+            "reused_requests": max(requests - new, 0),
+            "reuse_ratio": round((requests - new) / requests, 3) if requests else None,
+            "avg_tcp_connect_ms": round(s["tcp_connect_ms_total"] / new, 1) if new else None,
+            "avg_tls_handshake_ms": round(s["tls_handshake_ms_total"] / new, 1) if new else None,
+        }
+    return {
+        "active": _client is not None,
+        "keepalive_seconds": settings.llm_pool_keepalive_seconds,
+        "max_connections": settings.llm_pool_max_connections,
+        "hosts": result,
+    }
@@ -0,0 +1,217 @@
+"""Local stand-in LLM provider for load tests and benchmarks.
+
+Activated by setting LLM_STANDIN=true in .env. get_llm_kwargs() then routes every
+call to the "standin/sim-<model>" LiteLLM provider implemented here instead of a
+real API, so AI endpoints can be exercised without spending tokens.
+
+Behaviour is configured via settings:
+  LLM_STANDIN_LATENCY      time to first token: "fixed:800", "uniform:300:1500"
+                           or "lognormal:<median_ms>:<sigma>"
+  LLM_STANDIN_TOKENS_PER_SEC  completion generation speed (paces streaming too)
+  LLM_STANDIN_ERROR_RATE   fraction of calls that fail (0..1)
+  LLM_STANDIN_ERRORS       comma-separated error kinds to inject:
+                           rate_limit, timeout, unavailable, server
+  LLM_STANDIN_REPLAY_FILE  JSONL of recorded {"prompt_hash", "response"} pairs
+  LLM_RECORD_FILE          record real responses into that JSONL format
+
+Without a recorded reply, a canned answer shaped like the prompt's expected
+format (brain dump JSON, survey JSON array, retrospective object, text) is returned.
+Repeated system prompts are reported as cached prompt tokens, like a provider
+prompt cache would.
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import time
+from collections import OrderedDict
+from typing import AsyncIterator
+
+import litellm
+from litellm import CustomLLM, ModelResponse, Usage
+from litellm.integrations.custom_logger import CustomLogger
+
+from ..config import settings
+
+PROVIDER = "standin"
+
+_CANNED_TEXT = (
+    "Начните с самой приоритетной задачи на сегодня и разбейте её на короткие шаги. "
+    "После первого блока работы сделайте перерыв и проверьте, что осталось из важного. "
+    "Задачи без дедлайна перенесите на вечер или на завтра."
+)
+
+
+def prompt_hash(messages: list) -> str:
+    """Key for recorded responses: hash of the last user message."""
+    last_user = ""
+    for m in reversed(messages or []):
+        if isinstance(m, dict) and m.get("role") == "user":
+            content = m.get("content", "")
+            last_user = content if isinstance(content, str) else json.dumps(content, ensure_ascii=False)
+            break
+    return hashlib.sha1(" ".join(last_user.split()).encode()).hexdigest()
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _sample_latency_ms(spec: str) -> float:
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(":") if v]
+    if kind == "fixed":
+        return values[0]
+    if kind == "uniform":
+        return random.uniform(values[0], values[1])
+    if kind == "lognormal":
+        median, sigma = values[0], (values[1] if len(values) > 1 else 0.5)
+        return random.lognormvariate(0, sigma) * median
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def _canned_reply(messages: list) -> str:
+    prompt = ""
+    for m in reversed(messages or []):
+        if isinstance(m, dict) and m.get("role") == "user":
+            prompt = str(m.get("content", ""))
+            break
+
+    if "полем items" in prompt:
+        return json.dumps({
+            "reply": "Нашёл 3 задачи и 1 проект",
+            "items": [
+                {"type": "project", "title": "Ремонт", "priority": 0, "due_date": None, "project": None, "goal": None},
+                {"type": "task", "title": "Купить краску", "priority": 2, "due_date": None, "project": "Ремонт", "goal": None},
+                {"type": "task", "title": "Позвонить мастеру", "priority": 3, "due_date": None, "project": "Ремонт", "goal": None},
+                {"type": "task", "title": "Подготовить отчёт", "priority": 4, "due_date": None, "project": None, "goal": None},
+            ],
+        }, ensure_ascii=False)
+    if "JSON-массив строк" in prompt:
+        return json.dumps(["Я закончил отчёт", "Я провёл три тренировки", "Я разобрал входящие"], ensure_ascii=False)
+    if "achievements (список достижений)" in prompt:
+        return json.dumps({
+            "achievements": ["Закрыл ключевые задачи недели"],
+            "difficulties": ["Много переключений между задачами"],
+            "improvements": ["Планировать день с вечера"],
+            "weekly_goals": ["Завершить проект"],
+        }, ensure_ascii=False)
+    return _CANNED_TEXT
+
+
+# Distinct system prompts remembered for simulated prompt-cache hits
+_MAX_SEEN_PREFIXES = 256
+
+
+class StandInLLM(CustomLLM):
+    """LiteLLM custom provider that simulates latency, token rate and errors."""
+
+    def __init__(self):
+        super().__init__()
+        # System prompts seen recently count as provider prompt-cache hits (LRU, like a real cache)
+        self._seen_prefixes: OrderedDict[str, None] = OrderedDict()
+        self._replay: dict[str, str] = {}
+        if settings.llm_standin_replay_file:
+            with open(settings.llm_standin_replay_file, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self._replay[record["prompt_hash"]] = record["response"]
+
+    def _maybe_fail(self, model: str):
+        if random.random() >= settings.llm_standin_error_rate:
+            return
+        kinds = [k.strip() for k in settings.llm_standin_errors.split(",") if k.strip()] or ["server"]
+        kind = random.choice(kinds)
+        message = f"Stand-in injected {kind} error"
+        if kind == "rate_limit":
+            raise litellm.RateLimitError(message, llm_provider=PROVIDER, model=model)
+        if kind == "timeout":
+            raise litellm.Timeout(message, model=model, llm_provider=PROVIDER)
+        if kind == "unavailable":
+            raise litellm.ServiceUnavailableError(message, llm_provider=PROVIDER, model=model)
+        raise litellm.InternalServerError(message, llm_provider=PROVIDER, model=model)
+
+    def _reply(self, messages: list) -> str:
+        return self._replay.get(prompt_hash(messages)) or _canned_reply(messages)
+
+    def _usage(self, messages: list, reply: str) -> Usage:
+        prompt_tokens = sum(_estimate_tokens(str(m.get("content", ""))) for m in messages if isinstance(m, dict))
+        completion_tokens = _estimate_tokens(reply)
+        system = next((str(m.get("content", "")) for m in messages if isinstance(m, dict) and m.get("role") == "system"), "")
+        prefix = hashlib.sha1(system.encode()).hexdigest()
+        cached_tokens = _estimate_tokens(system) if system and prefix in self._seen_prefixes else 0
+        self._seen_prefixes[prefix] = None
+        self._seen_prefixes.move_to_end(prefix)
+        if len(self._seen_prefixes) > _MAX_SEEN_PREFIXES:
+            self._seen_prefixes.popitem(last=False)
+        return Usage(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+            prompt_tokens_details={"cached_tokens": cached_tokens},
+        )
+
+    async def acompletion(
+        self, model: str, messages: list, *args, model_response: ModelResponse, **kwargs,
+    ) -> ModelResponse:
+        await asyncio.sleep(_sample_latency_ms(settings.llm_standin_latency) / 1000)
+        self._maybe_fail(model)
+        reply = self._reply(messages)
+        await asyncio.sleep(_estimate_tokens(reply) / settings.llm_standin_tokens_per_sec)
+        model_response.model = f"{PROVIDER}/{model}"
+        model_response.choices[0].message.content = reply
+        model_response.choices[0].finish_reason = "stop"
+        setattr(model_response, "usage", self._usage(messages, reply))
+        return model_response
+
+    async def astreaming(self, model: str, messages: list, *args, **kwargs) -> AsyncIterator[dict]:
+        await asyncio.sleep(_sample_latency_ms(settings.llm_standin_latency) / 1000)
+        self._maybe_fail(model)
+        reply = self._reply(messages)
+        # Emit roughly one token (4 chars) per chunk at the configured rate
+        step = 4
+        delay = 1 / settings.llm_standin_tokens_per_sec
+        for i in range(0, len(reply), step):
+            await asyncio.sleep(delay)
+            yield {
+                "text": reply[i:i + step],
+                "tool_use": None,
+                "is_finished": False,
+                "finish_reason": "",
+                "usage": None,
+                "index": 0,
+            }
+        usage = self._usage(messages, reply)
+        yield {
+            "text": "",
+            "tool_use": None,
+            "is_finished": True,
+            "finish_reason": "stop",
+            "usage": {
+                "prompt_tokens": usage.prompt_tokens,
+                "completion_tokens": usage.completion_tokens,
+                "total_tokens": usage.total_tokens,
+            },
+            "index": 0,
+        }
+
+
+class ResponseRecorder(CustomLogger):
+    """Appends real prompt/response pairs to LLM_RECORD_FILE for later replay."""
+
+    async def async_log_success_event(self, kwargs, response_obj, start_time, end_time):
+        try:
+            content = response_obj.choices[0].message.content or ""
+            record = {
+                "prompt_hash": prompt_hash(kwargs.get("messages") or []),
+                "model": kwargs.get("model"),
+                "latency_ms": int((end_time - start_time).total_seconds() * 1000),
+                "recorded_at": int(time.time()),
+                "response": content,
+            }
+            with open(settings.llm_record_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except Exception:
+            pass  # recording must never break a real call
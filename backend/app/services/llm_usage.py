@@ -0,0 +1,222 @@
+"""
+Per-user LLM token and cost accounting with daily budgets.
+
+Every LiteLLM call made through ai_service carries the user and operation it
+belongs to (bound by task_queue or the caller via bind()). UsageLogger, a
+LiteLLM callback that is always registered, adds each call's tokens, cost and
+latency to in-memory counters; a background loop flushes them into the
+aggregated llm_usage table (one upsert per user/day/operation/model) every few
+seconds, so recording costs no DB round trip per call.
+
+check_budget() runs before each call and rejects users who have used up
+LLM_DAILY_TOKEN_BUDGET tokens today (UTC). Totals from the DB are cached
+per user for a minute and combined with not-yet-flushed counters.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import date, datetime, timezone
+
+from litellm.integrations.custom_logger import CustomLogger
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+
+from ..config import settings
+from .llm_logger import extract_usage
+
+logger = logging.getLogger("todopilot.llm")
+
+_user_id: ContextVar[str | None] = ContextVar("llm_user_id", default=None)
+_operation: ContextVar[str | None] = ContextVar("llm_operation", default=None)
+
+# How often pending counters are written to llm_usage
+_FLUSH_INTERVAL = 5.0
+# How long a user's persisted daily total is trusted before re-reading it
+_TOTALS_TTL = 60.0
+
+# (user_id, day, operation, model) -> counters not yet written to the DB
+_pending: dict[tuple[str | None, date, str, str], dict[str, float]] = {}
+# (user_id, day) -> (tokens already in the DB, loaded_at monotonic)
+_persisted: dict[tuple[str, date], tuple[int, float]] = {}
+_flush_lock = asyncio.Lock()
+
+
+class BudgetExceededError(Exception):
+    """Raised before an LLM call when the user's daily token budget is used up."""
+
+
+def bind(user_id=None, operation: str | None = None):
+    """Attribute LLM calls made in the current context to a user and operation."""
+    if user_id is not None:
+        _user_id.set(str(user_id))
+    if operation is not None:
+        _operation.set(operation)
+
+
+def current() -> dict:
+    """Metadata for the LLM call about to be made in this context."""
+    return {"user_id": _user_id.get(), "operation": _operation.get() or "other"}
+
+
+def _today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+_COUNTERS = (
+    "calls", "errors", "prompt_tokens", "completion_tokens", "cost_usd", "latency_ms_total",
+    "cached_tokens", "cache_write_tokens",
+)
+
+
+def record(user_id: str | None, operation: str, model: str, *, prompt_tokens: int = 0,
+           completion_tokens: int = 0, cost: float = 0, latency_ms: int = 0, error: bool = False,
+           cached_tokens: int = 0, cache_write_tokens: int = 0):
+    """Add one LLM call to the pending counters."""
+    key = (user_id, _today(), operation, model)
+    c = _pending.setdefault(key, {name: 0 for name in _COUNTERS})
+    c["calls"] += 1
+    c["errors"] += int(error)
+    c["prompt_tokens"] += prompt_tokens
+    c["completion_tokens"] += completion_tokens
+    c["cost_usd"] += cost
+    c["latency_ms_total"] += latency_ms
+    c["cached_tokens"] += cached_tokens
+    c["cache_write_tokens"] += cache_write_tokens
+
+
+def _pending_tokens(user_id: str, day: date) -> int:
+    return sum(
+        int(c["prompt_tokens"] + c["completion_tokens"])
+        for (uid, d, _, _), c in list(_pending.items())
+        if uid == user_id and d == day
+    )
+
+
+async def tokens_used_today(user_id) -> int:
+    """Tokens the user spent today: cached DB total plus pending counters."""
+    from ..database import async_session
+    from ..models import LLMUsage
+
+    user_id = str(user_id)
+    day = _today()
+    cached = _persisted.get((user_id, day))
+    if cached is None or time.monotonic() - cached[1] > _TOTALS_TTL:
+        async with async_session() as session:
+            result = await session.execute(
+                select(func.coalesce(func.sum(LLMUsage.prompt_tokens + LLMUsage.completion_tokens), 0))
+                .where(LLMUsage.user_id == uuid.UUID(user_id), LLMUsage.day == day)
+            )
+            cached = (int(result.scalar() or 0), time.monotonic())
+        _persisted[(user_id, day)] = cached
+    return cached[0] + _pending_tokens(user_id, day)
+
+
+async def check_budget():
+    """Raise BudgetExceededError if the current user is over today's token budget."""
+    user_id = _user_id.get()
+    if not user_id or settings.llm_daily_token_budget <= 0:
+        return
+    used = await tokens_used_today(user_id)
+    if used >= settings.llm_daily_token_budget:
+        raise BudgetExceededError("Дневной лимит AI-токенов исчерпан. Попробуйте завтра.")
+
+
+async def flush():
+    """Write pending counters to llm_usage with one upsert per key."""
+    from ..database import async_session
+    from ..models import LLMUsage
+
+    async with _flush_lock:
+        if not _pending:
+            return
+        batch = dict(_pending)
+        _pending.clear()
+
+        rows = [
+            {"user_id": uuid.UUID(uid) if uid else None, "day": day, "operation": op, "model": model, **counters}
+            for (uid, day, op, model), counters in batch.items()
+        ]
+        stmt = insert(LLMUsage).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_llm_usage_user_day_op_model",
+            set_={
+                col: getattr(LLMUsage, col) + getattr(stmt.excluded, col)
+                for col in _COUNTERS
+            },
+        )
+        try:
+            async with async_session() as session:
+                await session.execute(stmt)
+                await session.commit()
+        except Exception:
+            # Put the counters back so the next flush retries them
+            for key, counters in batch.items():
+                current_counters = _pending.setdefault(key, {k: 0 for k in counters})
+                for k, v in counters.items():
+                    current_counters[k] += v
+            raise
+
+        # Flushed tokens now count towards the cached DB totals
+        for (uid, day, _, _), counters in batch.items():
+            cached = _persisted.get((uid, day)) if uid else None
+            if cached is not None:
+                tokens = int(counters["prompt_tokens"] + counters["completion_tokens"])
+                _persisted[(uid, day)] = (cached[0] + tokens, cached[1])
+
+
+async def run_flusher():
+    """Background loop started from the app lifespan."""
+    try:
+        while True:
+            await asyncio.sleep(_FLUSH_INTERVAL)
+            try:
+                await flush()
+            except Exception as exc:
+                logger.warning("[LLM] Usage flush failed: %s", exc)
+    finally:
+        # Don't lose the last counters on shutdown
+        try:
+            await flush()
+        except Exception:
+            pass
+
+
+def _metadata(kwargs) -> dict:
+    return (kwargs.get("litellm_params") or {}).get("metadata") or kwargs.get("metadata") or {}
+
+
+class UsageLogger(CustomLogger):
+    """LiteLLM callback that feeds every completion into the usage counters."""
+
+    async def async_log_success_event(self, kwargs, response_obj, start_time, end_time):
+        try:
+            meta = _metadata(kwargs)
+            usage = extract_usage(kwargs, response_obj, start_time, end_time)
+            record(
+                meta.get("user_id"),
+                meta.get("operation") or "other",
+                usage["model"],
+                prompt_tokens=usage["prompt_tokens"],
+                completion_tokens=usage["completion_tokens"],
+                cost=usage["cost"],
+                latency_ms=usage["latency_ms"],
+                cached_tokens=usage["cached_tokens"],
+                cache_write_tokens=usage["cache_write_tokens"],
+            )
+        except Exception as exc:
+            logger.warning("[LLM] Usage logger error: %s", exc)
+
+    async def async_log_failure_event(self, kwargs, response_obj, start_time, end_time):
+        try:
+            meta = _metadata(kwargs)
+            record(
+                meta.get("user_id"),
+                meta.get("operation") or "other",
+                kwargs.get("model", "?"),
+                latency_ms=int((end_time - start_time).total_seconds() * 1000),
+                error=True,
+            )
+        except Exception as exc:
+            logger.warning("[LLM] Usage logger error: %s", exc)
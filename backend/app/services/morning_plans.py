@@ -0,0 +1,291 @@
+"""
+Precomputed AI morning plans.
+
+Most users open the morning plan within the same hour, and each request used to
+run several DB queries plus an LLM call while the user waited. A background job
+builds plans for active users during their local early morning (bounded
+concurrency, rate-limited LLM calls) and stores them in morning_plans together
+with a fingerprint of the user's tasks, projects and goals. POST /api/ai/morning-plan returns the
+stored plan while the fingerprint still matches and regenerates it otherwise.
+Precomputed plans are built by "morning_plan" task_queue jobs at background
+priority, so with TASK_QUEUE_EXECUTION=workers they run in the AI workers too.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import Date, cast, func, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..database import async_session, engine
+from ..models import Goal, MorningPlan, Project, Task, User
+from . import ai_service, task_queue
+
+logger = logging.getLogger("todopilot.morning_plans")
+
+# How often the scheduler looks for users entering their morning window
+_SWEEP_INTERVAL = timedelta(minutes=10)
+# Users without task activity in this period are not precomputed
+_ACTIVE_WINDOW = timedelta(days=7)
+# Keeps several workers from precomputing the same plans
+_ADVISORY_LOCK_KEY = 702_028
+
+
+def user_now(user_settings: dict | None) -> datetime:
+    """Current time in the user's timezone (user.settings["timezone"], UTC by default)."""
+    tz_name = (user_settings or {}).get("timezone") or "UTC"
+    try:
+        tz = ZoneInfo(tz_name)
+    except Exception:
+        tz = timezone.utc
+    return datetime.now(tz)
+
+
+async def tasks_fingerprint(user_id, db: AsyncSession) -> str:
+    """Cheap summary of what the plan prompt is built from.
+
+    Changes whenever a task is added, edited or deleted, and when a project or
+    goal is added, renamed or removed (their titles are in the prompt; they have
+    no updated_at, so their ids and titles are hashed).
+    """
+    result = await db.execute(
+        select(func.count(Task.id), func.max(Task.updated_at), func.max(Task.created_at))
+        .where(Task.user_id == user_id)
+    )
+    count, updated, created = result.one()
+    last = max((d for d in (updated, created) if d), default=None)
+    projects = await db.execute(
+        select(Project.id, Project.title).where(Project.user_id == user_id).order_by(Project.id)
+    )
+    goals = await db.execute(select(Goal.id, Goal.title).where(Goal.user_id == user_id).order_by(Goal.id))
+    titles = hashlib.sha1(repr((projects.all(), goals.all())).encode()).hexdigest()[:16]
+    return f"{count}:{last.isoformat() if last else '-'}:{titles}"
+
+
+async def gather_context(user_id, db: AsyncSession, today: date) -> dict:
+    """Collect tasks, goals and stats for ai_service.morning_plan."""
+    now = datetime.now(timezone.utc)
+
+    # Today's tasks
+    today_result = await db.execute(
+        select(Task).where(
+            Task.user_id == user_id,
+            Task.completed == False,  # noqa: E712
+            cast(Task.due_date, Date) == today,
+        ).order_by(Task.priority.desc(), Task.position)
+    )
+    today_tasks_raw = today_result.scalars().all()
+
+    # Load projects/goals for context
+    projects_result = await db.execute(select(Project).where(Project.user_id == user_id))
+    projects = {str(p.id): p.title for p in projects_result.scalars().all()}
+
+    goals_result = await db.execute(select(Goal).where(Goal.user_id == user_id))
+    goals_all = goals_result.scalars().all()
+    goals_map = {str(g.id): g.title for g in goals_all}
+
+    today_tasks = [
+        {
+            "title": t.title,
+            "priority": t.priority,
+            "project": projects.get(str(t.project_id), "нет") if t.project_id else "нет",
+            "goal": goals_map.get(str(t.goal_id), "нет") if t.goal_id else "нет",
+        }
+        for t in today_tasks_raw
+    ]
+
+    # All pending tasks
+    pending_result = await db.execute(
+        select(Task).where(
+            Task.user_id == user_id,
+            Task.completed == False,  # noqa: E712
+        ).order_by(Task.priority.desc(), Task.due_date.asc().nullslast()).limit(20)
+    )
+    all_tasks = [
+        {
+            "title": t.title,
+            "priority": t.priority,
+            "due_date": t.due_date.strftime("%d.%m.%Y") if t.due_date else None,
+        }
+        for t in pending_result.scalars().all()
+    ]
+
+    goals_list = [{"title": g.title} for g in goals_all]
+
+    # Basic stats
+    week_ago = now - timedelta(days=7)
+    c7d_q = await db.execute(
+        select(func.count(Task.id)).where(
+            Task.user_id == user_id,
+            Task.completed == True,  # noqa: E712
+            Task.completed_at >= week_ago,
+        )
+    )
+    completed_7d = c7d_q.scalar() or 0
+
+    overdue_q = await db.execute(
+        select(func.count(Task.id)).where(
+            Task.user_id == user_id,
+            Task.completed == False,  # noqa: E712
+            Task.due_date < now,
+        )
+    )
+    overdue_tasks = overdue_q.scalar() or 0
+
+    return {
+        "today_tasks": today_tasks,
+        "all_tasks": all_tasks,
+        "goals": goals_list,
+        "stats": {"avg_daily_7d": completed_7d / 7, "overdue_tasks": overdue_tasks},
+    }
+
+
+async def get_stored(user_id, plan_date: date, fingerprint: str, db: AsyncSession) -> str | None:
+    """Return the stored plan for the date if it was built from the same tasks state."""
+    result = await db.execute(
+        select(MorningPlan).where(MorningPlan.user_id == user_id, MorningPlan.plan_date == plan_date)
+    )
+    stored = result.scalar_one_or_none()
+    if stored is None or stored.tasks_fingerprint != fingerprint:
+        return None
+    return stored.plan
+
+
+async def store(user_id, plan_date: date, fingerprint: str, plan: str):
+    """Insert or replace the user's plan for the date."""
+    stmt = insert(MorningPlan).values(
+        user_id=user_id, plan_date=plan_date, plan=plan, tasks_fingerprint=fingerprint,
+    )
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_morning_plans_user_date",
+        set_={"plan": stmt.excluded.plan, "tasks_fingerprint": stmt.excluded.tasks_fingerprint, "created_at": func.now()},
+    )
+    async with async_session() as session:
+        await session.execute(stmt)
+        await session.commit()
+
+
+async def generate(user: User, db: AsyncSession, plan_date: date, fingerprint: str) -> str:
+    """Build a plan with the LLM and store it for later requests."""
+    context = await gather_context(user.id, db, plan_date)
+    plan = await ai_service.morning_plan(
+        context["today_tasks"],
+        context["all_tasks"],
+        context["goals"],
+        context["stats"],
+        user_profile=user.profile_text,
+        user_settings=user.settings,
+    )
+    if plan:
+        await store(user.id, plan_date, fingerprint, plan)
+    return plan
+
+
+class _RateLimiter:
+    """Spaces out call starts to at most `per_minute` calls per minute."""
+
+    def __init__(self, per_minute: int):
+        self._interval = 60.0 / max(per_minute, 1)
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self._interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def _due_users(session: AsyncSession) -> list[tuple[User, date]]:
+    """Active users who are in their morning window and have no plan for their local today."""
+    active_since = datetime.now(timezone.utc) - _ACTIVE_WINDOW
+    active_ids = (
+        select(Task.user_id)
+        .where(Task.updated_at >= active_since)
+        .distinct()
+    )
+    result = await session.execute(select(User).where(User.id.in_(active_ids)))
+
+    due: list[tuple[User, date]] = []
+    for user in result.scalars().all():
+        local = user_now(user.settings)
+        if settings.morning_plan_hour <= local.hour < settings.morning_plan_hour + 2:
+            due.append((user, local.date()))
+    if not due:
+        return []
+
+    existing = await session.execute(
+        select(MorningPlan.user_id, MorningPlan.plan_date).where(
+            MorningPlan.user_id.in_([u.id for u, _ in due]),
+            MorningPlan.plan_date.in_({d for _, d in due}),
+        )
+    )
+    have = {(row.user_id, row.plan_date) for row in existing.all()}
+    return [(u, d) for u, d in due if (u.id, d) not in have]
+
+
+async def _run_job(user_id, plan_date: date, fingerprint: str):
+    """Queue a morning_plan job (registered in routers.ai) and wait until it is over."""
+    task_id = await task_queue.submit_job(
+        "morning_plan",
+        {"user_id": user_id, "plan_date": plan_date, "fingerprint": fingerprint},
+        operation_type="morning_plan_precompute",
+        user_id=user_id,
+        unattended=True,
+    )
+    task = await task_queue.wait(task_id, 30)
+    while task is not None and task["status"] in task_queue.ACTIVE:
+        task = await task_queue.wait(task_id, 30)
+    await task_queue.remove(task_id)
+    if task is not None and task["status"] == "error":
+        raise RuntimeError(task["error"])
+
+
+async def precompute_due_plans():
+    """One scheduler pass: build plans for every user that is due, with bounded concurrency."""
+    async with engine.connect() as lock_conn:
+        locked = await lock_conn.scalar(text("SELECT pg_try_advisory_lock(:k)"), {"k": _ADVISORY_LOCK_KEY})
+        if not locked:
+            return  # another worker is sweeping
+        try:
+            async with async_session() as session:
+                due = await _due_users(session)
+            if not due:
+                return
+
+            semaphore = asyncio.Semaphore(settings.morning_plan_concurrency)
+            limiter = _RateLimiter(settings.morning_plan_rate_per_minute)
+
+            async def _build(user: User, plan_date: date):
+                async with semaphore:
+                    await limiter.wait()
+                    try:
+                        async with async_session() as session:
+                            fingerprint = await tasks_fingerprint(user.id, session)
+                        await _run_job(user.id, plan_date, fingerprint)
+                    except Exception as exc:
+                        logger.warning("Morning plan precompute failed for user %s: %s", user.id, exc)
+
+            await asyncio.gather(*(_build(u, d) for u, d in due))
+            logger.info("Precomputed %d morning plans", len(due))
+        finally:
+            await lock_conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": _ADVISORY_LOCK_KEY})
+
+
+async def run_scheduler():
+    """Background loop started from the app lifespan."""
+    while True:
+        try:
+            await precompute_due_plans()
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("Morning plan scheduler pass failed: %s", exc)
+        await asyncio.sleep(_SWEEP_INTERVAL.total_seconds())
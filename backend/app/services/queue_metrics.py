@@ -0,0 +1,156 @@
+"""
+Telemetry of the AI job queue, for GET /api/admin/metrics.
+
+task_queue reports each job's lifecycle here: enqueued, started (with the time
+it waited for a worker) and finished (with its run time and outcome: done,
+error, cancelled, deadline, abandoned or interrupted). Counters and wait/run
+time histograms are kept per operation_type in process memory, so recording
+costs no I/O. Histograms have fixed bucket bounds, as in Prometheus, so
+snapshots of several processes can be summed.
+
+Gauges (queued and running jobs, age of the oldest queued job per priority
+class) are read from job_scheduler at snapshot time. A growing oldest-queued
+age is the earliest sign that the workers can't keep up.
+"""
+import time
+from typing import Any
+
+from . import job_scheduler
+
+# Upper bounds of the histogram buckets, ms (the last bucket is +Inf)
+BUCKETS_MS = (100, 250, 500, 1000, 2500, 5000, 10000, 20000, 30000, 60000, 120000, 300000)
+OUTCOMES = ("done", "error", "cancelled", "deadline", "abandoned", "interrupted")
+# Outcomes that count as failures (cancelled and abandoned jobs were not wanted anymore)
+FAILURES = ("error", "deadline", "interrupted")
+
+_started_at = time.time()
+# operation -> counters
+_counters: dict[str, dict[str, int]] = {}
+# (operation, "wait" | "run") -> {"buckets": [...], "count", "sum_ms"}
+_histograms: dict[tuple[str, str], dict[str, Any]] = {}
+
+
+def _op(operation: str | None) -> str:
+    return operation or "other"
+
+
+def _count(operation: str | None, name: str):
+    counters = _counters.setdefault(_op(operation), {"enqueued": 0, "started": 0, **{o: 0 for o in OUTCOMES}})
+    counters[name] += 1
+
+
+def _observe(operation: str | None, kind: str, ms: float):
+    hist = _histograms.get((_op(operation), kind))
+    if hist is None:
+        hist = _histograms[(_op(operation), kind)] = {"buckets": [0] * (len(BUCKETS_MS) + 1), "count": 0, "sum_ms": 0}
+    for i, bound in enumerate(BUCKETS_MS):
+        if ms <= bound:
+            hist["buckets"][i] += 1
+            break
+    else:
+        hist["buckets"][-1] += 1
+    hist["count"] += 1
+    hist["sum_ms"] += int(ms)
+
+
+def enqueued(operation: str | None):
+    _count(operation, "enqueued")
+
+
+def started(operation: str | None, wait_ms: float):
+    _count(operation, "started")
+    _observe(operation, "wait", wait_ms)
+
+
+def finished(operation: str | None, outcome: str, run_ms: float | None = None):
+    """A job is over; run_ms is None for jobs that never started."""
+    _count(operation, outcome)
+    if run_ms is not None:
+        _observe(operation, "run", run_ms)
+
+
+def _quantile(hist: dict[str, Any], q: float) -> int | None:
+    """Upper bound of the bucket holding the q-quantile (None in the +Inf bucket)."""
+    if not hist["count"]:
+        return None
+    rank = q * hist["count"]
+    seen = 0
+    for bound, n in zip(BUCKETS_MS, hist["buckets"]):
+        seen += n
+        if seen >= rank:
+            return bound
+    return None
+
+
+def _gauges() -> dict[str, Any]:
+    now = time.monotonic()
+    oldest: dict[str, int] = {}
+    for job in job_scheduler.waiting():
+        age = int((now - job.get("enqueued_at", now)) * 1000)
+        oldest[job["class"]] = max(oldest.get(job["class"], 0), age)
+    stats = job_scheduler.stats()
+    return {
+        "workers": stats["workers"],
+        "running": stats["running"],
+        "queued": stats["queued"],
+        "oldest_queued_ms": {cls: oldest.get(cls, 0) for cls in job_scheduler.CLASSES},
+    }
+
+
+def snapshot() -> dict[str, Any]:
+    operations = {}
+    for op, counters in sorted(_counters.items()):
+        finished_total = sum(counters[o] for o in OUTCOMES)
+        entry: dict[str, Any] = {
+            **counters,
+            "failure_rate": (
+                round(sum(counters[o] for o in FAILURES) / finished_total, 4) if finished_total else None
+            ),
+        }
+        for kind in ("wait", "run"):
+            hist = _histograms.get((op, kind))
+            if hist is not None:
+                entry[f"{kind}_ms"] = {
+                    "count": hist["count"],
+                    "avg": hist["sum_ms"] // hist["count"],
+                    "p50": _quantile(hist, 0.5),
+                    "p90": _quantile(hist, 0.9),
+                    "p99": _quantile(hist, 0.99),
+                    "buckets": dict(zip([*map(str, BUCKETS_MS), "+Inf"], hist["buckets"])),
+                }
+        operations[op] = entry
+    return {
+        "uptime_seconds": int(time.time() - _started_at),
+        "gauges": _gauges(),
+        "operations": operations,
+    }
+
+
+def prometheus() -> str:
+    """The same data in the Prometheus text exposition format."""
+    lines = ["# TYPE todopilot_ai_jobs_total counter"]
+    for op, counters in sorted(_counters.items()):
+        for name, value in counters.items():
+            lines.append(f'todopilot_ai_jobs_total{{operation="{op}",event="{name}"}} {value}')
+    for kind in ("wait", "run"):
+        metric = f"todopilot_ai_job_{kind}_seconds"
+        lines.append(f"# TYPE {metric} histogram")
+        for (op, k), hist in sorted(_histograms.items()):
+            if k != kind:
+                continue
+            cumulative = 0
+            for bound, n in zip([*(f"{b / 1000:g}" for b in BUCKETS_MS), "+Inf"], hist["buckets"]):
+                cumulative += n
+                lines.append(f'{metric}_bucket{{operation="{op}",le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{operation="{op}"}} {hist["sum_ms"] / 1000:g}')
+            lines.append(f'{metric}_count{{operation="{op}"}} {hist["count"]}')
+    gauges = _gauges()
+    lines.append("# TYPE todopilot_ai_jobs_running gauge")
+    lines.append(f"todopilot_ai_jobs_running {gauges['running']}")
+    lines.append("# TYPE todopilot_ai_jobs_queued gauge")
+    for cls, n in gauges["queued"].items():
+        lines.append(f'todopilot_ai_jobs_queued{{class="{cls}"}} {n}')
+    lines.append("# TYPE todopilot_ai_jobs_oldest_queued_seconds gauge")
+    for cls, ms in gauges["oldest_queued_ms"].items():
+        lines.append(f'todopilot_ai_jobs_oldest_queued_seconds{{class="{cls}"}} {ms / 1000:g}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,96 @@
+"""
+In-memory store of finished AI jobs waiting to be fetched.
+
+task_queue keeps results here when they don't go to ai_jobs: always with the
+memory backend, and with postgres when the final write fails. It used to leave
+them in its job dict and scan the whole dict for expired entries on every
+submit, with no limit on how many results, or how large, stayed resident.
+
+Here expiry deadlines sit in a heap, so expire() only looks at entries that
+are due (O(log n) each). Entries replaced or removed early leave stale heap
+items, and those are skipped when they come up. Entries are kept in LRU order,
+and a total byte budget (TASK_QUEUE_RESULT_STORE_BYTES, measured as JSON size
+of the result) evicts the least recently used entries first. The newest entry
+is always kept, even if it alone exceeds the budget.
+"""
+import heapq
+import json
+import time
+from collections import OrderedDict
+from typing import Any
+
+from ..config import settings
+
+# task_id -> (entry, size in bytes, expiry on the monotonic clock)
+_entries: OrderedDict[str, tuple[dict[str, Any], int, float]] = OrderedDict()
+_expiry: list[tuple[float, str]] = []
+_bytes = 0
+_evicted = 0
+_expired = 0
+
+
+def _size(entry: dict[str, Any]) -> int:
+    payload = {"result": entry.get("result"), "error": entry.get("error"), "progress": entry.get("progress")}
+    return len(json.dumps(payload, default=str, ensure_ascii=False).encode())
+
+
+def _drop(task_id: str) -> dict[str, Any] | None:
+    global _bytes
+    item = _entries.pop(task_id, None)
+    if item is None:
+        return None
+    _bytes -= item[1]
+    return item[0]
+
+
+def put(task_id: str, entry: dict[str, Any]):
+    """Keep a finished job until fetched, expired or evicted."""
+    global _bytes, _evicted
+    _drop(task_id)
+    size = _size(entry)
+    expires = time.monotonic() + settings.task_queue_result_ttl_seconds
+    _entries[task_id] = (entry, size, expires)
+    _bytes += size
+    heapq.heappush(_expiry, (expires, task_id))
+    while _bytes > settings.task_queue_result_store_bytes and len(_entries) > 1:
+        _drop(next(iter(_entries)))
+        _evicted += 1
+    expire()
+
+
+def get(task_id: str) -> dict[str, Any] | None:
+    item = _entries.get(task_id)
+    if item is None:
+        return None
+    _entries.move_to_end(task_id)
+    return item[0]
+
+
+def pop(task_id: str) -> dict[str, Any] | None:
+    return _drop(task_id)
+
+
+def expire():
+    """Drop entries past their TTL."""
+    global _expired
+    now = time.monotonic()
+    while _expiry and _expiry[0][0] <= now:
+        expires, task_id = heapq.heappop(_expiry)
+        item = _entries.get(task_id)
+        if item is not None and item[2] == expires:
+            _drop(task_id)
+            _expired += 1
+    # Stale heap items pile up when results are fetched long before their TTL
+    if len(_expiry) > 2 * len(_entries) + 1024:
+        _expiry[:] = [(item[2], tid) for tid, item in _entries.items()]
+        heapq.heapify(_expiry)
+
+
+def stats() -> dict[str, Any]:
+    return {
+        "jobs": len(_entries),
+        "bytes": _bytes,
+        "budget_bytes": settings.task_queue_result_store_bytes,
+        "evicted": _evicted,
+        "expired": _expired,
+    }
@@ -0,0 +1,134 @@
+"""
+Speculative pre-generation of weekly survey AI suggestions.
+
+The survey wizard asks for AI suggestions one step at a time (2, 4, 5) and each
+request used to wait for its own LLM call. Instead, the survey router starts
+generating a step as soon as the answers it depends on are known: step 2 when
+the wizard is about to be shown (GET /survey/status), steps 4 and 5 when their
+answers are saved through save-draft.
+
+A speculative generation is an ordinary task_queue job at background priority
+(so it has a deadline, can be cancelled and runs in the AI workers). It is
+recorded per user/week/step in survey_prefetches with a fingerprint of the
+answers it was built from, so a poll or draft save handled by any API process
+sees it. /survey/generate takes it over when the inputs match, by handing its
+task_id to the client. Each fingerprint is speculated at most once a week:
+repeated status polls and draft saves with unchanged answers, and those after
+the result was taken, don't start another paid generation. An explicit
+regeneration misses and hits the LLM again.
+"""
+import hashlib
+import json
+import uuid
+from datetime import date
+from typing import Awaitable, Callable
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from ..database import async_session
+from ..models import SurveyPrefetch
+from . import task_queue
+
+
+def fingerprint(previous_answers: dict | None) -> str:
+    """Stable hash of the answers a step generation depends on."""
+    payload = json.dumps(previous_answers or {}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def _key(user_id, week_start: date, step: int):
+    return (
+        SurveyPrefetch.user_id == user_id,
+        SurveyPrefetch.week_start == week_start,
+        SurveyPrefetch.step == step,
+    )
+
+
+async def schedule(
+    user_id,
+    week_start: date,
+    step: int,
+    previous_answers: dict | None,
+    submit: Callable[[], Awaitable[str]],
+) -> None:
+    """Start generating a step unless these inputs were already speculated this week.
+
+    `submit` queues the job and returns its task_id; it is only called on a miss.
+    A generation for outdated inputs that nobody took is cancelled to avoid paying for it.
+    """
+    fp = fingerprint(previous_answers)
+    async with async_session() as session:
+        # Speculations of past weeks are useless (their results expired with the task queue)
+        await session.execute(
+            delete(SurveyPrefetch).where(SurveyPrefetch.user_id == user_id, SurveyPrefetch.week_start < week_start)
+        )
+        old = (await session.execute(
+            select(SurveyPrefetch.fingerprint, SurveyPrefetch.task_id, SurveyPrefetch.taken)
+            .where(*_key(user_id, week_start, step))
+            .with_for_update()
+        )).one_or_none()
+        if old is not None and old.fingerprint == fp:
+            await session.commit()
+            return
+        # Reserved before submitting, so concurrent requests of any process don't both submit
+        stmt = insert(SurveyPrefetch).values(user_id=user_id, week_start=week_start, step=step, fingerprint=fp)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "week_start", "step"],
+            set_={"fingerprint": fp, "task_id": None, "taken": False, "created_at": func.now()},
+            where=SurveyPrefetch.fingerprint != fp,
+        ).returning(SurveyPrefetch.step)
+        reserved = (await session.execute(stmt)).scalar_one_or_none() is not None
+        await session.commit()
+    if not reserved:
+        return
+    if old is not None and old.task_id and not old.taken:
+        await task_queue.cancel(str(old.task_id), user_id)
+
+    try:
+        task_id = await submit()
+    except Exception:
+        async with async_session() as session:
+            await session.execute(
+                delete(SurveyPrefetch).where(
+                    *_key(user_id, week_start, step), SurveyPrefetch.fingerprint == fp, SurveyPrefetch.task_id.is_(None),
+                )
+            )
+            await session.commit()
+        raise
+    async with async_session() as session:
+        stored = (await session.execute(
+            update(SurveyPrefetch)
+            .where(*_key(user_id, week_start, step), SurveyPrefetch.fingerprint == fp)
+            .values(task_id=uuid.UUID(task_id))
+        )).rowcount
+        await session.commit()
+    if not stored:
+        # Newer answers were reserved meanwhile: nobody will take this one
+        await task_queue.cancel(task_id, user_id)
+
+
+async def take(user_id, week_start: date, step: int, previous_answers: dict | None) -> str | None:
+    """task_id of a speculative generation for these inputs, or None on a miss.
+
+    Each generation is handed out once, and only while it is running or succeeded.
+    """
+    async with async_session() as session:
+        task_id = (await session.execute(
+            update(SurveyPrefetch)
+            .where(
+                *_key(user_id, week_start, step),
+                SurveyPrefetch.fingerprint == fingerprint(previous_answers),
+                SurveyPrefetch.task_id.isnot(None),
+                SurveyPrefetch.taken.is_(False),
+            )
+            .values(taken=True)
+            .returning(SurveyPrefetch.task_id)
+        )).scalar_one_or_none()
+        await session.commit()
+    if task_id is None:
+        return None
+    task = await task_queue.get(str(task_id))
+    if task is None or task["status"] == "error":
+        return None
+    return str(task_id)
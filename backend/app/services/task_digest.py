@@ -0,0 +1,137 @@
+"""
+Deterministic pre-aggregation of task and goal lists for LLM prompts.
+
+Retrospective, survey and coaching prompts used to list every task of the week
+and every goal, one line each, so prompt size grew with the user's activity.
+Here recurring instances are collapsed first ("Пробежка ×5, выполнено 4").
+Short lists are still rendered line by line. Longer ones are grouped by
+project and goal, and each group gets its counts plus a few representative
+examples (both done and open). The largest groups are kept and the rest are
+folded into a single totals line, so the output has a fixed upper bound on lines
+whatever the number of tasks.
+"""
+import re
+
+# Up to this many distinct tasks are listed one per line
+VERBATIM_LIMIT = 40
+MAX_GROUPS = 8
+EXAMPLES_PER_GROUP = 4
+MAX_GOALS = 15
+MAX_TITLE_CHARS = 120
+
+_NOISE = re.compile(r"[\d\W_]+")
+
+
+def _norm(title: str) -> str:
+    """Title without digits/punctuation, so "Отчёт 12.05" and "Отчёт 19.05" collapse."""
+    return " ".join(_NOISE.sub(" ", title.lower()).split())
+
+
+def _short(title: str) -> str:
+    title = " ".join(str(title).split())
+    return title if len(title) <= MAX_TITLE_CHARS else title[:MAX_TITLE_CHARS - 1] + "…"
+
+
+def collapse(tasks: list[dict]) -> list[dict]:
+    """Merge recurring instances: one entry per (project, goal, normalized title) with counts."""
+    entries: dict[tuple, dict] = {}
+    for t in tasks:
+        title = t.get("title") or ""
+        key = (t.get("project_title") or "", t.get("goal_title") or "", _norm(title) or title)
+        entry = entries.get(key)
+        if entry is None:
+            entry = entries[key] = {
+                "title": title,
+                "project_title": key[0],
+                "goal_title": key[1],
+                "count": 0,
+                "completed": 0,
+            }
+        entry["count"] += 1
+        entry["completed"] += 1 if t.get("completed") else 0
+    return list(entries.values())
+
+
+def _line(entry: dict, with_project: bool) -> str:
+    if entry["count"] > 1:
+        line = f"- {_short(entry['title'])} ×{entry['count']} (выполнено {entry['completed']})"
+    else:
+        line = f"- {'[x]' if entry['completed'] else '[ ]'} {_short(entry['title'])}"
+    if with_project and entry["project_title"]:
+        line += f" (проект: {entry['project_title']})"
+    return line
+
+
+def _examples(entries: list[dict]) -> list[dict]:
+    """Most repeated entries first, half done and half open where possible."""
+    ranked = sorted(entries, key=lambda e: -e["count"])
+    done = [e for e in ranked if e["completed"]]
+    open_ = [e for e in ranked if not e["completed"]]
+    half = EXAMPLES_PER_GROUP // 2
+    picked = done[:half] + open_[:half]
+    rest = done[half:] + open_[half:]
+    picked += sorted(rest, key=lambda e: -e["count"])[:EXAMPLES_PER_GROUP - len(picked)]
+    return sorted(picked, key=lambda e: ranked.index(e))
+
+
+def _label(project: str, goal: str) -> str:
+    if project and goal:
+        return f"Проект «{project}» · цель «{goal}»"
+    if project:
+        return f"Проект «{project}»"
+    if goal:
+        return f"Цель «{goal}»"
+    return "Без проекта"
+
+
+def digest_tasks(tasks: list[dict], with_project: bool = False) -> str:
+    """Prompt text for a list of {"title", "completed", "project_title"?, "goal_title"?} dicts."""
+    entries = collapse(tasks)
+    if len(entries) <= VERBATIM_LIMIT:
+        return "\n".join(_line(e, with_project) for e in entries)
+
+    groups: dict[tuple[str, str], list[dict]] = {}
+    for e in entries:
+        groups.setdefault((e["project_title"], e["goal_title"]), []).append(e)
+    ordered = sorted(groups.items(), key=lambda kv: -sum(e["count"] for e in kv[1]))
+
+    total = sum(e["count"] for e in entries)
+    completed = sum(e["completed"] for e in entries)
+    lines = [f"Всего задач: {total}, выполнено: {completed}. Сводка по проектам и целям:"]
+    for (project, goal), group in ordered[:MAX_GROUPS]:
+        count = sum(e["count"] for e in group)
+        done = sum(e["completed"] for e in group)
+        lines.append(f"{_label(project, goal)} — задач: {count}, выполнено: {done}. Например:")
+        examples = _examples(group)
+        lines.extend("  " + _line(e, False) for e in examples)
+        hidden = len(group) - len(examples)
+        if hidden > 0:
+            lines.append(f"  … и ещё {hidden} разных задач")
+    rest = ordered[MAX_GROUPS:]
+    if rest:
+        count = sum(e["count"] for _, group in rest for e in group)
+        done = sum(e["completed"] for _, group in rest for e in group)
+        lines.append(f"Остальные проекты и цели ({len(rest)}) — задач: {count}, выполнено: {done}")
+    return "\n".join(lines)
+
+
+def digest_goals(goals: list[dict]) -> str:
+    """Goal titles, capped at MAX_GOALS."""
+    if not goals:
+        return "Цели не заданы"
+    lines = [f"- {_short(g['title'])}" for g in goals[:MAX_GOALS]]
+    if len(goals) > MAX_GOALS:
+        lines.append(f"- … и ещё целей: {len(goals) - MAX_GOALS}")
+    return "\n".join(lines)
+
+
+def digest_goal_progress(goals_progress: list[dict]) -> list[str]:
+    """"title: done/total" lines for the goals with most tasks, the rest as one totals line."""
+    ranked = sorted(goals_progress, key=lambda g: -(g.get("total") or 0))
+    lines = [f"{_short(g['title'])}: {g['completed']}/{g['total']} задач" for g in ranked[:MAX_GOALS]]
+    rest = ranked[MAX_GOALS:]
+    if rest:
+        done = sum(g.get("completed") or 0 for g in rest)
+        total = sum(g.get("total") or 0 for g in rest)
+        lines.append(f"Остальные цели ({len(rest)}): {done}/{total} задач")
+    return lines
@@ -0,0 +1,283 @@
+"""
+In-process semantic index over each user's tasks for AI retrieval.
+
+Chat endpoints used to pass the first 50 open tasks to the LLM, so "close the
+task about the report" only worked if that task happened to be among them.
+Tasks are embedded as local hashed word + character-trigram vectors (signed
+feature hashing into DIM float32 dimensions, L2-normalised), kept per user in
+one contiguous NumPy matrix, and ranked by cosine similarity with a single
+matrix-vector product plus argpartition. A second matrix with the same rows
+holds title-only vectors, for duplicate checks that compare title with title.
+
+Each user's index is built lazily on the first search and kept in sync
+incrementally:
+  - the tasks router calls upsert()/remove() after its own writes;
+  - every search compares a cheap (count, max updated_at) fingerprint with the
+    DB and re-embeds only tasks updated since the last sync, which covers writes
+    made by other workers or other endpoints. A full rebuild happens only when
+    rows were deleted elsewhere.
+Only open tasks are searchable; completed ones are dropped from the matrix.
+Resident indexes are bounded by TASK_INDEX_MEMORY_BYTES: past it, the least
+recently searched users are evicted, so a few accounts with thousands of tasks
+weigh as much as they take.
+"""
+import asyncio
+import logging
+import re
+import uuid
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..models import Task
+
+logger = logging.getLogger("todopilot.task_index")
+
+DIM = 192
+# Rough cost of a task id in ids, rows and known, on top of its matrix rows
+_ID_BYTES = 200
+# Re-read tasks updated slightly before the last sync to cover concurrent commits
+_SYNC_OVERLAP = timedelta(seconds=5)
+# Build large indexes in a thread so the event loop keeps serving requests
+_THREAD_BUILD_THRESHOLD = 2000
+# Hits below this cosine similarity are treated as unrelated
+MIN_SCORE = 0.2
+
+_WORD_RE = re.compile(r"[^\W\d_]+")
+# Words that appear in chat commands but say nothing about which task is meant
+_STOPWORDS = frozenset(
+    "задача задачи задачу задач задаче задачей про для что это эту этот как мне мою мой мои надо нужно "
+    "уже все всё его ее её она они так там тут или если and the for with that this task tasks"
+    .split()
+)
+
+
+def _features(text: str, weight: float, out: np.ndarray):
+    for word in _WORD_RE.findall(text.lower().replace("ё", "е")):
+        if len(word) < 2 or word in _STOPWORDS:
+            continue
+        feats = [("w:" + word, weight)]
+        # Crude stemming: shared prefixes match inflected forms (отчет/отчета, врача/врачу)
+        if len(word) >= 4:
+            feats.append(("p:" + word[:-1], weight * 0.7))
+            feats.append(("p:" + word[:-2], weight * 0.7))
+        padded = f" {word} "
+        feats.extend((padded[i:i + 3], weight * 0.3) for i in range(len(padded) - 2))
+        for feat, w in feats:
+            h = zlib.crc32(feat.encode())
+            out[h % DIM] += w if h & 0x80000000 else -w
+
+
+def embed(title: str, description: str | None = None) -> np.ndarray:
+    """Hashed n-gram vector for a task (or a query when description is None)."""
+    vec = np.zeros(DIM, dtype=np.float32)
+    _features(title or "", 1.0, vec)
+    if description:
+        _features(description[:500], 0.5, vec)
+    norm = np.linalg.norm(vec)
+    if norm > 0:
+        vec /= norm
+    return vec
+
+
+class _UserIndex:
+    """Open-task vectors for one user in growable matrices (title + description, title only)."""
+
+    def __init__(self):
+        self.vectors = np.zeros((64, DIM), dtype=np.float32)
+        self.title_vectors = np.zeros((64, DIM), dtype=np.float32)
+        self.ids: list[uuid.UUID] = []
+        self.rows: dict[uuid.UUID, int] = {}
+        # Every task id seen in the DB (open or completed), used to detect deletions
+        self.known: set[uuid.UUID] = set()
+        self.synced_at: datetime | None = None
+        self.fingerprint: tuple[int, datetime | None] | None = None
+        self.lock = asyncio.Lock()
+
+    def nbytes(self) -> int:
+        return self.vectors.nbytes + self.title_vectors.nbytes + len(self.known) * _ID_BYTES
+
+    def put(self, task_id: uuid.UUID, vec: np.ndarray, title_vec: np.ndarray):
+        row = self.rows.get(task_id)
+        if row is None:
+            row = len(self.ids)
+            if row == len(self.vectors):
+                capacity = row * 2
+                for attr in ("vectors", "title_vectors"):
+                    grown = np.zeros((capacity, DIM), dtype=np.float32)
+                    grown[:row] = getattr(self, attr)
+                    setattr(self, attr, grown)
+            self.ids.append(task_id)
+            self.rows[task_id] = row
+        self.vectors[row] = vec
+        self.title_vectors[row] = title_vec
+
+    def drop(self, task_id: uuid.UUID):
+        row = self.rows.pop(task_id, None)
+        if row is None:
+            return
+        last = len(self.ids) - 1
+        if row != last:
+            moved = self.ids[last]
+            self.vectors[row] = self.vectors[last]
+            self.title_vectors[row] = self.title_vectors[last]
+            self.ids[row] = moved
+            self.rows[moved] = row
+        self.ids.pop()
+
+    def apply(self, task_id: uuid.UUID, title: str, description: str | None, completed: bool):
+        self.known.add(task_id)
+        if completed:
+            self.drop(task_id)
+        else:
+            title_vec = embed(title)
+            self.put(task_id, embed(title, description) if description else title_vec, title_vec)
+
+    def top_k(self, query: np.ndarray, k: int) -> list[tuple[uuid.UUID, float]]:
+        n = len(self.ids)
+        if n == 0 or k <= 0:
+            return []
+        scores = self.vectors[:n] @ query
+        if n > k:
+            best = np.argpartition(scores, -k)[-k:]
+            best = best[np.argsort(scores[best])[::-1]]
+        else:
+            best = np.argsort(scores)[::-1]
+        return [(self.ids[i], float(scores[i])) for i in best]
+
+
+_indexes: OrderedDict[str, _UserIndex] = OrderedDict()
+# nbytes() of each index in _indexes, as of its last change
+_resident: dict[str, int] = {}
+
+
+def _account(key: str):
+    """Note the size of a user's index and evict least recently searched users over budget."""
+    index = _indexes.get(key)
+    if index is not None:
+        _resident[key] = index.nbytes()
+    while sum(_resident.values()) > settings.task_index_memory_bytes and len(_indexes) > 1:
+        evicted, _ = _indexes.popitem(last=False)
+        _resident.pop(evicted, None)
+
+
+async def _fingerprint(user_id, db: AsyncSession) -> tuple[int, datetime | None]:
+    result = await db.execute(
+        select(func.count(Task.id), func.max(Task.updated_at)).where(Task.user_id == user_id)
+    )
+    count, last = result.one()
+    return int(count), last
+
+
+def _build(rows) -> _UserIndex:
+    index = _UserIndex()
+    for row in rows:
+        index.apply(row.id, row.title, row.description, row.completed)
+    return index
+
+
+async def _sync(user_id, db: AsyncSession) -> _UserIndex:
+    key = str(user_id)
+    index = _indexes.get(key)
+    fingerprint = await _fingerprint(user_id, db)
+    if index is not None and index.fingerprint == fingerprint:
+        _indexes.move_to_end(key)
+        return index
+
+    columns = (Task.id, Task.title, Task.description, Task.completed)
+    if index is not None:
+        async with index.lock:
+            if index.fingerprint != fingerprint:
+                since = index.synced_at - _SYNC_OVERLAP if index.synced_at else None
+                query = select(*columns).where(Task.user_id == user_id)
+                if since is not None:
+                    query = query.where(Task.updated_at >= since)
+                for row in (await db.execute(query)).all():
+                    index.apply(row.id, row.title, row.description, row.completed)
+                index.synced_at = fingerprint[1]
+                index.fingerprint = fingerprint
+        if len(index.known) == fingerprint[0]:
+            _indexes.move_to_end(key)
+            _account(key)
+            return index
+        # Tasks were deleted outside this process: rebuild from scratch
+
+    rows = (await db.execute(select(*columns).where(Task.user_id == user_id))).all()
+    if len(rows) >= _THREAD_BUILD_THRESHOLD:
+        index = await asyncio.to_thread(_build, rows)
+    else:
+        index = _build(rows)
+    index.synced_at = fingerprint[1]
+    index.fingerprint = fingerprint
+    _indexes[key] = index
+    _indexes.move_to_end(key)
+    _account(key)
+    return index
+
+
+async def search(user_id, query: str, db: AsyncSession, k: int = 20) -> list[tuple[uuid.UUID, float]]:
+    """Top-k open tasks most similar to the query, as (task_id, cosine score)."""
+    index = await _sync(user_id, db)
+    vec = embed(query)
+    if not vec.any():
+        return []
+    return index.top_k(vec, k)
+
+
+async def relevant_tasks(user_id, query: str, db: AsyncSession, limit: int = 50) -> list[Task]:
+    """Open tasks for an LLM prompt: semantic hits for the query first, then by priority up to `limit`."""
+    hits = [(tid, score) for tid, score in await search(user_id, query, db, k=limit // 2) if score >= MIN_SCORE]
+    hit_ids = [tid for tid, _ in hits]
+
+    tasks: list[Task] = []
+    if hit_ids:
+        result = await db.execute(
+            select(Task).where(Task.id.in_(hit_ids), Task.user_id == user_id, Task.completed == False)  # noqa: E712
+        )
+        by_id = {t.id: t for t in result.scalars().all()}
+        tasks = [by_id[tid] for tid in hit_ids if tid in by_id]
+
+    rest = select(Task).where(Task.user_id == user_id, Task.completed == False)  # noqa: E712
+    if hit_ids:
+        rest = rest.where(Task.id.notin_(hit_ids))
+    result = await db.execute(
+        rest.order_by(Task.priority.desc(), Task.due_date.asc().nullslast()).limit(limit - len(tasks))
+    )
+    tasks.extend(result.scalars().all())
+    return tasks
+
+
+async def best_matches(user_id, vectors: np.ndarray, db: AsyncSession) -> list[tuple[uuid.UUID | None, float]]:
+    """Open task whose title is most similar, for each row of title `vectors`.
+
+    Compared with title-only vectors, so a long description doesn't dilute an
+    exact-title match (one matrix product for the whole batch).
+    """
+    index = await _sync(user_id, db)
+    n = len(index.ids)
+    if n == 0 or len(vectors) == 0:
+        return [(None, 0.0)] * len(vectors)
+    scores = vectors @ index.title_vectors[:n].T
+    best = scores.argmax(axis=1)
+    return [(index.ids[j], float(scores[i, j])) for i, j in enumerate(best)]
+
+
+def upsert(user_id, task: Task):
+    """Reflect a task created or edited in this process (no-op if the user's index isn't loaded)."""
+    index = _indexes.get(str(user_id))
+    if index is not None:
+        index.apply(task.id, task.title, task.description, task.completed)
+        _account(str(user_id))
+
+
+def remove(user_id, task_id: uuid.UUID):
+    """Reflect a task deleted in this process (no-op if the user's index isn't loaded)."""
+    index = _indexes.get(str(user_id))
+    if index is not None:
+        index.drop(task_id)
+        index.known.discard(task_id)
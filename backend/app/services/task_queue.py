@@ -1,87 +1,770 @@
 """
-In-memory async task queue for long-running AI operations.
+Async task queue for long-running AI operations.
 
 Instead of keeping HTTP connections open for minutes waiting for LLM responses,
 endpoints submit work to the queue and return a task_id immediately.
-The frontend polls GET /api/ai-tasks/{task_id} for the result.
+The frontend polls GET /api/ai-tasks/{task_id} for the result. While a task
+runs, its coroutine can publish partial results with report(); they are
+returned by the polling endpoint as "progress".
+
+Job state lives in one of two backends (TASK_QUEUE_BACKEND):
+  - postgres (default): every job is a row in ai_jobs, so a poll answered by
+    any uvicorn worker or node sees it. The row holds the job itself, the
+    name of a function registered in job_registry and its JSON arguments, so
+    any process can run it. The process running a job holds a lease on it
+    and extends it with heartbeats. On shutdown, jobs a process didn't finish
+    go back to the queue; when a process dies, its leases expire and another
+    process puts the jobs back (FOR UPDATE SKIP LOCKED, so concurrent reapers
+    never block each other). A live process then claims and starts them over,
+    so in-flight jobs survive deploys. A job started TASK_QUEUE_MAX_ATTEMPTS
+    times fails with a clear error instead. Results are stored in the row
+    until fetched or until TASK_QUEUE_RESULT_TTL_SECONDS.
+  - memory: jobs exist only in this process, for a single-process setup.
+Finished results kept in process memory (memory backend, or a failed write to
+ai_jobs) wait in result_store, which bounds their count and size.
+
+Jobs are submitted by name with JSON arguments (submit_job(), see
+job_registry). They run in the process that accepted them, unless
+TASK_QUEUE_EXECUTION=workers. Then the API process only inserts an ai_jobs
+row without a worker_id, and worker processes (app.worker) claim such rows by
+priority class with FOR UPDATE SKIP LOCKED and run them under their own
+job_scheduler. LLM calls and result parsing don't load the API event loop, and
+the pool can grow without more API processes. Results and progress reach
+clients through ai_jobs and the events hub, as for any job of another process.
+Without worker processes, the API processes claim the rows put back after a
+restart themselves (run_worker()).
+
+wait() lets the polling endpoint long-poll: it returns as soon as the job
+finishes or publishes progress. Job changes are published as
+{"type": "task", "task_id", "status"} events to the job's user through the
+events hub. The hub reaches the user's WebSockets and, via Postgres NOTIFY,
+long-poll waiters in other processes. Waiters in the job's own process are
+woken directly.
+
+Jobs end early in three cases: cancel() (DELETE /api/ai-tasks/{id}, forwarded
+to the owning process as a "cancel" event), a per-operation deadline, and
+abandonment, when no client has polled the job or had a socket open for
+TASK_QUEUE_ABANDON_SECONDS. Cancelling the job's asyncio task also aborts its
+in-flight LLM request, so nothing more is spent on a result nobody reads.
 """
 import asyncio
+import contextvars
+import json
+import logging
+import os
+import socket
+import time
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Any, Coroutine
 
+from sqlalchemy import delete, func, select, update
+
+from ..config import settings
+from ..database import async_session
+from ..models import AIJob
+from . import events, job_registry, job_scheduler, latency, llm_usage, queue_metrics, result_store
+
+logger = logging.getLogger("todopilot.task_queue")
 
+# Queued and running jobs of this process; finished ones move to ai_jobs or result_store
 _tasks: dict[str, dict[str, Any]] = {}
+# asyncio tasks running jobs of this process, by task id
+_running: dict[str, asyncio.Task] = {}
+# Task ids with a progress write to ai_jobs pending
+_progress_pending: set[str] = set()
+# Set on shutdown: queued jobs are no longer started
+_draining = False
+# Long-poll waiters by task id, woken when the job finishes or reports progress
+_waiters: dict[str, set[asyncio.Event]] = {}
+# Set when a job may be waiting in ai_jobs for a worker process, or a slot freed up
+_claim_wakeup = asyncio.Event()
+
+# Id of the queue task the current coroutine runs in
+_current_task: contextvars.ContextVar[str | None] = contextvars.ContextVar("task_queue_current", default=None)
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+# Statuses of jobs not finished yet
+ACTIVE = ("queued", "running")
+INTERRUPTED_ERROR = "Задача прервана перезапуском сервера. Попробуйте ещё раз."
+CANCELLED_ERROR = "Задача отменена."
+DEADLINE_ERROR = "AI не успел ответить вовремя. Попробуйте ещё раз."
+ABANDONED_ERROR = "Задача отменена: результат никто не ждал."
+# Outcome of a cancelled job in queue_metrics, by its error
+_CANCEL_OUTCOMES = {CANCELLED_ERROR: "cancelled", DEADLINE_ERROR: "deadline", ABANDONED_ERROR: "abandoned"}
+
+# Longest run time per operation, seconds; others get TASK_QUEUE_DEADLINE_SECONDS
+DEADLINES = {
+    "brain_dump": 120,
+    "chat": 120,
+    "smart_chat": 120,
+    "onboarding": 120,
+    "morning_plan": 120,
+    "survey_generate_step_2": 120,
+    "survey_generate_step_3": 120,
+    "survey_generate_step_4": 120,
+    "survey_generate_step_5": 120,
+    "survey_generate_step_2_speculative": 120,
+    "survey_generate_step_4_speculative": 120,
+    "survey_generate_step_5_speculative": 120,
+    "morning_plan_precompute": 120,
+    "coaching_analysis": 300,
+    "productivity_analysis": 300,
+    "retrospective": 300,
+    "survey_update_profile": 300,
+}
+
+
+def _durable() -> bool:
+    return settings.task_queue_backend == "postgres"
+
 
-# Auto-cleanup completed tasks older than this
-_TTL = timedelta(minutes=10)
+def _worker_mode() -> bool:
+    return settings.task_queue_execution == "workers" and _durable()
 
 
-async def submit(coro: Coroutine, operation_type: str | None = None) -> str:
-    """Start an async coroutine in the background, return task_id immediately.
+def _lease_expiry() -> datetime:
+    return datetime.now(timezone.utc) + timedelta(seconds=settings.task_queue_lease_seconds)
 
-    If operation_type is provided, the duration will be recorded in
-    the operation_timings table when the task finishes.
+
+def _jsonable(value: Any) -> Any:
+    """Result as plain JSON types (UUIDs, dates -> str) for the JSONB column."""
+    return json.loads(json.dumps(value, default=str))
+
+
+async def submit_job(
+    name: str,
+    args: dict[str, Any],
+    operation_type: str | None = None,
+    user_id=None,
+    unattended: bool = False,
+) -> str:
+    """Queue job `name` (registered in job_registry) with JSON arguments, return task_id immediately.
+
+    The job starts when job_scheduler gives it a worker (by priority class of
+    operation_type and per-user fairness). If operation_type is provided, the
+    run time of a successful job feeds the latency estimates. user_id and
+    operation_type are also attached to LLM calls made by the job for usage
+    accounting and budgets. Don't pass user_settings: job_registry loads them
+    for user_id when the job runs.
+
+    With TASK_QUEUE_EXECUTION=workers the job is only stored in ai_jobs, and a
+    worker process claims and runs it; otherwise it runs here.
+
+    The job is cancelled when it outlives its deadline (DEADLINES) and, unless
+    `unattended` (work the client doesn't wait for), when nobody polls it or
+    has a socket open for TASK_QUEUE_ABANDON_SECONDS.
     """
+    args = _jsonable(args)
     task_id = str(uuid.uuid4())
+    if _durable():
+        cls, _ = job_scheduler.classify(operation_type)
+        here = not _worker_mode()
+        async with async_session() as session:
+            session.add(AIJob(
+                id=uuid.UUID(task_id),
+                user_id=user_id,
+                operation_type=operation_type,
+                status="queued",
+                payload={"job": name, "args": args, "unattended": unattended},
+                priority=job_scheduler.CLASSES.index(cls),
+                worker_id=WORKER_ID if here else None,
+                lease_expires_at=_lease_expiry() if here else None,
+                attempts=1 if here else 0,
+            ))
+            await session.commit()
+    queue_metrics.enqueued(operation_type)
+    if _worker_mode():
+        await events.publish("", {"type": "jobs_queued"}, to_sockets=False)
+    else:
+        _accept(task_id, job_registry.run(name, args, user_id), operation_type, user_id, unattended)
+    return task_id
+
+
+def _accept(
+    task_id: str,
+    coro: Coroutine,
+    operation_type: str | None,
+    user_id,
+    unattended: bool,
+    waited: float = 0.0,
+):
+    """Start tracking a job of this process and hand it to job_scheduler.
+
+    `waited` is how long (seconds) it already queued in ai_jobs.
+    """
     _tasks[task_id] = {
-        "status": "running",
+        "status": "queued",
         "result": None,
         "error": None,
         "created_at": datetime.utcnow(),
         "operation_type": operation_type,
+        "user_id": str(user_id) if user_id else None,
+        "progress": None,
+        "seen_at": datetime.now(timezone.utc),
+        "unattended": unattended,
     }
+    cls, cost = job_scheduler.classify(operation_type)
+    job_scheduler.enqueue({
+        "task_id": task_id,
+        "user": str(user_id) if user_id else "",
+        "class": cls,
+        "cost": cost,
+        "coro": coro,
+        "operation_type": operation_type,
+        "user_id": user_id,
+        "enqueued_at": time.monotonic() - waited,
+    })
+    _dispatch()
 
-    async def _run():
-        start = datetime.utcnow()
+
+def _dispatch():
+    """Start queued jobs while workers are free."""
+    if _draining:
+        return
+    while (job := job_scheduler.next_job()) is not None:
+        asyncio.create_task(_run(job))
+
+
+async def _run(job: dict):
+    task_id, user_id, operation_type = job["task_id"], job["user_id"], job["operation_type"]
+    entry = _tasks[task_id]
+    _running[task_id] = asyncio.current_task()
+    # ai_jobs.status catches up with the next heartbeat; polls report queued jobs as running anyway
+    entry["status"] = "running"
+    _current_task.set(task_id)
+    llm_usage.bind(user_id=user_id, operation=operation_type)
+    deadline = DEADLINES.get(operation_type or "", settings.task_queue_deadline_seconds)
+    timer = asyncio.get_running_loop().call_later(deadline, _cancel_local, task_id, DEADLINE_ERROR)
+    entry["started_at"] = datetime.now(timezone.utc)
+    start = time.monotonic()
+    queue_metrics.started(operation_type, (start - job["enqueued_at"]) * 1000)
+    outcome = "interrupted"
+    try:
         try:
-            result = await coro
-            _tasks[task_id]["status"] = "done"
-            _tasks[task_id]["result"] = result
+            if "cancel_reason" in entry:
+                job["coro"].close()  # cancelled between dispatch and start
+                raise asyncio.CancelledError
+            result = await job["coro"]
+            entry["status"] = "done"
+            entry["result"] = result
+            outcome = "done"
+            if operation_type:
+                latency.record(operation_type, int((time.monotonic() - start) * 1000))
+        except asyncio.CancelledError:
+            if "cancel_reason" not in entry:
+                raise  # shutdown: drain() records the outcome
+            entry["status"] = "error"
+            entry["error"] = entry["cancel_reason"]
+            outcome = _CANCEL_OUTCOMES.get(entry["cancel_reason"], "cancelled")
         except Exception as e:
-            _tasks[task_id]["status"] = "error"
-            _tasks[task_id]["error"] = str(e)
+            entry["status"] = "error"
+            entry["error"] = str(e)
+            outcome = "error"
+    finally:
+        queue_metrics.finished(operation_type, outcome, (time.monotonic() - start) * 1000)
+        timer.cancel()
+        _running.pop(task_id, None)
+        job_scheduler.finished(job)
+        _dispatch()
+        _claim_wakeup.set()
+    await _conclude(task_id, entry)
+
+
+async def _conclude(task_id: str, entry: dict):
+    """Wake waiters, store the outcome and tell the user's sockets the job is over."""
+    _wake(task_id)
+    stored = _durable() and await _store_outcome(task_id, entry)
+    if _tasks.pop(task_id, None) is not None and not stored:
+        result_store.put(task_id, entry)
+    await events.publish(entry["user_id"], {"type": "task", "task_id": task_id, "status": entry["status"]})
+
+
+def _cancel_local(task_id: str, reason: str) -> bool:
+    """Cancel a job of this process, failing it with `reason`; False if it isn't active here.
+
+    A running job's asyncio task is cancelled, which also aborts its LLM request.
+    """
+    entry = _tasks.get(task_id)
+    if entry is None or entry["status"] not in ACTIVE:
+        return False
+    if "cancel_reason" in entry:
+        return True
+    entry["cancel_reason"] = reason
+    task = _running.get(task_id)
+    if task is not None:
+        task.cancel()
+        return True
+    job = job_scheduler.remove(task_id)
+    if job is None:
+        return True  # dispatched but not started yet: _run sees the reason
+    job["coro"].close()
+    entry["status"] = "error"
+    entry["error"] = reason
+    queue_metrics.finished(job["operation_type"], _CANCEL_OUTCOMES.get(reason, "cancelled"))
+    asyncio.create_task(_conclude(task_id, entry))
+    return True
+
+
+async def cancel(task_id: str, user_id):
+    """Cancel the user's job wherever it runs; other users' and finished jobs are left alone."""
+    task = await get(task_id)
+    if task is None or task["user_id"] != str(user_id) or task["status"] not in ACTIVE:
+        return
+    if _cancel_local(task_id, CANCELLED_ERROR):
+        return
+    if _durable():
+        async with async_session() as session:
+            failed = await _fail_unclaimed(session, AIJob.id == uuid.UUID(task_id), CANCELLED_ERROR)
+            await session.commit()
+        if failed:
+            await _publish_failed(failed)
+            return
+    # Runs in another process: its event handler cancels it
+    await events.publish(user_id, {"type": "cancel", "task_id": task_id}, to_sockets=False)
+
+
+async def _fail_unclaimed(session, condition, error: str) -> list:
+    """Fail jobs matching `condition` that still wait in ai_jobs for a process to claim them.
+
+    Returns (id, user_id) of the failed jobs; the caller commits and publishes.
+    """
+    rows = (await session.execute(
+        update(AIJob)
+        .where(AIJob.status == "queued", AIJob.worker_id.is_(None), AIJob.payload.isnot(None), condition)
+        .values(status="error", error=error, finished_at=func.now())
+        .returning(AIJob.id, AIJob.user_id, AIJob.operation_type)
+    )).all()
+    for _, _, operation_type in rows:
+        queue_metrics.finished(operation_type, _CANCEL_OUTCOMES.get(error, "cancelled"))
+    return [(job_id, user_id) for job_id, user_id, _ in rows]
+
+
+async def _requeue(session, condition) -> list:
+    """Put active jobs matching `condition` back in ai_jobs for any process to claim.
+
+    Jobs already started TASK_QUEUE_MAX_ATTEMPTS times fail instead, so a job
+    that brings its process down doesn't take one process after another with
+    it. Returns (id, user_id) of the failed jobs; the caller commits, then
+    publishes them and a "jobs_queued" event.
+    """
+    active = AIJob.status.in_(ACTIVE) & condition
+    failed = (await session.execute(
+        update(AIJob)
+        .where(active, (AIJob.attempts >= settings.task_queue_max_attempts) | AIJob.payload.is_(None))
+        .values(
+            status="error", error=INTERRUPTED_ERROR, progress=None, worker_id=None,
+            lease_expires_at=None, finished_at=func.now(),
+        )
+        .returning(AIJob.id, AIJob.user_id)
+    )).all()
+    await session.execute(
+        update(AIJob).where(active).values(status="queued", progress=None, worker_id=None, lease_expires_at=None)
+    )
+    return failed
+
+
+async def _publish_failed(failed: list):
+    for job_id, user_id in failed:
+        await events.publish(user_id, {"type": "task", "task_id": str(job_id), "status": "error"})
+
+
+async def _store_outcome(task_id: str, entry: dict) -> bool:
+    """Write a finished job's result to ai_jobs; False if that failed."""
+    try:
+        async with async_session() as session:
+            await session.execute(
+                update(AIJob).where(AIJob.id == uuid.UUID(task_id)).values(
+                    status=entry["status"],
+                    result=_jsonable(entry["result"]),
+                    error=entry["error"],
+                    progress=None,
+                    worker_id=None,
+                    lease_expires_at=None,
+                    finished_at=func.now(),
+                )
+            )
+            await session.commit()
+    except Exception as exc:
+        logger.warning("Could not store result of AI task %s: %s", task_id, exc)
+        return False
+    return True
+
 
-        # Record timing if operation_type was specified
-        if operation_type:
-            duration_ms = int((datetime.utcnow() - start).total_seconds() * 1000)
+def report(progress: dict[str, Any]):
+    """Publish partial results of the running task (replaces the previous report)."""
+    task_id = _current_task.get()
+    if not task_id or task_id not in _tasks:
+        return
+    _tasks[task_id]["progress"] = progress
+    _wake(task_id)
+    if task_id not in _progress_pending:
+        # Coalesce bursts of reports into one write and one event
+        _progress_pending.add(task_id)
+        asyncio.create_task(_write_progress(task_id))
+
+
+async def _write_progress(task_id: str):
+    try:
+        await asyncio.sleep(0.25)
+        entry = _tasks.get(task_id)
+        if entry is None or entry["status"] != "running":
+            return
+        if _durable():
+            async with async_session() as session:
+                await session.execute(
+                    update(AIJob)
+                    .where(AIJob.id == uuid.UUID(task_id), AIJob.status.in_(ACTIVE))
+                    .values(progress=_jsonable(entry["progress"]))
+                )
+                await session.commit()
+        await events.publish(entry["user_id"], {"type": "task", "task_id": task_id, "status": "running"})
+    except Exception as exc:
+        logger.debug("Could not store progress of AI task %s: %s", task_id, exc)
+    finally:
+        _progress_pending.discard(task_id)
+
+
+async def get(task_id: str, touch: bool = False) -> dict[str, Any] | None:
+    """Get task status and result. `touch` marks the job as still awaited by a client."""
+    entry = _tasks.get(task_id)
+    if entry is not None and touch:
+        entry["seen_at"] = datetime.now(timezone.utc)
+    if entry is None:
+        entry = result_store.get(task_id)
+    if entry is not None or not _durable():
+        return entry
+    try:
+        job_id = uuid.UUID(task_id)
+    except ValueError:
+        return None
+
+    async with async_session() as session:
+        if touch:
+            # The owning process picks polled_at up with its next heartbeat
+            job = (await session.execute(
+                update(AIJob).where(AIJob.id == job_id).values(polled_at=func.now()).returning(AIJob)
+            )).scalar_one_or_none()
+            await session.commit()
+        else:
+            job = await session.get(AIJob, job_id)
+    if job is None:
+        return None
+    return {
+        "status": job.status,
+        "result": job.result,
+        "error": job.error,
+        "created_at": job.created_at,
+        "operation_type": job.operation_type,
+        "user_id": str(job.user_id) if job.user_id else None,
+        "progress": job.progress,
+    }
+
+
+def eta(task: dict[str, Any]) -> dict[str, Any] | None:
+    """Latency estimate for an active job (from get()), answered from memory."""
+    if task["status"] == "queued":
+        return latency.eta(task["operation_type"], 0)
+    started = task.get("started_at") or task["created_at"]
+    if started.tzinfo is None:
+        started = started.replace(tzinfo=timezone.utc)
+    elapsed_ms = int((datetime.now(timezone.utc) - started).total_seconds() * 1000)
+    return latency.eta(task["operation_type"], max(elapsed_ms, 0))
+
+
+def _wake(task_id: str):
+    for event in _waiters.get(task_id, ()):
+        event.set()
+
+
+def _on_event(user_id: str, event: dict):
+    """Wake waiters on job changes published by other processes (local jobs wake them directly)."""
+    if event.get("type") == "task" and event.get("task_id") not in _tasks:
+        _wake(event.get("task_id"))
+    elif event.get("type") == "cancel":
+        _cancel_local(event.get("task_id"), CANCELLED_ERROR)
+    elif event.get("type") == "jobs_queued":
+        _claim_wakeup.set()
+    elif event.get("type") == "resync":
+        _claim_wakeup.set()
+        for task_id in list(_waiters):
+            _wake(task_id)
+
+
+events.add_handler(_on_event)
+
+
+async def wait(task_id: str, timeout: float) -> dict[str, Any] | None:
+    """Like get(), but while the job runs, wait up to `timeout` seconds for it to
+    finish or report progress before answering."""
+    # Registered before the first read so a notification in between isn't missed
+    event = asyncio.Event()
+    _waiters.setdefault(task_id, set()).add(event)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    try:
+        task = await get(task_id, touch=True)
+        if task is None or task["status"] not in ACTIVE:
+            return task
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            # Jobs of other processes are re-read now and then if NOTIFYs can't reach us
+            step = remaining if task_id in _tasks or events.listening() else min(remaining, 1.0)
             try:
-                await _record_timing(operation_type, duration_ms)
-            except Exception:
-                pass  # non-critical
+                await asyncio.wait_for(event.wait(), step)
+                break
+            except asyncio.TimeoutError:
+                if task_id in _tasks or events.listening():
+                    break
+                task = await get(task_id)
+                if task is None or task["status"] not in ACTIVE:
+                    return task
+    finally:
+        waiters = _waiters.get(task_id)
+        if waiters is not None:
+            waiters.discard(event)
+            if not waiters:
+                _waiters.pop(task_id, None)
+    return await get(task_id)
 
-    asyncio.create_task(_run())
-    _cleanup_old()
-    return task_id
 
+async def remove(task_id: str):
+    """Remove a finished task once its result was delivered."""
+    result_store.pop(task_id)
+    if not _durable():
+        return
+    try:
+        job_id = uuid.UUID(task_id)
+    except ValueError:
+        return
+
+    async with async_session() as session:
+        await session.execute(delete(AIJob).where(AIJob.id == job_id, AIJob.status.notin_(ACTIVE)))
+        await session.commit()
 
-async def _record_timing(operation_type: str, duration_ms: int):
-    """Persist operation duration to DB for progress estimation."""
-    from ..database import async_session
-    from ..models import OperationTiming
 
+async def _maintain():
+    """Heartbeat this process's jobs, put jobs with expired leases back in the
+    queue, fail jobs abandoned before a process took them, delete stale results."""
     async with async_session() as session:
-        timing = OperationTiming(operation_type=operation_type, duration_ms=duration_ms)
-        session.add(timing)
+        watching = [uuid.UUID(u) for u in events.connected_users()]
+        if watching:
+            # Sockets count as waiting for all of their user's jobs, wherever they run
+            await session.execute(
+                update(AIJob)
+                .where(AIJob.user_id.in_(watching), AIJob.status.in_(ACTIVE))
+                .values(polled_at=func.now())
+            )
+
+        local = [uuid.UUID(tid) for tid, t in _tasks.items() if t["status"] in ACTIVE]
+        if local:
+            polled = await session.execute(
+                update(AIJob)
+                .where(AIJob.id.in_(local), AIJob.status.in_(ACTIVE), AIJob.worker_id == WORKER_ID)
+                .values(lease_expires_at=_lease_expiry())
+                .returning(AIJob.id, AIJob.polled_at)
+            )
+            for job_id, polled_at in polled.all():
+                entry = _tasks.get(str(job_id))
+                if entry is not None and polled_at is not None and polled_at > entry["seen_at"]:
+                    entry["seen_at"] = polled_at
+        started = [uuid.UUID(tid) for tid in _running]
+        if started:
+            await session.execute(
+                update(AIJob)
+                .where(AIJob.id.in_(started), AIJob.status == "queued", AIJob.worker_id == WORKER_ID)
+                .values(status="running")
+            )
+
+        expired = await session.execute(
+            select(AIJob.id)
+            .where(AIJob.status.in_(ACTIVE), AIJob.lease_expires_at < func.now())
+            .limit(500)
+            .with_for_update(skip_locked=True)
+        )
+        expired_ids = expired.scalars().all()
+        failed = []
+        if expired_ids:
+            failed = await _requeue(session, AIJob.id.in_(expired_ids))
+            logger.warning(
+                "Put back %d AI jobs whose process stopped heartbeating (%d failed after too many attempts)",
+                len(expired_ids), len(failed),
+            )
+
+        abandoned = []
+        if settings.task_queue_abandon_seconds > 0:
+            horizon = datetime.now(timezone.utc) - timedelta(seconds=settings.task_queue_abandon_seconds)
+            abandoned = await _fail_unclaimed(
+                session,
+                (func.coalesce(AIJob.polled_at, AIJob.created_at) < horizon)
+                & AIJob.payload["unattended"].as_boolean().isnot(True),
+                ABANDONED_ERROR,
+            )
+
+        horizon = datetime.now(timezone.utc) - timedelta(seconds=settings.task_queue_result_ttl_seconds)
+        await session.execute(
+            delete(AIJob).where(AIJob.status.notin_(ACTIVE), AIJob.finished_at < horizon)
+        )
         await session.commit()
+    if expired_ids:
+        await _publish_failed(failed)
+        await events.publish("", {"type": "jobs_queued"}, to_sockets=False)
+    if abandoned:
+        logger.info("Cancelled %d abandoned AI jobs no worker had taken", len(abandoned))
+        await _publish_failed(abandoned)
+
+
+def _cancel_abandoned():
+    """Cancel jobs no client has polled or watched over a socket for TASK_QUEUE_ABANDON_SECONDS."""
+    if settings.task_queue_abandon_seconds <= 0:
+        return
+    now = datetime.now(timezone.utc)
+    horizon = now - timedelta(seconds=settings.task_queue_abandon_seconds)
+    watching = set(events.connected_users())
+    for task_id, entry in list(_tasks.items()):
+        if entry["status"] not in ACTIVE or entry["unattended"]:
+            continue
+        if entry["user_id"] in watching:
+            entry["seen_at"] = now
+        elif entry["seen_at"] < horizon and _cancel_local(task_id, ABANDONED_ERROR):
+            logger.info("Cancelled abandoned AI job %s (%s)", task_id, entry["operation_type"])
+
+
+async def run_maintenance():
+    """Background loop started in the app lifespan."""
+    interval = max(settings.task_queue_lease_seconds / 3, 1.0)
+    while True:
+        await asyncio.sleep(interval)
+        result_store.expire()
+        if not _durable():
+            _cancel_abandoned()
+            continue
+        try:
+            await _maintain()
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("AI task queue maintenance failed: %s", exc)
+        _cancel_abandoned()
 
 
-def get(task_id: str) -> dict[str, Any] | None:
-    """Get task status and result."""
-    return _tasks.get(task_id)
+async def _claim() -> int:
+    """Take queued jobs from ai_jobs, as many as this worker process has free slots."""
+    free = settings.task_queue_workers - len(_tasks)
+    if free <= 0 or _draining:
+        return 0
+    claimable = (
+        select(AIJob.id)
+        .where(AIJob.status == "queued", AIJob.worker_id.is_(None), AIJob.payload.isnot(None))
+        .order_by(AIJob.priority, AIJob.created_at)
+        .limit(free)
+        .with_for_update(skip_locked=True)
+    )
+    async with async_session() as session:
+        rows = (await session.execute(
+            update(AIJob)
+            .where(AIJob.id.in_(claimable))
+            .values(worker_id=WORKER_ID, lease_expires_at=_lease_expiry(), attempts=AIJob.attempts + 1)
+            .returning(AIJob.id, AIJob.user_id, AIJob.operation_type, AIJob.payload, AIJob.created_at)
+        )).all()
+        await session.commit()
+    now = datetime.now(timezone.utc)
+    for job_id, user_id, operation_type, payload, created_at in rows:
+        _accept(
+            str(job_id),
+            job_registry.run(payload["job"], payload.get("args") or {}, user_id),
+            operation_type,
+            user_id,
+            bool(payload.get("unattended")),
+            waited=max((now - created_at).total_seconds(), 0.0),
+        )
+    return len(rows)
+
 
+def claims_in_api() -> bool:
+    """Whether API processes run run_worker() too: without worker processes,
+    they pick up the jobs put back after a restart themselves."""
+    return _durable() and not _worker_mode()
 
-def remove(task_id: str):
-    """Remove a task from the store."""
-    _tasks.pop(task_id, None)
 
+async def run_worker():
+    """Claim and run jobs waiting in ai_jobs (app.worker, or see claims_in_api()).
 
-def _cleanup_old():
-    """Remove completed tasks older than TTL."""
-    now = datetime.utcnow()
-    to_remove = [
-        tid for tid, t in _tasks.items()
-        if t["status"] != "running" and now - t["created_at"] > _TTL
-    ]
-    for tid in to_remove:
-        _tasks.pop(tid, None)
+    Claims are triggered by "jobs_queued" events and finished jobs, and retried
+    every TASK_QUEUE_CLAIM_INTERVAL in case a NOTIFY was missed.
+    """
+    job_registry.load_all()
+    logger.info("AI worker %s started with jobs: %s", WORKER_ID, ", ".join(job_registry.names()))
+    while True:
+        _claim_wakeup.clear()
+        try:
+            await _claim()
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("Could not claim AI jobs: %s", exc)
+        try:
+            await asyncio.wait_for(_claim_wakeup.wait(), settings.task_queue_claim_interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def cluster_counts() -> dict[str, int] | None:
+    """Active jobs of all processes by status (postgres backend only)."""
+    if not _durable():
+        return None
+    async with async_session() as session:
+        rows = await session.execute(
+            select(AIJob.status, func.count()).where(AIJob.status.in_(ACTIVE)).group_by(AIJob.status)
+        )
+    return {status: 0 for status in ACTIVE} | dict(rows.all())
+
+
+def stats() -> dict[str, Any]:
+    """Jobs of this process: active, scheduler queues and resident results."""
+    return {
+        "active": len(_tasks),
+        "running": len(_running),
+        "scheduler": job_scheduler.stats(),
+        "results": result_store.stats(),
+    }
+
+
+async def drain():
+    """On shutdown: let running jobs finish for a while, then give up on the rest.
+
+    Jobs still waiting in job_scheduler are not started. They, and jobs still
+    running when TASK_QUEUE_DRAIN_SECONDS are over, go back to ai_jobs for
+    another process to start over; with the memory backend they fail.
+    """
+    global _draining
+    _draining = True
+    queued = []
+    for job in job_scheduler.waiting():
+        job_scheduler.remove(job["task_id"])
+        job["coro"].close()
+        queue_metrics.finished(job["operation_type"], "interrupted")
+        queued.append(job["task_id"])
+    pending = list(_running.values())
+    if pending:
+        logger.info("Waiting for %d running AI jobs before shutdown", len(pending))
+        await asyncio.wait(pending, timeout=settings.task_queue_drain_seconds)
+    leftover = [tid for tid, t in _running.items() if not t.done()]
+    for tid in leftover:
+        _running[tid].cancel()
+    leftover += queued
+    if leftover and _durable():
+        try:
+            async with async_session() as session:
+                failed = await _requeue(
+                    session,
+                    AIJob.id.in_([uuid.UUID(t) for t in leftover]) & (AIJob.worker_id == WORKER_ID),
+                )
+                await session.commit()
+            await _publish_failed(failed)
+            await events.publish("", {"type": "jobs_queued"}, to_sockets=False)
+            logger.info("Put back %d unfinished AI jobs for other processes", len(leftover) - len(failed))
+        except Exception as exc:
+            logger.warning("Could not put back unfinished AI jobs: %s", exc)
@@ -0,0 +1,132 @@
+"""
+Per-process cache of verified tokens and user rows for get_current_user.
+
+Every authenticated request used to decode its JWT and load the user with
+db.get(), an extra DB round trip for a row that rarely changes. Here both
+steps are cached in process memory, in one LRU of AUTH_CACHE_SIZE entries:
+  - token -> user id, until the token's own expiry: the signature is checked
+    once per token, not once per request;
+  - user id -> column values of the users row, for AUTH_CACHE_TTL_SECONDS.
+On a hit get_current_user builds a User from the snapshot and attaches it to
+the request's session without a query, so routes can still modify and commit
+it. Only a miss goes to the DB.
+
+Code that changes a users row (profile, settings, admin promotion) calls
+invalidate() after committing. It drops the snapshot here and publishes a
+"user_changed" event, so the other processes drop theirs too. While events of
+other processes can't reach this one (LISTEN connection down), snapshots are
+not used, and on reconnect ("resync") they are all dropped, since some
+invalidations may have been missed.
+"""
+import copy
+import time
+from collections import OrderedDict
+from typing import Any
+
+from ..config import settings
+from ..models import User
+from . import events
+
+# key -> (value, expiry on the monotonic clock); keys are ("token", jwt) or ("user", id)
+_entries: OrderedDict[tuple[str, str], tuple[Any, float]] = OrderedDict()
+_hits = 0
+_misses = 0
+# Bumped by every invalidation, so a row loaded before one isn't cached after it
+_version = 0
+
+_COLUMNS = [c.key for c in User.__table__.columns]
+
+
+def _enabled() -> bool:
+    return settings.auth_cache_ttl_seconds > 0 and settings.auth_cache_size > 0
+
+
+def _get(key: tuple[str, str]) -> Any:
+    item = _entries.get(key)
+    if item is None:
+        return None
+    if item[1] <= time.monotonic():
+        _entries.pop(key, None)
+        return None
+    _entries.move_to_end(key)
+    return item[0]
+
+
+def _put(key: tuple[str, str], value: Any, ttl: float):
+    if not _enabled() or ttl <= 0:
+        return
+    _entries[key] = (value, time.monotonic() + ttl)
+    _entries.move_to_end(key)
+    while len(_entries) > settings.auth_cache_size:
+        _entries.popitem(last=False)
+
+
+def token_user_id(token: str) -> str | None:
+    """User id of a token verified before, None if it isn't cached."""
+    return _get(("token", token)) if _enabled() else None
+
+
+def put_token(token: str, user_id: str, expires_at: float | None):
+    """Remember a verified token until `expires_at` (unix time, the JWT "exp")."""
+    ttl = (expires_at - time.time()) if expires_at else settings.auth_cache_ttl_seconds
+    _put(("token", token), user_id, ttl)
+
+
+def get_user(user_id: str) -> dict[str, Any] | None:
+    """Column values of the user's row, or None on a miss."""
+    global _hits, _misses
+    if not _enabled() or not events.listening():
+        return None
+    snapshot = _get(("user", str(user_id)))
+    if snapshot is None:
+        _misses += 1
+        return None
+    _hits += 1
+    # Routes may change the JSON columns in place: each request gets its own copy
+    return copy.deepcopy(snapshot)
+
+
+def version() -> int:
+    """Take before loading a user from the DB, pass to put_user()."""
+    return _version
+
+
+def put_user(user: User, loaded_at_version: int):
+    if not events.listening() or loaded_at_version != _version:
+        return
+    snapshot = copy.deepcopy({name: getattr(user, name) for name in _COLUMNS})
+    _put(("user", str(user.id)), snapshot, settings.auth_cache_ttl_seconds)
+
+
+def _drop(user_id: str):
+    global _version
+    _version += 1
+    _entries.pop(("user", user_id), None)
+
+
+async def invalidate(user_id):
+    """Drop the user's snapshot in every process; call after committing a change to the row."""
+    # publish() delivers to this process's handler too
+    await events.publish(user_id, {"type": "user_changed"}, to_sockets=False)
+
+
+def _on_event(user_id: str, event: dict):
+    global _version
+    if event.get("type") == "user_changed":
+        _drop(user_id)
+    elif event.get("type") == "resync" and not user_id:
+        _version += 1
+        for key in [k for k in _entries if k[0] == "user"]:
+            _entries.pop(key, None)
+
+
+events.add_handler(_on_event)
+
+
+def stats() -> dict[str, Any]:
+    return {
+        "entries": len(_entries),
+        "users": sum(1 for k in _entries if k[0] == "user"),
+        "hits": _hits,
+        "misses": _misses,
+    }
@@ -0,0 +1,52 @@
+"""
+AI worker process: runs the AI jobs the API processes queue in ai_jobs.
+
+Start with `python -m app.worker` (docker compose --profile workers up) and
+TASK_QUEUE_EXECUTION=workers. Each worker runs up to TASK_QUEUE_WORKERS jobs
+at once under its own job_scheduler. Start more of them to handle more
+concurrent AI work, independent of the number of API processes.
+"""
+import asyncio
+import logging
+import signal
+import sys
+
+from .config import settings
+from .logging_config import setup_logging
+from .services import events, latency, llm_pool, llm_usage, task_queue
+
+setup_logging(level=settings.log_level, fmt=settings.log_format)
+logger = logging.getLogger("todopilot.worker")
+
+if settings.llm_debug:
+    logging.getLogger("todopilot.llm").setLevel(logging.DEBUG)
+
+
+async def main():
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    llm_pool.start()
+    background: list[asyncio.Task] = [
+        asyncio.create_task(llm_usage.run_flusher()),
+        asyncio.create_task(latency.run_flusher()),
+        asyncio.create_task(llm_pool.warm()),
+        asyncio.create_task(task_queue.run_maintenance()),
+        asyncio.create_task(events.run_listener()),
+        asyncio.create_task(task_queue.run_worker()),
+    ]
+    await stop.wait()
+    logger.info("AI worker stopping")
+    await task_queue.drain()
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    await llm_pool.close()
+
+
+if __name__ == "__main__":
+    if settings.task_queue_execution != "workers" or settings.task_queue_backend != "postgres":
+        sys.exit("AI worker needs TASK_QUEUE_EXECUTION=workers and TASK_QUEUE_BACKEND=postgres")
+    asyncio.run(main())
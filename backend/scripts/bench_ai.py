@@ -0,0 +1,139 @@
+"""Load test for AI endpoints and the task-queue polling flow.
+
+Start the backend with the stand-in LLM provider so no real tokens are spent:
+
+    LLM_STANDIN=true LLM_STANDIN_LATENCY=lognormal:800:0.5 uvicorn app.main:app
+
+then run, for example:
+
+    python scripts/bench_ai.py --users 50 --duration 60 --scenarios chat,brain-dump,survey
+
+Each virtual user logs in through the dev auth flow (send-code returns the code),
+then repeatedly submits an AI request and polls GET /api/ai-tasks/{task_id}
+until it finishes. Reported per scenario: throughput, submit latency,
+end-to-end latency percentiles, polls per job and errors.
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from collections import defaultdict
+
+import httpx
+
+SCENARIOS = {
+    "chat": ("POST", "/ai/chat", {"message": "С чего начать день?"}),
+    "smart-chat": ("POST", "/ai/smart-chat", {"message": "Создай задачу купить молоко", "history": []}),
+    "brain-dump": ("POST", "/ai/brain-dump", {"text": "Купить краску. Позвонить мастеру.\n\nПодготовить отчёт к пятнице."}),
+    "morning-plan": ("POST", "/ai/morning-plan", None),
+    "analysis": ("POST", "/ai/analysis", None),
+    "retrospective": ("GET", "/ai/retrospective", None),
+    "survey": ("POST", "/survey/generate", {"step": 2}),
+}
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+class Stats:
+    def __init__(self):
+        self.submit_ms: dict[str, list[float]] = defaultdict(list)
+        self.total_ms: dict[str, list[float]] = defaultdict(list)
+        self.polls: dict[str, list[int]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+
+
+async def login(client: httpx.AsyncClient, email: str) -> str:
+    resp = await client.post("/auth/send-code", json={"email": email})
+    resp.raise_for_status()
+    code = resp.json()["dev_code"]
+    resp = await client.post("/auth/verify", json={"email": email, "code": code})
+    resp.raise_for_status()
+    return resp.json()["access_token"]
+
+
+async def run_job(client: httpx.AsyncClient, scenario: str, poll_interval: float, stats: Stats):
+    method, path, body = SCENARIOS[scenario]
+    start = time.perf_counter()
+    try:
+        resp = await client.request(method, path, json=body)
+        resp.raise_for_status()
+        stats.submit_ms[scenario].append((time.perf_counter() - start) * 1000)
+        task_id = resp.json()["task_id"]
+
+        polls = 0
+        while True:
+            polls += 1
+            resp = await client.get(f"/ai-tasks/{task_id}")
+            resp.raise_for_status()
+            data = resp.json()
+            if data["status"] == "done":
+                break
+            if data["status"] == "error":
+                raise RuntimeError(data.get("error"))
+            await asyncio.sleep(poll_interval)
+        stats.total_ms[scenario].append((time.perf_counter() - start) * 1000)
+        stats.polls[scenario].append(polls)
+    except Exception:
+        stats.errors[scenario] += 1
+
+
+async def virtual_user(
+    base_url: str, index: int, scenarios: list[str], deadline: float, poll_interval: float, stats: Stats,
+):
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        token = await login(client, f"bench-{index}@example.com")
+        client.headers["Authorization"] = f"Bearer {token}"
+        while time.perf_counter() < deadline:
+            await run_job(client, random.choice(scenarios), poll_interval, stats)
+
+
+def report(stats: Stats, elapsed: float):
+    print(f"{'scenario':<14} {'jobs':>6} {'jobs/s':>8} {'submit p50':>11} {'e2e p50':>9} "
+          f"{'e2e p90':>9} {'e2e p99':>9} {'polls':>6} {'errors':>7}")
+    all_scenarios = sorted(set(stats.total_ms) | set(stats.errors))
+    for name in all_scenarios:
+        total = stats.total_ms[name]
+        print(
+            f"{name:<14} {len(total):>6} {len(total) / elapsed:>8.2f} "
+            f"{percentile(stats.submit_ms[name], 50):>9.0f}ms "
+            f"{percentile(total, 50):>7.0f}ms {percentile(total, 90):>7.0f}ms {percentile(total, 99):>7.0f}ms "
+            f"{statistics.mean(stats.polls[name]) if stats.polls[name] else 0:>6.1f} {stats.errors[name]:>7}"
+        )
+    done = sum(len(v) for v in stats.total_ms.values())
+    print(f"\n{done} jobs in {elapsed:.1f}s - {done / elapsed:.2f} jobs/s overall")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000/api")
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to run")
+    parser.add_argument("--scenarios", default="chat,brain-dump,survey", help=f"comma-separated: {', '.join(SCENARIOS)}")
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="seconds between polls (frontend uses 2)")
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    stats = Stats()
+    start = time.perf_counter()
+    deadline = start + args.duration
+    await asyncio.gather(*(
+        virtual_user(args.base_url, i, scenarios, deadline, args.poll_interval, stats)
+        for i in range(args.users)
+    ))
+    report(stats, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,6 +2,7 @@ import { useEffect } from 'react';
 import { BrowserRouter, Routes, Route, Navigate } from 'react-router-dom';
 import { LoadingOverlay } from '@mantine/core';
 import { useAuthStore } from '@/stores/authStore';
+import { connectEvents, disconnectEvents } from '@/api/events';
 import { useSurveyStore } from '@/stores/surveyStore';
 import { AppLayout } from '@/components/layout/AppLayout';
 import { SurveyPrompt } from '@/components/survey/SurveyPrompt';
@@ -52,6 +53,12 @@ export default function App() {
     else useAuthStore.setState({ loading: false });
   }, [token]);
 
+  // One WebSocket per tab for AI task events while logged in
+  useEffect(() => {
+    if (token) connectEvents(token);
+    else disconnectEvents();
+  }, [token]);
+
   return (
     <BrowserRouter>
       <Routes>
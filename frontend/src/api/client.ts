@@ -1,6 +1,7 @@
 import axios from 'axios';
 import { notifications } from '@mantine/notifications';
 import { logger } from '../lib/logger';
+import { ackTask, isEventsConnected, subscribeTask } from './events';
 
 const api = axios.create({ baseURL: '/api' });
 
@@ -48,6 +49,9 @@ function buildDevDetail(data: Record<string, unknown>): string {
 api.interceptors.response.use(
   (res) => res,
   (err) => {
+    // Requests aborted on purpose (e.g. a closed AI modal) are not errors
+    if (axios.isCancel(err)) return Promise.reject(err);
+
     if (err.response?.status === 401) {
       localStorage.removeItem('token');
       window.location.href = '/login';
@@ -83,32 +87,116 @@ api.interceptors.response.use(
 
 export default api;
 
+// Seconds the server may hold a task poll open while the task is running
+const AI_TASK_LONG_POLL_SECONDS = 25;
+
+interface AITaskState {
+  status: 'running' | 'done' | 'error';
+  progress?: unknown;
+  result?: unknown;
+  error?: string;
+}
+
+/**
+ * Wait for a task on the WebSocket channel.
+ * Resolves { done: false } if the channel drops before the task finishes.
+ */
+function waitOnChannel<T, P>(
+  taskId: string,
+  onProgress?: (progress: P) => void,
+  signal?: AbortSignal,
+): Promise<{ done: true; result: T } | { done: false }> {
+  return new Promise((resolve, reject) => {
+    let finished = false;
+    const onAbort = () => finish(() => reject(new DOMException('AI task cancelled', 'AbortError')));
+    const finish = (fn: () => void) => {
+      if (finished) return;
+      finished = true;
+      unsubscribe();
+      signal?.removeEventListener('abort', onAbort);
+      fn();
+    };
+    const handle = (state: AITaskState) => {
+      if (state.status === 'done') finish(() => resolve({ done: true, result: state.result as T }));
+      else if (state.status === 'error') finish(() => reject(new Error(state.error || 'AI task failed')));
+      else if (onProgress && state.progress && !finished) onProgress(state.progress as P);
+    };
+    const check = () => {
+      api.get(`/ai-tasks/${taskId}`)
+        .then(({ data }) => handle(data))
+        .catch((err) => finish(() => reject(err)));
+    };
+    const unsubscribe = subscribeTask(taskId, (event) => {
+      if (event.type === 'closed') finish(() => resolve({ done: false }));
+      else if (event.type === 'resync') check();
+      // A finished task already fetched elsewhere arrives without its payload; ask the endpoint
+      else if (event.status !== 'running' && !('result' in event) && !('error' in event)) check();
+      else {
+        // Outcome pushed over the socket: the server deletes the task on ack, like GET does
+        if (event.status !== 'running') ackTask(taskId);
+        handle(event);
+      }
+    });
+    signal?.addEventListener('abort', onAbort);
+    // The task may have finished before we subscribed
+    check();
+  });
+}
+
 /**
- * Poll a background AI task until it completes.
+ * Wait for a background AI task to complete.
  * All AI endpoints now return { task_id } immediately.
- * This helper polls GET /ai-tasks/{task_id} until status is "done" or "error".
+ * While the per-tab WebSocket is connected, status, progress and the result
+ * are pushed over it. Otherwise this helper long-polls GET /ai-tasks/{task_id}?wait=…
+ * (the server answers as soon as the task finishes or reports progress)
+ * until status is "done" or "error".
+ * Partial results published by a running task are passed to onProgress.
+ * Aborting `signal` (e.g. when the modal is closed) cancels the task on the
+ * server, so its LLM request stops too, and rejects with an AbortError.
  */
-export async function pollAITask<T = unknown>(taskId: string, intervalMs = 2000): Promise<T> {
-  while (true) {
-    const { data } = await api.get(`/ai-tasks/${taskId}`);
-    if (data.status === 'done') return data.result as T;
-    if (data.status === 'error') throw new Error(data.error || 'AI task failed');
-    await new Promise((r) => setTimeout(r, intervalMs));
+export async function pollAITask<T = unknown, P = unknown>(
+  taskId: string,
+  onProgress?: (progress: P) => void,
+  signal?: AbortSignal,
+): Promise<T> {
+  const cancel = () => { cancelAITask(taskId).catch(() => {}); };
+  if (signal?.aborted) {
+    cancel();
+    throw new DOMException('AI task cancelled', 'AbortError');
+  }
+  signal?.addEventListener('abort', cancel, { once: true });
+  try {
+    if (isEventsConnected()) {
+      const outcome = await waitOnChannel<T, P>(taskId, onProgress, signal);
+      if (outcome.done) return outcome.result;
+    }
+    while (true) {
+      const { data } = await api.get(`/ai-tasks/${taskId}`, { params: { wait: AI_TASK_LONG_POLL_SECONDS }, signal });
+      if (data.status === 'done') return data.result as T;
+      if (data.status === 'error') throw new Error(data.error || 'AI task failed');
+      if (onProgress && data.progress) onProgress(data.progress as P);
+    }
+  } finally {
+    signal?.removeEventListener('abort', cancel);
   }
 }
 
 /**
- * Submit an AI request and poll for the result.
- * Wraps the pattern: POST → get task_id → poll until done.
+ * Submit an AI request and wait for the result.
+ * Wraps the pattern: POST → get task_id → long-poll until done.
  */
-export async function submitAndPoll<T = unknown>(
+export async function submitAndPoll<T = unknown, P = unknown>(
   requestFn: () => Promise<{ data: { task_id: string } }>,
-  intervalMs = 2000,
+  onProgress?: (progress: P) => void,
+  signal?: AbortSignal,
 ): Promise<T> {
   const { data } = await requestFn();
-  return pollAITask<T>(data.task_id, intervalMs);
+  return pollAITask<T, P>(data.task_id, onProgress, signal);
 }
 
+/** Cancel a queued or running AI task (and its LLM request) on the server. */
+export const cancelAITask = (taskId: string) => api.delete(`/ai-tasks/${taskId}`);
+
 // Operation timing
 export const getAvgDuration = (operationType: string) =>
   api.get<{ avg_duration_ms: number | null }>(`/ai-tasks/avg-duration/${encodeURIComponent(operationType)}`);
@@ -159,8 +247,8 @@ export const aiAnalysis = () => api.post('/ai/analysis');
 export const aiBrainDump = (text: string) => api.post('/ai/brain-dump', { text });
 export const aiBrainDumpSave = (items: Record<string, unknown>[]) => api.post('/ai/brain-dump/save', { items });
 export const aiMorningPlan = () => api.post('/ai/morning-plan');
-export const aiSmartChat = (message: string, history: Record<string, unknown>[] = []) =>
-  api.post('/ai/smart-chat', { message, history });
+export const aiSmartChat = (message: string, sessionId: string | null = null) =>
+  api.post('/ai/smart-chat', { message, session_id: sessionId });
 export const aiExecuteAction = (action: Record<string, unknown>) =>
   api.post('/ai/smart-chat/execute-action', action);
 
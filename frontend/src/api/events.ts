@@ -0,0 +1,101 @@
+/**
+ * Per-tab WebSocket to /api/ws: pushes status, progress and results of the
+ * user's AI tasks. While it is open, pollAITask waits on it instead of polling.
+ * Reconnects with backoff while the user is logged in.
+ */
+
+export interface TaskEvent {
+  type: 'task';
+  task_id: string;
+  status: 'running' | 'done' | 'error';
+  progress?: unknown;
+  result?: unknown;
+  error?: string;
+}
+
+/** Delivered to task listeners when the channel drops or may have missed events */
+export type ChannelNotice = { type: 'closed' } | { type: 'resync' };
+
+type Listener = (event: TaskEvent | ChannelNotice) => void;
+
+let socket: WebSocket | null = null;
+let token: string | null = null;
+let retryDelayMs = 1000;
+let retryTimer: ReturnType<typeof setTimeout> | null = null;
+const listeners = new Map<string, Set<Listener>>();
+
+function notifyAll(notice: ChannelNotice) {
+  listeners.forEach((set) => set.forEach((listener) => listener(notice)));
+}
+
+function open() {
+  if (!token) return;
+  const protocol = window.location.protocol === 'https:' ? 'wss' : 'ws';
+  const ws = new WebSocket(`${protocol}://${window.location.host}/api/ws?token=${encodeURIComponent(token)}`);
+  socket = ws;
+
+  ws.onopen = () => {
+    retryDelayMs = 1000;
+  };
+  ws.onmessage = (message) => {
+    let event: { type?: string; task_id?: string };
+    try {
+      event = JSON.parse(message.data);
+    } catch {
+      return;
+    }
+    if (event.type === 'task' && event.task_id) {
+      listeners.get(event.task_id)?.forEach((listener) => listener(event as TaskEvent));
+    } else if (event.type === 'resync') {
+      notifyAll({ type: 'resync' });
+    }
+  };
+  ws.onclose = (close) => {
+    if (socket !== ws) return;
+    socket = null;
+    notifyAll({ type: 'closed' });
+    // 4401: token rejected — don't hammer the server, the app will log out
+    if (token && close.code !== 4401) {
+      retryTimer = setTimeout(open, retryDelayMs);
+      retryDelayMs = Math.min(retryDelayMs * 2, 30000);
+    }
+  };
+}
+
+export function connectEvents(authToken: string) {
+  if (token === authToken && socket) return;
+  disconnectEvents();
+  token = authToken;
+  open();
+}
+
+export function disconnectEvents() {
+  token = null;
+  if (retryTimer) clearTimeout(retryTimer);
+  retryTimer = null;
+  const ws = socket;
+  socket = null;
+  ws?.close();
+}
+
+export function isEventsConnected(): boolean {
+  return socket?.readyState === WebSocket.OPEN;
+}
+
+/** Tell the server the task's result or error arrived, so it can delete the task. */
+export function ackTask(taskId: string) {
+  if (socket?.readyState === WebSocket.OPEN) {
+    socket.send(JSON.stringify({ type: 'ack', task_id: taskId }));
+  }
+}
+
+/** Listen to events of one task; returns the unsubscribe function. */
+export function subscribeTask(taskId: string, listener: Listener): () => void {
+  if (!listeners.has(taskId)) listeners.set(taskId, new Set());
+  listeners.get(taskId)!.add(listener);
+  return () => {
+    const set = listeners.get(taskId);
+    set?.delete(listener);
+    if (set && set.size === 0) listeners.delete(taskId);
+  };
+}
@@ -1,4 +1,4 @@
-import { useState } from 'react';
+import { useRef, useState } from 'react';
 import { Modal, Stack, Text, Paper, ScrollArea, Loader, Group, Button, SimpleGrid, RingProgress, ThemeIcon } from '@mantine/core';
 import { IconChartBar, IconTarget, IconAlertTriangle, IconTrendingUp } from '@tabler/icons-react';
 import { aiAnalysis, submitAndPoll } from '@/api/client';
@@ -30,22 +30,35 @@ export function AnalysisModal({ opened, onClose }: Props) {
   const [loading, setLoading] = useState(false);
   const [analysis, setAnalysis] = useState<string | null>(null);
   const [stats, setStats] = useState<Stats | null>(null);
+  // Aborted when the modal is closed: the server cancels the AI task
+  const abortRef = useRef<AbortController | null>(null);
 
   const runAnalysis = async () => {
+    const controller = new AbortController();
+    abortRef.current = controller;
     setLoading(true);
     setAnalysis(null);
     setStats(null);
     try {
-      const result = await submitAndPoll<{ analysis: string; stats: Stats }>(() => aiAnalysis());
+      const result = await submitAndPoll<{ analysis: string; stats: Stats }>(
+        () => aiAnalysis(),
+        undefined,
+        controller.signal,
+      );
       setAnalysis(result.analysis);
       setStats(result.stats);
     } catch {
-      setAnalysis('Ошибка при получении анализа. Проверьте настройки AI.');
+      if (!controller.signal.aborted) setAnalysis('Ошибка при получении анализа. Проверьте настройки AI.');
     } finally {
       setLoading(false);
     }
   };
 
+  const handleClose = () => {
+    abortRef.current?.abort();
+    onClose();
+  };
+
   const completionRate = stats && stats.total_tasks > 0
     ? Math.round((stats.completed_tasks / stats.total_tasks) * 100)
     : 0;
@@ -53,7 +66,7 @@ export function AnalysisModal({ opened, onClose }: Props) {
   return (
     <Modal
       opened={opened}
-      onClose={onClose}
+      onClose={handleClose}
       title={
         <Group gap="xs">
           <IconChartBar size={20} color="var(--mantine-color-indigo-6)" />
@@ -1,6 +1,6 @@
-import { useState } from 'react';
+import { useRef, useState } from 'react';
 import { Modal, Stack, Text, Paper, Textarea, Button, Group, Badge, Loader, Checkbox, ScrollArea, ActionIcon } from '@mantine/core';
-import { IconBrain, IconTrash } from '@tabler/icons-react';
+import { IconBrain, IconTrash, IconCopy } from '@tabler/icons-react';
 import { aiBrainDump, aiBrainDumpSave, submitAndPoll } from '@/api/client';
 import { useTaskStore } from '@/stores/taskStore';
 
@@ -16,9 +16,21 @@ interface BrainDumpItem {
   due_date: string | null;
   project: string | null;
   goal: string | null;
+  merge_into: string | null;
+  duplicate: DuplicateMatch | null;
   selected: boolean;
 }
 
+type ExtractedItem = Omit<BrainDumpItem, 'selected' | 'duplicate' | 'merge_into'>;
+
+interface DuplicateMatch {
+  index: number;
+  type: string;
+  existing_id: string;
+  existing_title: string;
+  score: number;
+}
+
 const TYPE_LABELS: Record<string, string> = {
   task: 'Задача',
   project: 'Проект',
@@ -46,22 +58,42 @@ export function BrainDumpModal({ opened, onClose }: Props) {
   const [saving, setSaving] = useState(false);
   const [items, setItems] = useState<BrainDumpItem[]>([]);
   const [aiReply, setAiReply] = useState('');
-  const [savedResult, setSavedResult] = useState<{ tasks: number; projects: number; goals: number } | null>(null);
+  const [savedResult, setSavedResult] = useState<{ tasks: number; projects: number; goals: number; merged: number } | null>(null);
+  // Aborted when the modal is closed: the server cancels the AI task
+  const abortRef = useRef<AbortController | null>(null);
 
   const { refreshAllCounts, fetchProjects, fetchGoals } = useTaskStore();
 
   const handleExtract = async () => {
     if (!text.trim()) return;
+    const controller = new AbortController();
+    abortRef.current = controller;
     setLoading(true);
     try {
-      const result = await submitAndPoll<{ reply: string; items: Omit<BrainDumpItem, 'selected'>[] }>(
+      const result = await submitAndPoll<
+        { reply: string; items: ExtractedItem[]; duplicates?: DuplicateMatch[] },
+        { items: ExtractedItem[] }
+      >(
         () => aiBrainDump(text.trim()),
+        // Items stream in while the AI is still extracting; show them right away
+        (progress) => {
+          setItems(progress.items.map((item) => ({ ...item, duplicate: null, merge_into: null, selected: true })));
+          setStep('preview');
+        },
+        controller.signal,
       );
-      setItems(result.items.map((item) => ({ ...item, selected: true })));
+      const dupes = new Map((result.duplicates ?? []).map((d) => [d.index, d]));
+      // Likely duplicates are merged into the existing item by default
+      setItems(result.items.map((item, i) => ({
+        ...item,
+        duplicate: dupes.get(i) ?? null,
+        merge_into: dupes.get(i)?.existing_id ?? null,
+        selected: true,
+      })));
       setAiReply(result.reply);
       setStep('preview');
     } catch {
-      setAiReply('Ошибка при обработке текста. Попробуйте ещё раз.');
+      if (!controller.signal.aborted) setAiReply('Ошибка при обработке текста. Попробуйте ещё раз.');
     } finally {
       setLoading(false);
     }
@@ -72,7 +104,7 @@ export function BrainDumpModal({ opened, onClose }: Props) {
     if (selected.length === 0) return;
     setSaving(true);
     try {
-      const toSave = selected.map(({ selected: _, ...rest }) => rest);
+      const toSave = selected.map(({ selected: _, duplicate: __, ...rest }) => rest);
       const { data } = await aiBrainDumpSave(toSave);
       setSavedResult(data.created);
       setStep('done');
@@ -90,11 +122,20 @@ export function BrainDumpModal({ opened, onClose }: Props) {
     setItems((prev) => prev.map((item, i) => i === index ? { ...item, selected: !item.selected } : item));
   };
 
+  const toggleMerge = (index: number) => {
+    setItems((prev) => prev.map((item, i) => (
+      i === index && item.duplicate
+        ? { ...item, merge_into: item.merge_into ? null : item.duplicate.existing_id }
+        : item
+    )));
+  };
+
   const removeItem = (index: number) => {
     setItems((prev) => prev.filter((_, i) => i !== index));
   };
 
   const handleClose = () => {
+    abortRef.current?.abort();
     setStep('input');
     setText('');
     setItems([]);
@@ -137,6 +178,12 @@ export function BrainDumpModal({ opened, onClose }: Props) {
 
         {step === 'preview' && (
           <>
+            {loading && (
+              <Group gap="xs">
+                <Loader size="xs" color="violet" />
+                <Text size="sm" c="dimmed">Извлекаю... найдено: {items.length}</Text>
+              </Group>
+            )}
             {aiReply && (
               <Paper p="sm" bg="var(--mantine-color-violet-light)" radius="md">
                 <Text size="sm">{aiReply}</Text>
@@ -152,6 +199,7 @@ export function BrainDumpModal({ opened, onClose }: Props) {
                         <Checkbox
                           checked={item.selected}
                           onChange={() => toggleItem(i)}
+                          disabled={loading}
                           size="sm"
                         />
                         <div style={{ flex: 1 }}>
@@ -172,9 +220,22 @@ export function BrainDumpModal({ opened, onClose }: Props) {
                               {item.goal && `Цель: ${item.goal}`}
                             </Text>
                           )}
+                          {item.duplicate && (
+                            <Group gap={4} mt={4} wrap="nowrap">
+                              <IconCopy size={12} color="var(--mantine-color-yellow-7)" />
+                              <Text size="xs" c="yellow.8" style={{ flex: 1 }}>
+                                {item.merge_into
+                                  ? `Уже есть: «${item.duplicate.existing_title}» — будет объединено`
+                                  : `Похоже на «${item.duplicate.existing_title}»`}
+                              </Text>
+                              <Button size="compact-xs" variant="subtle" onClick={() => toggleMerge(i)}>
+                                {item.merge_into ? 'Создать отдельно' : 'Объединить'}
+                              </Button>
+                            </Group>
+                          )}
                         </div>
                       </Group>
-                      <ActionIcon variant="subtle" color="gray" size="sm" onClick={() => removeItem(i)}>
+                      <ActionIcon variant="subtle" color="gray" size="sm" onClick={() => removeItem(i)} disabled={loading}>
                         <IconTrash size={14} />
                       </ActionIcon>
                     </Group>
@@ -184,14 +245,14 @@ export function BrainDumpModal({ opened, onClose }: Props) {
             </ScrollArea>
 
             <Group justify="space-between">
-              <Button variant="subtle" onClick={() => { setStep('input'); setItems([]); }}>
+              <Button variant="subtle" disabled={loading} onClick={() => { setStep('input'); setItems([]); }}>
                 Назад
               </Button>
               <Group gap="xs">
                 <Text size="xs" c="dimmed">
                   Выбрано: {items.filter((i) => i.selected).length} из {items.length}
                 </Text>
-                <Button onClick={handleSave} loading={saving} color="violet" disabled={items.filter((i) => i.selected).length === 0}>
+                <Button onClick={handleSave} loading={saving} color="violet" disabled={loading || items.filter((i) => i.selected).length === 0}>
                   Сохранить
                 </Button>
               </Group>
@@ -206,6 +267,7 @@ export function BrainDumpModal({ opened, onClose }: Props) {
               {savedResult.tasks > 0 && <Badge size="lg" color="blue">Задач: {savedResult.tasks}</Badge>}
               {savedResult.projects > 0 && <Badge size="lg" color="violet">Проектов: {savedResult.projects}</Badge>}
               {savedResult.goals > 0 && <Badge size="lg" color="orange">Целей: {savedResult.goals}</Badge>}
+              {savedResult.merged > 0 && <Badge size="lg" color="yellow">Объединено: {savedResult.merged}</Badge>}
             </Group>
             <Button variant="light" onClick={handleClose} mt="md">Закрыть</Button>
           </Stack>
@@ -1,4 +1,4 @@
-import { useState } from 'react';
+import { useRef, useState } from 'react';
 import { Modal, Stack, Text, Paper, ScrollArea, Loader, Group, Button } from '@mantine/core';
 import { IconSunrise } from '@tabler/icons-react';
 import { aiMorningPlan, submitAndPoll } from '@/api/client';
@@ -11,24 +11,33 @@ interface Props {
 export function MorningPlanModal({ opened, onClose }: Props) {
   const [loading, setLoading] = useState(false);
   const [plan, setPlan] = useState<string | null>(null);
+  // Aborted when the modal is closed: the server cancels the AI task
+  const abortRef = useRef<AbortController | null>(null);
 
   const fetchPlan = async () => {
+    const controller = new AbortController();
+    abortRef.current = controller;
     setLoading(true);
     setPlan(null);
     try {
-      const result = await submitAndPoll<string>(() => aiMorningPlan());
+      const result = await submitAndPoll<string>(() => aiMorningPlan(), undefined, controller.signal);
       setPlan(result);
     } catch {
-      setPlan('Ошибка при генерации плана. Проверьте настройки AI.');
+      if (!controller.signal.aborted) setPlan('Ошибка при генерации плана. Проверьте настройки AI.');
     } finally {
       setLoading(false);
     }
   };
 
+  const handleClose = () => {
+    abortRef.current?.abort();
+    onClose();
+  };
+
   return (
     <Modal
       opened={opened}
-      onClose={onClose}
+      onClose={handleClose}
       title={
         <Group gap="xs">
           <IconSunrise size={20} color="var(--mantine-color-yellow-6)" />
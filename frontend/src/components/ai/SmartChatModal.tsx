@@ -34,9 +34,13 @@ const ACTION_CONFIG: Record<string, { label: string; color: string; icon: typeof
 
 export function SmartChatModal({ opened, onClose }: Props) {
   const [messages, setMessages] = useState<Message[]>([]);
+  // Server-side chat session: history and its summary are kept by the backend
+  const [sessionId, setSessionId] = useState<string | null>(null);
   const [input, setInput] = useState('');
   const [loading, setLoading] = useState(false);
   const viewport = useRef<HTMLDivElement>(null);
+  // Aborted when the modal is closed: the server cancels the AI task
+  const abortRef = useRef<AbortController | null>(null);
   const { refreshAllCounts } = useTaskStore();
 
   useEffect(() => {
@@ -51,17 +55,16 @@ export function SmartChatModal({ opened, onClose }: Props) {
     setMessages((prev) => [...prev, userMsg]);
     setInput('');
     setLoading(true);
+    const controller = new AbortController();
+    abortRef.current = controller;
 
     try {
-      // Build history for context (last 10 messages, without actions metadata)
-      const history = messages.slice(-10).map((m) => ({
-        role: m.role,
-        content: m.content,
-      }));
-
-      const data = await submitAndPoll<{ reply: string; actions?: TaskAction[] }>(
-        () => aiSmartChat(userMsg.content, history),
+      const data = await submitAndPoll<{ reply: string; actions?: TaskAction[]; session_id?: string }>(
+        () => aiSmartChat(userMsg.content, sessionId),
+        undefined,
+        controller.signal,
       );
+      if (data.session_id) setSessionId(data.session_id);
       const assistantMsg: Message = {
         role: 'assistant',
         content: data.reply,
@@ -70,6 +73,7 @@ export function SmartChatModal({ opened, onClose }: Props) {
       };
       setMessages((prev) => [...prev, assistantMsg]);
     } catch {
+      if (controller.signal.aborted) return;
       setMessages((prev) => [
         ...prev,
         { role: 'assistant', content: 'Ошибка при обращении к AI. Проверьте настройки.' },
@@ -110,6 +114,11 @@ export function SmartChatModal({ opened, onClose }: Props) {
     }
   };
 
+  const handleClose = () => {
+    abortRef.current?.abort();
+    onClose();
+  };
+
   const getActionDescription = (action: TaskAction): string => {
     switch (action.action) {
       case 'create':
@@ -126,7 +135,7 @@ export function SmartChatModal({ opened, onClose }: Props) {
   return (
     <Modal
       opened={opened}
-      onClose={onClose}
+      onClose={handleClose}
       title={
         <Group gap="xs">
           <IconMessageChatbot size={20} color="var(--mantine-color-indigo-6)" />
@@ -85,13 +85,9 @@ export function SettingsPage() {
   };
 
   const handleSaveAI = async () => {
-    const currentSettings = (user?.settings || {}) as Record<string, unknown>;
-
     if (!selectedProvider) {
-      // Clear AI settings — use server defaults
-      const newSettings = { ...currentSettings };
-      delete newSettings.ai_provider_config;
-      await updateUser({ settings: newSettings } as Record<string, unknown>);
+      // Clear AI settings — use server defaults (null removes the key)
+      await updateUser({ settings: { ai_provider_config: null } } as Record<string, unknown>);
       notifications.show({ title: 'Сохранено', message: 'AI-провайдер сброшен на серверные настройки', color: 'green' });
       return;
     }
@@ -103,8 +99,7 @@ export function SettingsPage() {
     if (apiKey) aiConfig.api_key = apiKey;
     if (apiBase) aiConfig.api_base = apiBase;
 
-    const newSettings = { ...currentSettings, ai_provider_config: aiConfig };
-    await updateUser({ settings: newSettings } as Record<string, unknown>);
+    await updateUser({ settings: { ai_provider_config: aiConfig } } as Record<string, unknown>);
     notifications.show({ title: 'Сохранено', message: 'AI-провайдер обновлён', color: 'green' });
   };
 
@@ -113,7 +108,6 @@ export function SettingsPage() {
     setTesting(true);
     setConnectionStatus('none');
     try {
-      const currentSettings = (user?.settings || {}) as Record<string, unknown>;
       const aiConfig: Record<string, string> = {
         provider: selectedProvider,
         model: selectedModel,
@@ -121,8 +115,7 @@ export function SettingsPage() {
       if (apiKey) aiConfig.api_key = apiKey;
       if (apiBase) aiConfig.api_base = apiBase;
 
-      const newSettings = { ...currentSettings, ai_provider_config: aiConfig };
-      await updateUser({ settings: newSettings } as Record<string, unknown>);
+      await updateUser({ settings: { ai_provider_config: aiConfig } } as Record<string, unknown>);
 
       const { data } = await testAIConnection();
       if (data.status === 'ok') {
@@ -39,6 +39,16 @@ export const useAuthStore = create<AuthState>((set) => ({
     try {
       const { data } = await getMe();
       set({ user: data, loading: false });
+
+      // Keep the browser timezone in settings so the server knows the user's local morning
+      const timezone = Intl.DateTimeFormat().resolvedOptions().timeZone;
+      const settings = (data.settings || {}) as Record<string, unknown>;
+      if (timezone && settings.timezone !== timezone) {
+        // Settings are patched key by key on the server; send only what changes
+        updateMe({ settings: { timezone } })
+          .then(({ data: updated }) => set({ user: updated }))
+          .catch(() => {});
+      }
     } catch {
       set({ user: null, loading: false });
     }
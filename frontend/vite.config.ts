@@ -21,6 +21,7 @@ export default defineConfig({
       '/api': {
         target: process.env.API_PROXY_TARGET || 'http://localhost:8000',
         changeOrigin: true,
+        ws: true,
       },
     },
   },